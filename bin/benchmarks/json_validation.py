@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""json_validation
+--------------------------
+
+Benchmark for validating documents with ``GDCJSONValidator``, creating
+a ``Draft4Validator`` and ``FormatChecker`` for every document (as it
+used to), with the validators cached per type, and with the
+``compiled`` engine::
+
+    python bin/benchmarks/json_validation.py -n 20000
+
+Documents of every type in the dictionary are validated round robin,
+with their ``submitter_id`` set and their other required properties
+missing.
+
+"""
+
+import argparse
+import time
+
+from jsonschema import Draft4Validator, FormatChecker
+
+from gen3datamodel.validators import GDCJSONValidator
+
+
+def get_documents(schemas, count):
+    types = sorted(schemas.schema)
+    return [
+        {"type": types[i % len(types)], "submitter_id": "doc-{}".format(i)}
+        for i in range(count)
+    ]
+
+
+def bench(validate, documents):
+    """Returns the time to validate :param:`documents` and the errors"""
+
+    start = time.perf_counter()
+    errors = [[e.message for e in validate(doc)] for doc in documents]
+    return time.perf_counter() - start, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("-n", "--documents", type=int, default=20000)
+    args = parser.parse_args()
+
+    validator = GDCJSONValidator()
+    compiled = GDCJSONValidator(engine="compiled")
+    documents = get_documents(validator.schemas, args.documents)
+
+    def uncached(doc):
+        schema = validator.schemas.schema[doc["type"]]
+        return Draft4Validator(schema, format_checker=FormatChecker()).iter_errors(doc)
+
+    for engine in (validator, compiled):
+        start = time.perf_counter()
+        engine.create_validators()
+        print(
+            "create_validators, {}: {:.3f}s".format(
+                engine.engine, time.perf_counter() - start
+            )
+        )
+
+    results = {}
+    for name, validate in (
+        ("uncached", uncached),
+        ("cached", validator.iter_errors),
+        ("compiled", compiled.iter_errors),
+    ):
+        seconds, results[name] = bench(validate, documents)
+        print(
+            "{}: {:.3f}s, {:.1f}us per document".format(
+                name, seconds, seconds / len(documents) * 1e6
+            )
+        )
+    assert results["uncached"] == results["cached"] == results["compiled"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""property_setters
+--------------------------
+
+Micro-benchmark for assigning node properties through the generated
+pg_property setters and with ``set_props_bulk``, and for the enum
+membership tests they run::
+
+    python bin/benchmarks/property_setters.py -n 100000
+
+Properties of every node type are set round robin with a valid value.
+
+"""
+
+import argparse
+import timeit
+
+from psqlgraph import Node
+
+from gen3datamodel import models as md
+
+
+def sample_value(cls, name):
+    """Returns a value that passes validation for property :param:`name`"""
+
+    enum = md.dictionary.schema[cls.label]["properties"].get(name, {}).get("enum")
+    if enum:
+        return enum[-1]
+
+    types = cls.__pg_properties__[name] or (str,)
+    return {str: "value", float: 1.0, int: 1, bool: True, list: []}[types[0]]
+
+
+def get_assignments():
+    """Returns (node, property, value) for every property of every type"""
+
+    assignments = []
+    for cls in sorted(Node.get_subclasses(), key=lambda c: c.label):
+        node = cls()
+        for name in sorted(cls.__pg_properties__):
+            if name in md.excluded_props:
+                continue
+            assignments.append((node, name, sample_value(cls, name)))
+
+    return assignments
+
+
+def bench_setters(assignments, count):
+    def run():
+        for i in range(count):
+            node, name, value = assignments[i % len(assignments)]
+            setattr(node, name, value)
+
+    return min(timeit.repeat(run, number=1, repeat=3))
+
+
+def bench_set_props_bulk(assignments, count):
+    """Sets the same properties as bench_setters(), one mapping per node"""
+
+    batches = []
+    for i in range(count):
+        node, name, value = assignments[i % len(assignments)]
+        if not batches or batches[-1][0] is not node:
+            batches.append((node, {}))
+        batches[-1][1][name] = value
+
+    def run():
+        for node, props in batches:
+            node.set_props_bulk(props)
+
+    return min(timeit.repeat(run, number=1, repeat=3))
+
+
+def bench_enum_membership(count):
+    enums = [
+        setter.__pg_enum__
+        for setter in md.property_setters.values()
+        if setter.__pg_enum__
+    ]
+    values = [enum[-1] for enum in enums]
+    lists = [list(enum) for enum in enums]
+
+    def run(candidates):
+        for i in range(count):
+            values[i % len(values)] in candidates[i % len(candidates)]
+
+    return {
+        "list": min(timeit.repeat(lambda: run(lists), number=1, repeat=3)),
+        "EnumValues": min(timeit.repeat(lambda: run(enums), number=1, repeat=3)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "-n", "--count", type=int, default=100000, help="assignments per run"
+    )
+    args = parser.parse_args()
+
+    assignments = get_assignments()
+    print(
+        "{} properties on {} types share {} setters".format(
+            len(assignments), len(Node.get_subclasses()), len(md.property_setters)
+        )
+    )
+
+    print(
+        "set {} properties: {:.3f}s".format(
+            args.count, bench_setters(assignments, args.count)
+        )
+    )
+
+    print(
+        "set {} properties with set_props_bulk: {:.3f}s".format(
+            args.count, bench_set_props_bulk(assignments, args.count)
+        )
+    )
+
+    for kind, seconds in bench_enum_membership(args.count).items():
+        print("{} enum tests against {}: {:.3f}s".format(args.count, kind, seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""traversals
+--------------------------
+
+Benchmark for constructing the traversals used by
+``gen3datamodel.query.union_subq_path`` on a synthetic dictionary::
+
+    python bin/benchmarks/traversals.py --types 400
+
+Every type links to a parent, and some also link to a second one, so
+that there are several paths between most pairs of types.  The
+previous recursive construction, which copied the visited types and
+the path at every step, is timed for comparison.
+
+"""
+
+import argparse
+import random
+import time
+
+from gen3datamodel.query import get_paths, is_terminal
+
+
+def synthetic_adjacency(types, branching, extra_links, seed=0):
+    """Returns the adjacency of a dictionary of :param:`types` types,
+    see :func:`gen3datamodel.query.get_adjacency`
+
+    """
+
+    rng = random.Random(seed)
+    labels = ["type_{}".format(i) for i in range(types)]
+    adjacency = {label: [] for label in labels}
+
+    def link(src, dst):
+        adjacency[src].append((dst + "s", dst, is_terminal(dst + "s")))
+        adjacency[dst].append((src + "s", src, is_terminal(src + "s")))
+
+    for i in range(1, types):
+        link(labels[i], labels[(i - 1) // branching])
+        if rng.random() < extra_links:
+            link(labels[i], labels[rng.randrange(0, i)])
+
+    return adjacency
+
+
+def recursive_paths(adjacency, root, node, visited, path, paths):
+    """The construction replaced by :func:`get_paths`"""
+
+    for name, neighbor, _ in adjacency[node]:
+        if (
+            neighbor not in visited
+            and neighbor != node
+            and not is_terminal(path[-1] if path else neighbor)
+        ):
+            recursive_paths(
+                adjacency, root, neighbor, visited + [node], path + [name], paths
+            )
+
+    paths[node] = paths.get(node) or set()
+    paths[node].add(".".join(path))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--types", type=int, default=400)
+    parser.add_argument("--branching", type=int, default=4)
+    parser.add_argument(
+        "--extra-links",
+        type=float,
+        default=0.01,
+        help="fraction of types with a second parent",
+    )
+    parser.add_argument(
+        "--skip-recursive", action="store_true", help="only time get_paths()"
+    )
+    args = parser.parse_args()
+
+    adjacency = synthetic_adjacency(args.types, args.branching, args.extra_links)
+
+    start = time.perf_counter()
+    traversals = {label: get_paths(adjacency, label) for label in adjacency}
+    seconds = time.perf_counter() - start
+    count = sum(len(p) for paths in traversals.values() for p in paths.values())
+    print("{} types, {} paths".format(len(adjacency), count))
+    print("get_paths: {:.3f}s".format(seconds))
+
+    if args.skip_recursive:
+        return
+
+    start = time.perf_counter()
+    recursive = {
+        label: recursive_paths(adjacency, label, label, [label], [], {})
+        for label in adjacency
+    }
+    print("recursive: {:.3f}s".format(time.perf_counter() - start))
+    assert recursive == traversals
+
+
+if __name__ == "__main__":
+    main()
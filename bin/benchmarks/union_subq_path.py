@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""union_subq_path
+--------------------------
+
+Benchmark for the strategies of ``gen3datamodel.query.union_subq_path``,
+and of ``union_subq_without_path`` with ``EXCEPT`` and as an anti join,
+against PostgreSQL::
+
+    python bin/benchmarks/union_subq_path.py --cases 2000
+
+Creates a project with cases, samples and aliquots in a transaction
+that is rolled back at the end, in a database set up with
+``bin/destroy_and_setup_psqlgraph.py``.  Each strategy is timed
+finding the aliquots of a fraction of the cases (and the aliquots of
+the other cases), and must return the same aliquots.
+
+"""
+
+import argparse
+import time
+import uuid
+
+from psqlgraph import PsqlGraphDriver
+
+from gen3datamodel import models as md
+from gen3datamodel.query import STRATEGIES, union_subq_path, union_subq_without_path
+
+
+def create_project(session, cases, samples, aliquots):
+    """Adds a project with :param:`cases` cases, each with
+    :param:`samples` samples with :param:`aliquots` aliquots.
+
+    :returns: the ids of the cases
+
+    """
+
+    def node(cls, **props):
+        return cls(str(uuid.uuid4()), submitter_id=str(uuid.uuid4()), **props)
+
+    program = md.Program(str(uuid.uuid4()), name="benchmark")
+    project = md.Project(str(uuid.uuid4()), code="benchmark", name="benchmark")
+    project.programs = [program]
+    experiment = node(md.Experiment)
+    experiment.projects = [project]
+    session.add_all([program, project, experiment])
+
+    case_ids = []
+    for _ in range(cases):
+        case = node(md.Case)
+        case.experiments = [experiment]
+        case_ids.append(case.node_id)
+        for _ in range(samples):
+            sample = node(md.Sample)
+            sample.cases = [case]
+            for _ in range(aliquots):
+                aliquot = node(md.Aliquot)
+                aliquot.samples = [sample]
+                session.add(aliquot)
+    session.flush()
+    return case_ids
+
+
+def time_query(g, case_ids, repeat, traverse, **kwargs):
+    """Returns the best time to fetch the ids of the aliquots found by
+    :param:`traverse` and the ids
+
+    """
+
+    best, ids = None, None
+    for _ in range(repeat):
+        q = traverse(g.nodes(md.Aliquot), "case", [lambda q: q.ids(case_ids)], **kwargs)
+        start = time.perf_counter()
+        ids = sorted(node_id for node_id, in q.with_entities(md.Aliquot.node_id))
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--password", default="postgres")
+    parser.add_argument("--database", default="gen3datamodel_test")
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--samples", type=int, default=3, help="per case")
+    parser.add_argument("--aliquots", type=int, default=3, help="per sample")
+    parser.add_argument(
+        "--selected",
+        type=float,
+        default=0.05,
+        help="fraction of the cases to find the aliquots of",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    g = PsqlGraphDriver(args.host, args.user, args.password, args.database)
+    with g.session_scope() as session:
+        case_ids = create_project(session, args.cases, args.samples, args.aliquots)
+        case_ids = case_ids[: max(1, int(len(case_ids) * args.selected))]
+        print(
+            "{} cases, {} aliquots, finding the aliquots of {} cases".format(
+                args.cases, args.cases * args.samples * args.aliquots, len(case_ids)
+            )
+        )
+
+        results = {}
+        for strategy in STRATEGIES:
+            seconds, results[strategy] = time_query(
+                g, case_ids, args.repeat, union_subq_path, strategy=strategy
+            )
+            print("{}: {:.3f}s".format(strategy, seconds))
+        for strategy in STRATEGIES:
+            assert results[strategy] == results["union"], strategy
+
+        without = {}
+        for name, anti_join in (("except", False), ("anti join", True)):
+            seconds, without[name] = time_query(
+                g, case_ids, args.repeat, union_subq_without_path, anti_join=anti_join
+            )
+            print("without, {}: {:.3f}s".format(name, seconds))
+        assert without["except"] == without["anti join"]
+
+        session.rollback()
+
+
+if __name__ == "__main__":
+    main()
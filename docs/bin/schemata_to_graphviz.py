@@ -21,19 +21,19 @@ def build_visualization():
     dot.node_attr["style"] = "filled"
 
     # Add nodes
-    for node in m.Node.get_subclasses():
+    for node in m.schema_registry.get_nodes():
         label = node.get_label()
         print(label)
         dot.node(label, label)
 
     # Add edges
-    for edge in m.Edge.get_subclasses():
+    for edge in m.schema_registry.get_edges():
         if edge.__dst_class__ == "Case" and edge.label == "relates_to":
             # Skip case cache edges
             continue
 
-        src = m.Node.get_subclass_named(edge.__src_class__)
-        dst = m.Node.get_subclass_named(edge.__dst_class__)
+        src = m.schema_registry.get_node_named(edge.__src_class__)
+        dst = m.schema_registry.get_node_named(edge.__dst_class__)
         dot.edge(src.get_label(), dst.get_label(), edge.get_label())
 
     gv_path = os.path.join(root_dir, "docs", "viz", "gdc_data_model.gv")
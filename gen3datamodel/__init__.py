@@ -1 +1,35 @@
 from gen3datamodel import *
+
+import gc
+
+
+def preload(freeze=True):
+    """Does the one-time work of using the models, so that it happens
+    once in a server's parent process instead of in every forked child.
+
+    Creates every model class (including in lazy mode), configures the
+    mappers, loads the traversals used by :mod:`gen3datamodel.query`
+    and creates the JSON validators for every dictionary type.
+
+    :param freeze:
+        Move everything allocated so far into the permanent generation
+        with :func:`gc.freeze`, so that garbage collection in children
+        doesn't touch (and copy) the shared pages
+
+    """
+
+    from sqlalchemy.orm import configure_mappers
+
+    from gen3datamodel import models, query
+    from gen3datamodel.validators import GDCJSONValidator
+
+    models.load_models(models.allowed_types)
+    configure_mappers()
+
+    query.load_traversals()
+
+    GDCJSONValidator().create_validators()
+
+    if freeze:
+        gc.collect()
+        gc.freeze()
@@ -18,6 +18,7 @@ from sqlalchemy.exc import OperationalError
 
 #: Required but 'unused' import to register GDC models
 from . import models  # noqa
+from .models.node_ancestors import rebuild_node_ancestors
 
 from psqlgraph import (
     create_all,
@@ -231,6 +232,20 @@ def subcommand_revoke(args):
             revoke_write_permissions_to_graph(engine, user)
 
 
+def subcommand_rebuild_node_ancestors(args):
+    """Create the node_ancestors closure table if it doesn't exist and
+    rebuild it from the edges.
+
+    """
+
+    logger.info("Running subcommand 'node-ancestors-rebuild'")
+    engine = get_engine(args.host, args.user, args.password, args.database)
+
+    with engine.begin() as connection:
+        count = rebuild_node_ancestors(connection)
+    logger.info("Inserted %d node ancestors", count)
+
+
 def add_base_args(subparser):
     subparser.add_argument(
         "-H", "--host", type=str, action="store", required=True, help="psql-server host"
@@ -316,12 +331,21 @@ def add_subcommand_revoke(subparsers):
     )
 
 
+def add_subcommand_rebuild_node_ancestors(subparsers):
+    add_base_args(
+        subparsers.add_parser(
+            "node-ancestors-rebuild", help=subcommand_rebuild_node_ancestors.__doc__
+        )
+    )
+
+
 def get_parser():
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="subcommand")
     add_subcommand_create(subparsers)
     add_subcommand_grant(subparsers)
     add_subcommand_revoke(subparsers)
+    add_subcommand_rebuild_node_ancestors(subparsers)
     return parser
 
 
@@ -336,6 +360,7 @@ def main(args=None):
         "graph-create": subcommand_create,
         "graph-grant": subcommand_grant,
         "graph-revoke": subcommand_revoke,
+        "node-ancestors-rebuild": subcommand_rebuild_node_ancestors,
     }[args.subcommand](args)
 
     logger.info("Done.")
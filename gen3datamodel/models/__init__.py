@@ -8,6 +8,30 @@ python layer.  Classes are produced by a factory, and required
 attributes are injected into them before they are registered into the
 modules globals map.
 
+Setting ``GEN3DATAMODEL_LAZY=1`` before import enables lazy mode: no
+classes are created at import time, and a class (together with the
+types it links to and the edges between them) is created the first
+time it is referenced as an attribute of this module.  Polymorphic
+queries against :class:`psqlgraph.Node` only include classes created
+before the mappers were first configured.
+
+Properties listed under ``promoted_properties`` in the dictionary
+settings are stored in real, indexed columns of each node table as
+well as in ``_props``, and queries on their hybrid attributes use the
+columns.  See :func:`cls_inject_promoted_properties`.
+
+Setting ``GEN3DATAMODEL_TYPES`` to a comma separated list of types
+restricts the classes to those types and the types they transitively
+link to.  Other classes are never created, even in lazy mode, with one
+exception: psqlgraph's Edge cannot be mapped without subclasses, so if
+none of these types link to another, the types of
+:func:`get_lazy_seed` (the smallest closure with an edge) are created
+as well.  The same subset can be created explicitly with
+:func:`load_models` after importing in lazy mode.
+
+Classes for other dictionaries can be created in the same process
+with :func:`gen3datamodel.models.namespaces.build_models`.
+
 ::WARNING:: This code is the heart of the GDC.  Changes here will
 propogate to all code that imports this package and MAY BREAK THINGS.
 
@@ -20,15 +44,34 @@ from dictionaryutils import dictionary
 from .misc import FileReport  # noqa
 from sqlalchemy.orm import configure_mappers
 from .versioned_nodes import VersionedNode  # noqa
+from .node_ancestors import NodeAncestor  # noqa
 
 import hashlib
+import os
+from . import cache
+from .registry import SchemaRegistry
 from . import versioned_nodes  # noqa
+from . import node_ancestors  # noqa
 from . import notifications
 from . import submission
 
-from sqlalchemy import func, event, and_
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Numeric,
+    Text,
+    and_,
+    cast,
+    event,
+    func,
+)
+from sqlalchemy.orm import Mapper
 from psqlgraph import Node, Edge, pg_property
+from psqlgraph.util import sanitize, validate
+from psqlgraph.base import CommonBase
+from psqlgraph.edge import id_column
 
+from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.hybrid import (
     Comparator,
     hybrid_property,
@@ -36,6 +79,9 @@ from sqlalchemy.ext.hybrid import (
 
 from .indexes import (
     cls_add_indexes,
+    get_index_name,
+    get_promoted_property_indexes,
+    get_secondary_key_index_descriptions,
     get_secondary_key_indexes,
 )
 
@@ -54,6 +100,25 @@ if CACHE_CASES:
 # the database, inform later code to skip these
 excluded_props = ["id", "type"]
 
+# Properties that are also stored in their own column on each node
+# table that has them, e.g. ``project_id`` or ``state``
+PROMOTED_PROPERTIES = (
+    []
+    if (not hasattr(dictionary, "settings") or not dictionary.settings)
+    else dictionary.settings.get("promoted_properties", [])
+)
+
+# Column types for promoted properties by the python types they accept.
+# Numbers share a type so that the same property has the same column
+# type in every table of a polymorphic query.
+PROMOTED_COLUMN_TYPES = {
+    ("str",): Text,
+    ("bool",): Boolean,
+    ("int",): Numeric,
+    ("float",): Numeric,
+    ("float", "int"): Numeric,
+}
+
 
 # At module load time, evaluate which classes have already been
 # registered as subclasses of the abstract bases Node and Edge to
@@ -61,6 +126,16 @@ excluded_props = ["id", "type"]
 loaded_nodes = [c.__name__ for c in Node.get_subclasses()]
 loaded_edges = [c.__name__ for c in Edge.get_subclasses()]
 
+# Index of the classes by label, name and the nodes that edges connect
+schema_registry = SchemaRegistry(Node.get_subclasses() + Edge.get_subclasses())
+
+# Create classes on first reference instead of at import time
+LAZY_ENV = "GEN3DATAMODEL_LAZY"
+lazy = os.environ.get(LAZY_ENV, "").lower() in ("1", "true", "yes")
+
+# Only create classes for these comma separated types and their links
+TYPES_ENV = "GEN3DATAMODEL_TYPES"
+
 
 def remove_spaces(s):
     """Returns a stripped string with all of the spaces removed.
@@ -81,6 +156,7 @@ def register_class(cls):
     """
 
     globals()[cls.__name__] = cls
+    schema_registry.add(cls)
 
 
 def get_links(schema):
@@ -103,26 +179,33 @@ def get_links(schema):
     return result
 
 
+# Python types by JSON schema type
+SCHEMA_TYPES = {
+    "string": (str,),
+    "number": (float, int),
+    "integer": (int,),
+    "float": (float,),
+    "null": (str,),
+    "boolean": (bool,),
+    "array": (list,),
+    None: (str,),
+}
+
+
 def types_from_str(types):
-    return [
-        a
-        for type_ in types
-        for a in {
-            "string": [str],
-            "number": [float, int],
-            "integer": [int],
-            "float": [float],
-            "null": [str],
-            "boolean": [bool],
-            "array": [list],
-            None: [str],
-        }[type_]
-    ]
+    return [a for type_ in types for a in SCHEMA_TYPES[type_]]
 
 
-def PropertyFactory(name, schema, key=None):
-    """Returns a pg_property (psqlgraph specific type of hybrid_property)"""
-    key = name if key is None else key
+# Python types by name, used to restore types from cached definitions
+PYTHON_TYPES = {t.__name__: t for t in (str, float, int, bool, list)}
+
+
+def compile_property_definition(schema):
+    """Returns the python type names and enum of a property schema.
+
+    :returns: a ``dict`` of format ``{'types': [<type name>], 'enum': <enum>}``
+
+    """
 
     # Assert the dictionary has no references for properties
     assert "$ref" not in schema.keys(), (
@@ -134,11 +217,75 @@ def PropertyFactory(name, schema, key=None):
     types = schema.get("type")
     types = [types] if not isinstance(types, list) else types
 
-    # Convert the list of string type identifiers to Python types
-    python_types = types_from_str(types)
+    return {
+        # Convert the list of string type identifiers to Python types
+        "types": [t.__name__ for t in types_from_str(types)],
+        # If there is an enum defined, grab it for pg_property validation
+        "enum": schema.get("enum"),
+    }
+
+
+class EnumValues(list):
+    """The allowed values of a property, with constant time membership
+    tests for hashable values.
+
+    This is still a list so that validation errors list the allowed
+    values as before.  It must not be modified.
+
+    """
+
+    def __init__(self, values):
+        super(EnumValues, self).__init__(values)
+        try:
+            self._values = frozenset(self)
+        except TypeError:
+            self._values = None
+
+    def __contains__(self, value):
+        if self._values is not None:
+            try:
+                return value in self._values
+            except TypeError:
+                pass
+        return super(EnumValues, self).__contains__(value)
+
+
+# The setters created by PropertyFactory, shared by every class with
+# the same property, by (name, key, python types, enum)
+property_setters = {}
+
+
+def PropertyFactory(name, schema, key=None, definition=None):
+    """Returns a pg_property (psqlgraph specific type of hybrid_property)
+
+    Setters are interned, so properties with the same name, types and
+    enum share one setter across all classes.
+
+    :param definition:
+        The compiled property, see :func:`compile_property_definition`.
+        Derived from :param:`schema` if not given.
+
+    """
+    key = name if key is None else key
+
+    if definition is None:
+        definition = compile_property_definition(schema)
+
+    python_types = tuple(PYTHON_TYPES[t] for t in definition["types"])
+    enum = definition["enum"]
+
+    setter_key = (name, key, python_types, None if enum is None else tuple(enum))
+    try:
+        setter = property_setters.get(setter_key)
+    except TypeError:
+        # The enum has unhashable values, don't share this setter
+        setter_key, setter = None, None
 
-    # If there is an enum defined, grab it for pg_property validation
-    enum = schema.get("enum")
+    if setter is not None:
+        return setter
+
+    if enum is not None:
+        enum = EnumValues(enum)
 
     # Create pg_property setter
     @pg_property(*python_types, enum=enum)
@@ -147,9 +294,52 @@ def PropertyFactory(name, schema, key=None):
 
     setter.__name__ = name
 
+    # The types validate() accepts, see is_valid_property()
+    setter._valid_types = None
+    if python_types:
+        setter._valid_types = python_types + (type(None),)
+
+    if setter_key is not None:
+        property_setters[setter_key] = setter
+
     return setter
 
 
+def get_base_columns(base):
+    """Returns copies of the columns a subclass of :param:`base` would
+    otherwise inherit.
+
+    Once the mappers have been configured, the columns on the
+    abstract bases Node and Edge are replaced by instrumented
+    attributes and are no longer copied onto new subclasses.  Classes
+    created after that point (i.e. in lazy mode) have to declare them.
+
+    """
+
+    if "__mapper__" not in base.__dict__:
+        return {}
+
+    return {
+        name: CommonBase.__dict__[name].copy()
+        for name in ("created", "acl", "_sysan", "_props")
+    }
+
+
+def get_table_args(base, schema):
+    """Returns the ``__table_args__`` of a subclass of :param:`base`
+    whose table is in the PostgreSQL schema :param:`schema`.
+
+    """
+
+    table_args = base.__dict__["__table_args__"]
+
+    @declared_attr
+    def __table_args__(cls):
+        return tuple(table_args.fget(cls)) + ({"schema": schema},)
+
+    return __table_args__
+
+
 def get_class_name_from_id(_id):
     return "".join([a.capitalize() for a in _id.split("_")])
 
@@ -194,6 +384,223 @@ def cls_inject_versioned_nodes_lookup(cls):
     cls.get_versions = get_versions
 
 
+def is_valid_property(setter, value):
+    """Returns whether psqlgraph would accept :param:`value` for a
+    property with the pg_property :param:`setter`, without building the
+    accepted types for every value.
+
+    """
+
+    enum = setter.__pg_enum__
+    if enum and value is not None and value not in enum:
+        return False
+
+    return setter._valid_types is None or isinstance(value, setter._valid_types)
+
+
+def cls_inject_bulk_property_setters(cls, setters):
+    """Injects methods to set many properties at once into the class.
+
+    Properties set one at a time are validated and copy ``_props``
+    once per property.  These validate every value up front with the
+    setters captured here and then write ``_props`` once.  Errors are
+    the same as when setting the properties one at a time, but nothing
+    is written if any value is invalid.
+
+    Unlike the ``properties`` argument of the constructor, which sets an
+    unknown key as a plain attribute and leaves it out of ``_props``,
+    these raise a KeyError for keys that aren't properties of the class.
+
+    :param setters: the pg_property setters by property name
+
+    """
+
+    cls._pg_property_setters = setters
+
+    def validate_props(cls, props):
+        """Returns :param:`props` sanitized as ``node.props = props`` would
+        and raises the error setting the first invalid property would.
+
+        :raises: KeyError if a key is not a property of the class
+
+        """
+
+        props = sanitize(props)
+        for key, value in props.items():
+            setter = cls._pg_property_setters.get(key)
+            if setter is None:
+                raise KeyError("{} has no property {}".format(cls, key))
+            if not is_valid_property(setter, value):
+                validate(setter, value, setter.__pg_types__, setter.__pg_enum__)
+
+        return props
+
+    def set_props_bulk(self, props):
+        """Validates and sets all properties in the mapping :param:`props`
+
+        :raises: KeyError if a key is not a property of the class
+
+        """
+
+        props = self.validate_props(props)
+        updated = dict(self._props)
+        updated.update(props)
+        self._props = updated
+
+    def from_docs(cls, docs):
+        """Returns a list of new nodes, one per document.
+
+        Documents map property names to values as in submitted
+        entities.  ``id`` is used as the node_id, ``type`` has to be
+        this class's label if given, and links are ignored.  All
+        documents are validated before any node is created, and other
+        keys that aren't properties raise a KeyError.
+
+        """
+
+        batch = []
+        for doc in docs:
+            if doc.get("type", cls.label) != cls.label:
+                raise ValueError(
+                    "Cannot create {} from a document of type {}".format(
+                        cls.__name__, doc["type"]
+                    )
+                )
+            props = {
+                key: value
+                for key, value in doc.items()
+                if key not in excluded_props and key not in cls._pg_edges
+            }
+            batch.append((doc.get("id"), cls.validate_props(props)))
+
+        nodes = []
+        for node_id, props in batch:
+            node = cls(node_id)
+            node._props = props
+            nodes.append(node)
+
+        return nodes
+
+    cls.validate_props = classmethod(validate_props)
+    cls.set_props_bulk = set_props_bulk
+    cls.from_docs = classmethod(from_docs)
+
+
+def get_promoted_column_type(key, types):
+    """Returns the name of the column type for promoted property
+    :param:`key` which accepts the python types named :param:`types`,
+    or None if it cannot be promoted.
+
+    """
+
+    column_type = PROMOTED_COLUMN_TYPES.get(tuple(sorted(set(types))))
+    if column_type is None:
+        logger.warning(
+            "Not promoting property {} of types {}, only properties of a "
+            "single type can be promoted".format(key, types)
+        )
+        return None
+
+    return column_type.__name__
+
+
+class PromotedPropertyComparator(Comparator):
+    """Compares a promoted property using its column instead of the
+    ``_props`` JSONB.  ``astext`` is kept so that expressions written
+    for the JSONB element still work.
+
+    """
+
+    @property
+    def astext(self):
+        if isinstance(self.expression.type, Text):
+            return self.expression
+        return cast(self.expression, Text)
+
+    def operate(self, op, *other, **kwargs):
+        return op(self.expression, *other, **kwargs)
+
+    def reverse_operate(self, op, other, **kwargs):
+        return op(other, self.expression, **kwargs)
+
+
+def get_promoted_columns(promoted_properties):
+    """Returns the columns for promoted properties by class attribute.
+    The columns are named after the properties.
+
+    :param promoted_properties: ``{<property>: <column type name>}``
+
+    """
+
+    column_types = {t.__name__: t for t in PROMOTED_COLUMN_TYPES.values()}
+    return {
+        "_promoted_" + key: Column(key, column_types[type_name], nullable=True)
+        for key, type_name in promoted_properties.items()
+    }
+
+
+def copy_promoted_properties(node):
+    """Copies the promoted properties of :param:`node` into their columns"""
+
+    for key in node._pg_promoted_columns:
+        setattr(node, "_promoted_" + key, node._props.get(key))
+
+
+def cls_inject_promoted_properties(cls, promoted_properties, index_names=None):
+    """Given a class with the columns from :func:`get_promoted_columns`,
+    inject a hook that copies each promoted property from ``_props``
+    into its column on every insert and update, and index the columns.
+
+    The hybrid attributes of the properties are pointed at the columns
+    once the mappers are configured, see
+    :func:`inject_promoted_property_expressions`.  Statements that
+    update ``_props`` without going through the ORM have to update the
+    columns themselves.
+
+    """
+
+    cls._pg_promoted_columns = {
+        key: cls.__table__.c[key] for key in promoted_properties
+    }
+    if not promoted_properties:
+        return
+
+    # Registered after the datetime hooks, which write to _props
+    @event.listens_for(cls, "before_insert")
+    @event.listens_for(cls, "before_update")
+    def set_promoted_columns(mapper, connection, target):
+        copy_promoted_properties(target)
+
+    cls_add_indexes(cls, get_promoted_property_indexes(cls, index_names))
+
+
+@event.listens_for(Mapper, "after_configured")
+def inject_promoted_property_expressions():
+    """psqlgraph creates the hybrid attributes of the properties when the
+    mappers are configured, point the ones for promoted properties at
+    their columns.
+
+    """
+
+    for cls in Node.get_subclasses():
+        for key in getattr(cls, "_pg_promoted_columns", {}):
+            prop = cls.__dict__.get(key)
+            if not isinstance(prop, hybrid_property) or getattr(
+                prop, "_promoted", False
+            ):
+                continue
+
+            # Looked up on the class the comparator is called with, so
+            # that aliases compare their own column
+            prop = prop.comparator(
+                lambda cls, key=key: PromotedPropertyComparator(
+                    getattr(cls, "_promoted_" + key)
+                )
+            )
+            prop._promoted = True
+            setattr(cls, key, prop)
+
+
 def cls_inject_created_datetime_hook(
     cls, updated_key="updated_datetime", created_key="created_datetime"
 ):
@@ -228,7 +635,7 @@ def cls_inject_updated_datetime_hook(cls, updated_key="updated_datetime"):
                 target._props["updated_datetime"] = ts
 
 
-def cls_inject_secondary_keys(cls, schema):
+def cls_inject_secondary_keys(cls, schema, index_names=None):
     """The dictionary defines a list of ``unique`` keys.  If there are
     keys (possibly tuples of keys) in addition to the canonical `id`
     column, then we want to be able to query the database against
@@ -244,6 +651,10 @@ def cls_inject_secondary_keys(cls, schema):
            :class:`sqlalchemy.dialects.postgresql.json.JSONElement`
            objects
 
+    :param index_names:
+        Optional precomputed ``{description: name}`` of the secondary
+        key indexes, see :func:`get_secondary_key_indexes`
+
     """
 
     unique_keys = schema.get("uniqueKeys", [])
@@ -289,14 +700,74 @@ def cls_inject_secondary_keys(cls, schema):
     cls._secondary_keys = _secondary_keys
     cls._secondary_keys_dicts = _secondary_keys_dicts
 
-    cls_add_indexes(cls, get_secondary_key_indexes(cls))
+    cls_add_indexes(cls, get_secondary_key_indexes(cls, index_names))
+
+
+def compile_node_definition(_id, schema, promoted_properties=None):
+    """Derive everything needed to create the node class for
+    :param:`_id` from its schema.
 
+    :param promoted_properties:
+        The properties to promote to columns, defaults to
+        :data:`PROMOTED_PROPERTIES`
 
-def NodeFactory(_id, schema):
-    """Returns a node class given a schema."""
+    The result is JSON serializable so that it can be cached, see
+    :mod:`gen3datamodel.models.cache`.
+
+    """
 
-    name = get_class_name_from_id(_id)
     links = get_links(schema)
+    tablename = get_class_tablename_from_id(_id)
+    secondary_keys = [keys for keys in schema.get("uniqueKeys", []) if "id" not in keys]
+    properties = {
+        key: compile_property_definition(prop)
+        for key, prop in schema.get("properties", {}).items()
+        if key not in links and key not in excluded_props
+    }
+
+    promoted = {}
+    for key in (
+        PROMOTED_PROPERTIES if promoted_properties is None else promoted_properties
+    ):
+        if key in properties:
+            column_type = get_promoted_column_type(key, properties[key]["types"])
+            if column_type:
+                promoted[key] = column_type
+
+    return {
+        "id": _id,
+        "name": get_class_name_from_id(_id),
+        "title": schema.get("title"),
+        "tablename": tablename,
+        "properties": properties,
+        "dictionary": {
+            "category": schema.get("category"),
+            "title": schema.get("title"),
+        },
+        "promoted_properties": promoted,
+        "index_names": {
+            description: get_index_name(tablename, _id, description)
+            for description in get_secondary_key_index_descriptions(secondary_keys)
+            + [key + "_promoted" for key in promoted]
+        },
+    }
+
+
+def NodeFactory(_id, schema, definition=None, metadata=None):
+    """Returns a node class given a schema.
+
+    :param definition:
+        The compiled node, see :func:`compile_node_definition`.
+        Derived from :param:`schema` if not given.
+    :param metadata:
+        The MetaData to add the table to, defaults to that of Node
+
+    """
+
+    if definition is None:
+        definition = compile_node_definition(_id, schema)
+
+    name = definition["name"]
 
     @property
     def node_id(self, value):
@@ -308,16 +779,12 @@ def NodeFactory(_id, schema):
 
     # Pull the JSONB properties from the `properties` key
     attributes = {
-        key: PropertyFactory(key, schema)
-        for key, schema in schema.get("properties", {}).items()
-        if key not in links and key not in excluded_props
+        key: PropertyFactory(key, schema["properties"][key], definition=prop)
+        for key, prop in definition["properties"].items()
     }
 
     # Store for the programmer
-    attributes["_dictionary"] = {
-        "category": schema.get("category"),
-        "title": schema.get("title"),
-    }
+    attributes["_dictionary"] = dict(definition["dictionary"])
 
     # _pg_links are out_edges, links TO other types
     attributes["_pg_links"] = {}
@@ -328,12 +795,30 @@ def NodeFactory(_id, schema):
     # _pg_edges are all edges, links to AND from other types
     attributes["_pg_edges"] = {}
 
+    base_columns = get_base_columns(Node)
+    if base_columns:
+        attributes.update(base_columns)
+        attributes["node_id"] = Column(Text, primary_key=True, nullable=False)
+
+    attributes.update(get_promoted_columns(definition["promoted_properties"]))
+
+    if definition.get("schema"):
+        attributes["__table_args__"] = get_table_args(Node, definition["schema"])
+    if metadata is not None:
+        attributes["metadata"] = metadata
+
+    setters = {
+        key: value
+        for key, value in attributes.items()
+        if key in definition["properties"]
+    }
+
     # Create the Node subclass!
     cls = type(
         name,
         (Node,),
         dict(
-            __tablename__=get_class_tablename_from_id(_id),
+            __tablename__=definition["tablename"],
             __label__=_id,
             id=node_id,
             **attributes
@@ -343,7 +828,11 @@ def NodeFactory(_id, schema):
     cls_inject_created_datetime_hook(cls)
     cls_inject_updated_datetime_hook(cls)
     cls_inject_versioned_nodes_lookup(cls)
-    cls_inject_secondary_keys(cls, schema)
+    cls_inject_bulk_property_setters(cls, setters)
+    cls_inject_secondary_keys(cls, schema, definition["index_names"])
+    cls_inject_promoted_properties(
+        cls, definition["promoted_properties"], definition["index_names"]
+    )
 
     return cls
 
@@ -398,6 +887,10 @@ def EdgeFactory(
     dst_label,
     src_dst_assoc,
     dst_src_assoc,
+    tablename=None,
+    registry=None,
+    schema=None,
+    metadata=None,
     _assigned_association_proxies=defaultdict(set),
 ):
     """Returns an edge class.
@@ -412,8 +905,17 @@ def EdgeFactory(
     :param dst_src_assoc:
         The backref name i.e. ``dst.dst_src_assoc`` returns a list of
         source type nodes
+    :param tablename:
+        The precomputed tablename, see :func:`generate_edge_tablename`
+    :param registry:
+        The :class:`SchemaRegistry` to look the source and destination
+        classes up in, defaults to :data:`schema_registry`
+    :param schema: The PostgreSQL schema of the source, destination
+        and edge tables, if not the default
+    :param metadata: The MetaData to add the table to, defaults to
+        that of Edge.  It has to be that of the source and destination.
     :param _assigned_association_proxies:
-        Don't pass this parameter. This will be used to store what
+        Don't pass this parameter outside of a model namespace. This will be used to store what
         links and backrefs have been assigned to the source and
         destination nodes.  This prevents clobbering a backref with a
         link or a link with a backref, as they would be from different
@@ -432,11 +934,13 @@ def EdgeFactory(
 
     # Generate the tablename. If it is too long, it will be hashed and
     # truncated.
-    tablename = generate_edge_tablename(src_label, label, dst_label)
+    if tablename is None:
+        tablename = generate_edge_tablename(src_label, label, dst_label)
 
     # Lookup the tablenames for the source and destination classes
-    src_cls = Node.get_subclass(src_label)
-    dst_cls = Node.get_subclass(dst_label)
+    registry = schema_registry if registry is None else registry
+    src_cls = registry.get_node(src_label)
+    dst_cls = registry.get_node(dst_label)
 
     # Assert that we're not clobbering link names
     assert dst_src_assoc not in _assigned_association_proxies[dst_label], (
@@ -462,36 +966,184 @@ def EdgeFactory(
 
     hooks_before_delete = Edge._session_hooks_before_delete
 
+    src_table, dst_table = src_cls.__tablename__, dst_cls.__tablename__
+    if schema:
+        src_table = "{}.{}".format(schema, src_table)
+        dst_table = "{}.{}".format(schema, dst_table)
+
+    attributes = get_base_columns(Edge)
+    if attributes:
+        attributes["src_id"] = id_column(src_table, name)
+        attributes["dst_id"] = id_column(dst_table, name)
+    if schema:
+        attributes["__table_args__"] = get_table_args(Edge, schema)
+    if metadata is not None:
+        attributes["metadata"] = metadata
+
     cls = type(
         name,
         (Edge,),
-        {
-            "__label__": label,
-            "__tablename__": tablename,
-            "__src_class__": get_class_name_from_id(src_label),
-            "__dst_class__": get_class_name_from_id(dst_label),
-            "__src_dst_assoc__": src_dst_assoc,
-            "__dst_src_assoc__": dst_src_assoc,
-            "__src_table__": src_cls.__tablename__,
-            "__dst_table__": dst_cls.__tablename__,
-            "_session_hooks_before_insert": hooks_before_insert,
-            "_session_hooks_before_update": hooks_before_update,
-            "_session_hooks_before_delete": hooks_before_delete,
-        },
+        dict(
+            attributes,
+            **{
+                "__label__": label,
+                "__tablename__": tablename,
+                "__src_class__": src_cls.__name__,
+                "__dst_class__": dst_cls.__name__,
+                "__src_dst_assoc__": src_dst_assoc,
+                "__dst_src_assoc__": dst_src_assoc,
+                "__src_table__": src_table,
+                "__dst_table__": dst_table,
+                "_session_hooks_before_insert": hooks_before_insert,
+                "_session_hooks_before_update": hooks_before_update,
+                "_session_hooks_before_delete": hooks_before_delete,
+            }
+        ),
     )
 
     return cls
 
 
-def load_nodes():
-    """Parse all nodes from dictionary and create Node subclasses"""
+def compile_edge_definition(src_label, name, edge_label, link, schema=None):
+    """Derive everything needed to create the edge class for the link
+    :param:`name` from :param:`src_label`.
+
+    :returns: a ``dict`` of :func:`EdgeFactory` keyword arguments
+
+    """
+
+    schema = dictionary.schema if schema is None else schema
+    dst_label = link["target_type"]
+
+    if dst_label not in schema:
+        raise RuntimeError(
+            "Destination '{}' for edge '{}' from '{}' not defined".format(
+                dst_label, name, src_label
+            )
+        )
+
+    dst_label = schema[dst_label]["id"]
+    edge_name = "".join(map(get_class_name_from_id, [src_label, edge_label, dst_label]))
+
+    return {
+        "name": edge_name,
+        "label": edge_label,
+        "src_label": src_label,
+        "dst_label": dst_label,
+        "src_dst_assoc": name,
+        "dst_src_assoc": link["backref"],
+        "tablename": generate_edge_tablename(
+            remove_spaces(src_label),
+            remove_spaces(edge_label),
+            remove_spaces(dst_label),
+        ),
+    }
+
+
+def compile_definitions(schema=None, promoted_properties=None):
+    """Derive the definitions of all nodes, edges and links in the
+    dictionary.
+
+    .. code-block::
+        {
+            'nodes': { <entity>: <node definition> },
+            'edges': { <edge name>: <edge definition> },
+            'links': { <entity>: [{'name': <link name>,
+                                   'backref': <backref name>,
+                                   'target_type': <target type>,
+                                   'edge': <edge name>}] },
+        }
+
+    """
+
+    schema = dictionary.schema if schema is None else schema
+    definitions = {"nodes": {}, "edges": {}, "links": {}}
+
+    for entity, subschema in schema.items():
+        definitions["nodes"][entity] = compile_node_definition(
+            subschema["id"], subschema, promoted_properties
+        )
+
+    for entity, subschema in schema.items():
+        definitions["links"][entity] = []
+        for name, link in get_links(subschema).items():
+            edge = compile_edge_definition(
+                subschema["id"], name, link["label"], link, schema
+            )
+            definitions["edges"][edge["name"]] = edge
+            definitions["links"][entity].append(
+                {
+                    "name": link["name"],
+                    "backref": link["backref"],
+                    "target_type": link["target_type"],
+                    "edge": edge["name"],
+                }
+            )
+
+    return definitions
+
+
+def get_definitions():
+    """Returns the compiled definitions of the dictionary, from the
+    on-disk cache if it is current, see :mod:`gen3datamodel.models.cache`
+
+    """
+
+    # Hashing the schema costs more than compiling it
+    if not cache.get_cache_dir():
+        return compile_definitions()
+
+    key = cache.get_cache_key(dictionary.schema, getattr(dictionary, "settings", None))
+    cached = cache.load(key)
+    if cached is not None:
+        return cached
+
+    compiled = compile_definitions()
+    cache.dump(key, compiled)
+    return compiled
+
+
+def get_link_closure(labels, compiled=None):
+    """Returns :param:`labels` and every type they transitively link to.
+
+    These are the types that have to exist for the links of
+    :param:`labels` to be created.
+
+    :param compiled: The definitions to follow, defaults to
+        :data:`definitions`
+
+    """
+
+    compiled = definitions if compiled is None else compiled
+    closure = set()
+    to_visit = list(labels)
+    while to_visit:
+        label = to_visit.pop()
+        if label in closure:
+            continue
+        if label not in compiled["nodes"]:
+            raise KeyError("No type labeled {} in dictionary".format(label))
+        closure.add(label)
+        to_visit.extend(link["target_type"] for link in compiled["links"][label])
+
+    return closure
+
 
-    for entity, subschema in dictionary.schema.items():
-        name = subschema["title"]
-        _id = subschema["id"]
-        if name not in loaded_nodes:
+def load_nodes(labels=None):
+    """Parse all nodes from dictionary and create Node subclasses
+
+    :param labels: Only create the classes for these types
+
+    """
+
+    for entity, definition in definitions["nodes"].items():
+        name = definition["title"]
+        _id = definition["id"]
+        if labels is not None and entity not in labels:
+            continue
+        if name not in loaded_nodes and not schema_registry.get_node(_id):
             try:
-                cls = NodeFactory(_id, subschema)
+                cls = NodeFactory(_id, dictionary.schema[entity], definition)
             except Exception:
                 print("Unable to load {}".format(name))
                 raise
@@ -506,90 +1158,88 @@ def parse_edge(src_label, name, edge_label, subschema, link):
 
     """
 
-    dst_label = link["target_type"]
-    backref = link["backref"]
-
-    src_label = subschema["id"]
-    if dst_label not in dictionary.schema:
-        raise RuntimeError(
-            "Destination '{}' for edge '{}' from '{}' not defined".format(
-                dst_label, name, src_label
-            )
-        )
-
-    dst_label = dictionary.schema[dst_label]["id"]
-    edge_name = "".join(map(get_class_name_from_id, [src_label, edge_label, dst_label]))
-
-    edge = EdgeFactory(
-        edge_name,
-        edge_label,
-        src_label,
-        dst_label,
-        name,
-        backref,
-    )
+    definition = compile_edge_definition(subschema["id"], name, edge_label, link)
+    edge = EdgeFactory(**definition)
 
     register_class(edge)
 
-    return "_{}_out".format(edge_name)
+    return "_{}_out".format(definition["name"])
 
 
-def load_edges():
+def load_edges(labels=None):
     """Add a dictionry of links from this class
 
     { <link name>: {'backref': <backref name>, 'type': <source type> } }
 
+    :param labels: Only create the edges from these types
+
     """
 
-    for src_label, subschema in dictionary.schema.items():
+    for src_label, links in definitions["links"].items():
+        if labels is not None and src_label not in labels:
+            continue
 
-        src_cls = Node.get_subclass(src_label)
+        src_cls = schema_registry.get_node(src_label)
         if not src_cls:
             raise RuntimeError("No source class labeled {}".format(src_label))
 
-        for name, link in get_links(subschema).items():
-            edge_label = link["label"]
-            edge_name = parse_edge(src_label, name, edge_label, subschema, link)
+        for link in links:
+            if link["name"] in src_cls._pg_links:
+                continue
+            edge = EdgeFactory(**definitions["edges"][link["edge"]])
+            register_class(edge)
             src_cls._pg_links[link["name"]] = {
-                "edge_out": edge_name,
-                "dst_type": Node.get_subclass(link["target_type"]),
+                "edge_out": "_{}_out".format(link["edge"]),
+                "dst_type": schema_registry.get_node(link["target_type"]),
             }
 
 
-def inject_pg_backrefs():
+def inject_pg_backrefs(labels=None):
     """Add a dict of links to this class.  Backrefs look like:
 
     .. code-block::
         { <link name>: {'name': <backref name>, 'src_type': <source type> } }
 
+    :param labels: Only add the backrefs of links from these types
+
     """
 
-    for src_label, subschema in dictionary.schema.items():
-        for name, link in get_links(subschema).items():
-            dst_cls = Node.get_subclass(link["target_type"])
+    for src_label, links in definitions["links"].items():
+        if labels is not None and src_label not in labels:
+            continue
+        for link in links:
+            dst_cls = schema_registry.get_node(link["target_type"])
             dst_cls._pg_backrefs[link["backref"]] = {
                 "name": link["name"],
-                "src_type": Node.get_subclass(src_label),
+                "src_type": schema_registry.get_node(src_label),
             }
 
 
-def inject_pg_edges():
+def inject_pg_edges(registry=None):
     """Add a dict of ALL the links, to and from, each class
 
     .. code-block::
         { <link name>: {'backref': <backref name>, 'type': <target type> } }
 
+    :param registry:
+        The :class:`SchemaRegistry` of the classes, defaults to
+        :data:`schema_registry`
+
     """
 
+    registry = schema_registry if registry is None else registry
+
     def find_backref(link, src_cls):
         """Given the JSON link definition and a source class :param:`src_cls`,
         return the name of the backref
 
         """
 
-        for prop, backref in link["dst_type"]._pg_backrefs.items():
-            if backref["src_type"] == cls:
-                return prop
+        # The first edge between the two classes is the one whose
+        # backref was added to the destination class first
+        edges = registry.get_edges_between(src_cls, link["dst_type"])
+        if edges:
+            return edges[0].__dst_src_assoc__
 
     def cls_inject_forward_edges(cls):
         """We should have already added the links that go OUT from this class,
@@ -619,13 +1269,90 @@ def inject_pg_edges():
                 "type": backref["src_type"],
             }
 
-    for cls in Node.get_subclasses():
+    for cls in registry.get_nodes():
         cls_inject_forward_edges(cls)
         cls_inject_backward_edges(cls)
 
 
-load_nodes()
-load_edges()
-inject_pg_backrefs()
-inject_pg_edges()
-configure_mappers()
+def get_lazy_seed(labels=None):
+    """Returns the smallest closure of types that includes an edge.
+
+    The abstract bases Node and Edge cannot be mapped without any
+    subclasses, so in lazy mode these are created at import time in
+    case the mappers are configured before any model is referenced,
+    and they are added to subsets of types without any links.
+
+    :param labels: Only consider closures within these types
+
+    """
+
+    labels = set(definitions["nodes"]) if labels is None else set(labels)
+    closures = [
+        get_link_closure([entity])
+        for entity, links in definitions["links"].items()
+        if links and entity in labels
+    ]
+    return min(closures, key=len) if closures else labels
+
+
+def load_models(types=None):
+    """Create the classes for :param:`types`, the types they link to
+    (transitively), and the edges between them, then configure their
+    mappers.
+
+    Classes that already exist are left untouched, so this can be
+    called repeatedly to add types.
+
+    :param types:
+        A list of dictionary types to create classes for, or None to
+        create classes for all types
+
+    """
+
+    labels = None if types is None else get_link_closure(types)
+
+    # Edge cannot be mapped without subclasses, see get_lazy_seed()
+    if labels is not None and not Edge.get_subclasses():
+        if not any(definitions["links"][label] for label in labels):
+            labels |= get_lazy_seed()
+
+    load_nodes(labels)
+    load_edges(labels)
+    inject_pg_backrefs(labels)
+    inject_pg_edges()
+    configure_mappers()
+
+
+def __getattr__(name):
+    """Create node and edge classes on first reference in lazy mode"""
+
+    entity = class_entities.get(name)
+    if entity is None or (allowed_types is not None and entity not in allowed_types):
+        raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+    load_models([entity])
+    if name not in globals():
+        raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+    return globals()[name]
+
+
+definitions = get_definitions()
+
+# The entity whose closure contains each class, by class name
+class_entities = {
+    remove_spaces(edge["name"]): edge["src_label"]
+    for edge in definitions["edges"].values()
+}
+class_entities.update(
+    {node["name"]: entity for entity, node in definitions["nodes"].items()}
+)
+
+# The closure of the types listed in GEN3DATAMODEL_TYPES, or None
+allowed_types = [t.strip() for t in os.environ.get(TYPES_ENV, "").split(",")]
+allowed_types = get_link_closure(filter(None, allowed_types)) or None
+
+if lazy:
+    load_models(get_lazy_seed(allowed_types))
+else:
+    load_models(allowed_types)
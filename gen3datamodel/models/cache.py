@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+"""gen3datamodel.models.cache
+----------------------------------
+
+On-disk cache for the model definitions derived from the dictionary.
+
+Deriving the class names, tablenames, links, property types and
+index names for every type in the dictionary is repeated by every
+process that imports :mod:`gen3datamodel.models`.  The result only
+depends on the dictionary and on this package, so it is written to
+disk once and re-read by every subsequent import.
+
+The cache file is keyed by a hash of the dictionary schema, the
+dictionary settings and the package version.  A cache written for a
+different dictionary (or a corrupt cache) is ignored and rebuilt.
+
+Other tables derived from the dictionary (e.g. the traversals of
+:mod:`gen3datamodel.query`) are cached alongside, under their own file
+prefix.
+
+The cache is only used if ``GEN3DATAMODEL_CACHE_DIR`` is set to a
+directory, so that importing the models never writes to the home
+directory.  Most of the import time is spent creating the classes and
+configuring the mappers, which the cache does not save (about 13ms of
+a 1.2s import with the gen3 dictionary).
+
+"""
+
+from cdislogging import get_logger
+from importlib.metadata import version, PackageNotFoundError
+
+import hashlib
+import json
+import os
+import tempfile
+
+logger = get_logger(__name__)
+
+#: Bump this when the format of the compiled definitions changes
+DEFINITIONS_FORMAT = 2
+
+CACHE_DIR_ENV = "GEN3DATAMODEL_CACHE_DIR"
+CACHE_FILE_PREFIX = "model_definitions_"
+
+
+def get_package_version():
+    """Returns the installed version of gen3datamodel, or ``unknown`` if
+    running from a source tree that was never installed.
+
+    """
+
+    try:
+        return version("gen3datamodel")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def get_cache_dir():
+    """Returns the directory to store cached definitions in, or None if
+    ``GEN3DATAMODEL_CACHE_DIR`` is unset or empty.
+
+    """
+
+    return os.environ.get(CACHE_DIR_ENV) or None
+
+
+def schema_hash(schema, settings=None):
+    """Returns a hex digest of the dictionary schema and settings."""
+
+    serialized = json.dumps(
+        {"schema": schema, "settings": settings or {}},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def get_cache_key(schema, settings=None):
+    """Returns the key that identifies definitions compiled from
+    :param:`schema` by this version of the package.
+
+    """
+
+    return "{}-{}-{}".format(
+        schema_hash(schema, settings), get_package_version(), DEFINITIONS_FORMAT
+    )
+
+
+def get_cache_path(key, cache_dir=None, prefix=CACHE_FILE_PREFIX):
+    cache_dir = cache_dir or get_cache_dir()
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, "{}{}.json".format(prefix, digest))
+
+
+def load(key, cache_dir=None, prefix=CACHE_FILE_PREFIX):
+    """Returns the definitions cached under :param:`key` or None if they
+    are missing or stale.
+
+    """
+
+    cache_dir = cache_dir or get_cache_dir()
+    if not cache_dir:
+        return None
+
+    path = get_cache_path(key, cache_dir, prefix)
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (IOError, OSError):
+        return None
+    except ValueError:
+        logger.warning("Ignoring corrupt model definition cache {}".format(path))
+        return None
+
+    if not isinstance(cached, dict) or cached.get("key") != key:
+        logger.info("Ignoring stale model definition cache {}".format(path))
+        return None
+
+    return cached.get("definitions")
+
+
+def dump(key, definitions, cache_dir=None, prefix=CACHE_FILE_PREFIX):
+    """Writes :param:`definitions` to the cache under :param:`key`.
+
+    The file is written to a temporary file first and moved into
+    place so that concurrently starting processes never read a
+    partial cache.  Failure to write the cache is not fatal.
+
+    """
+
+    cache_dir = cache_dir or get_cache_dir()
+    if not cache_dir:
+        return None
+
+    path = get_cache_path(key, cache_dir, prefix)
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"key": key, "definitions": definitions}, f)
+        os.replace(tmp_path, path)
+    except (IOError, OSError, TypeError, ValueError) as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        logger.warning("Unable to write model definition cache {}: {}".format(path, e))
+        return None
+
+    return path
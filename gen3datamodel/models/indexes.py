@@ -32,7 +32,16 @@ def index_name(cls, description):
 
     """
 
-    name = "index_{}_{}".format(cls.__tablename__, description)
+    return get_index_name(cls.__tablename__, cls.label, description)
+
+
+def get_index_name(tablename, label, description):
+    """See :func:`index_name`, this takes the table name and label of the
+    class so that names can be computed before the class exists.
+
+    """
+
+    name = "index_{}_{}".format(tablename, description)
 
     # If the name is too long, prepend it with the first 8 hex of it's hash
     # truncate the each part of the name
@@ -42,10 +51,10 @@ def index_name(cls, description):
         name = "index_{}_{}_{}".format(
             str(
                 hashlib.md5(
-                    cls.__tablename__.encode("utf-8"), usedforsecurity=False
+                    tablename.encode("utf-8"), usedforsecurity=False
                 ).hexdigest()
             )[:8],
-            "".join([a[:4] for a in cls.label.split("_")])[:20],
+            "".join([a[:4] for a in label.split("_")])[:20],
             "_".join([a[:8] for a in description.split("_")])[:25],
         )
 
@@ -54,7 +63,24 @@ def index_name(cls, description):
     return name
 
 
-def get_secondary_key_indexes(cls):
+def get_secondary_key_index_descriptions(secondary_keys):
+    """Returns the descriptions used to name the indexes created by
+    :func:`get_secondary_key_indexes` for the given secondary keys
+
+    """
+
+    descriptions = []
+    for keys in secondary_keys:
+        descriptions.extend(keys)
+    for keys in secondary_keys:
+        descriptions.extend(key + "_lower" for key in keys)
+    for keys in secondary_keys:
+        if len(keys) > 1:
+            descriptions.append("_".join(keys) + "_uniq")
+    return descriptions
+
+
+def get_secondary_key_indexes(cls, index_names=None):
     """Returns tuple of indexes on the secondary keys on the class
 
     ..note:: THIS MUST BE CALLED AFTER `cls_inject_secondary_keys()`
@@ -62,14 +88,23 @@ def get_secondary_key_indexes(cls):
     - cls._props[key].astext
     - lower(cls._props[key].astext)
 
+    :param index_names:
+        Optional ``{description: name}`` of precomputed index names,
+        missing names are computed with :func:`index_name`
+
     """
 
+    index_names = index_names or {}
+
+    def name(description):
+        return index_names.get(description) or index_name(cls, description)
+
     #: use text_pattern_ops, allows LIKE statements not starting with %
     index_op = "text_pattern_ops"
 
     key_indexes = (
         Index(
-            index_name(cls, key),
+            name(key),
             cls._props[key].astext.label(key),
             postgresql_ops={key: index_op},
             unique=len(keys) == 1,
@@ -80,7 +115,7 @@ def get_secondary_key_indexes(cls):
 
     lower_key_indexes = (
         Index(
-            index_name(cls, key + "_lower"),
+            name(key + "_lower"),
             func.lower(cls._props[key].astext).label(key + "_lower"),
             postgresql_ops={key + "_lower": index_op},
         )
@@ -92,7 +127,7 @@ def get_secondary_key_indexes(cls):
     # semantically supposed to be unique locally
     unique_indexes = (
         Index(
-            index_name(cls, "_".join(keys) + "_uniq"),
+            name("_".join(keys) + "_uniq"),
             *(func.lower(cls._props[key].astext).label(key) for key in keys),
             postgresql_ops=dict((key, index_op) for key in keys),
             unique=True  # https://bugs.python.org/issue9232
@@ -104,6 +139,28 @@ def get_secondary_key_indexes(cls):
     return tuple(key_indexes) + tuple(lower_key_indexes) + tuple(unique_indexes)
 
 
+def get_promoted_property_indexes(cls, index_names=None):
+    """Returns tuple of btree indexes on the columns of promoted properties
+
+    ..note:: THIS MUST BE CALLED AFTER `cls_inject_promoted_properties()`
+
+    :param index_names:
+        Optional ``{description: name}`` of precomputed index names,
+        missing names are computed with :func:`index_name`
+
+    """
+
+    index_names = index_names or {}
+
+    def name(description):
+        return index_names.get(description) or index_name(cls, description)
+
+    return tuple(
+        Index(name(key + "_promoted"), column)
+        for key, column in cls._pg_promoted_columns.items()
+    )
+
+
 def cls_add_indexes(cls, indexes):
     """Add indexes to given class"""
 
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+"""gen3datamodel.models.namespaces
+----------------------------------
+
+Model classes for more than one dictionary in the same process.
+
+:mod:`gen3datamodel.models` creates the classes for the dictionary
+installed with the package.  :func:`build_models` creates an
+independent set of classes for any other dictionary::
+
+    commons = build_models(other_dictionary, namespace="commons_b")
+    commons.Case
+    commons.schema_registry.get_node("case")
+
+The classes of a namespace are named with the namespace as a prefix,
+e.g. ``CommonsBCase``, because psqlgraph pairs edges with nodes by
+class name.  Their tables are in the PostgreSQL schema named after the
+namespace.  The classes, definitions and registry of a namespace only
+contain its own classes.
+
+The tables of a namespace are in its own ``MetaData``, so creating the
+tables of the default models (e.g. ``psqlgraph.create_all``) leaves
+them out.  They are created with::
+
+    engine.execute(CreateSchema("commons_b"))
+    commons.metadata.create_all(engine)
+
+psqlgraph's lookups by label (e.g. ``Node.get_subclass('case')``,
+``Node.from_json``) still return the first class created with the
+label, and polymorphic queries against Node include every namespace.
+
+"""
+
+from collections import defaultdict
+from sqlalchemy import MetaData
+from sqlalchemy.orm import configure_mappers
+
+import copy
+import re
+
+from gen3datamodel import models
+from . import cache
+from .registry import SchemaRegistry
+
+# Namespaces are used as PostgreSQL schema names and class name prefixes
+NAMESPACE_RE = re.compile(r"^[a-z][a-z0-9_]*$")
+
+#: The namespaces built so far, by name
+namespaces = {}
+
+
+def get_namespace_definitions(dictionary, namespace):
+    """Returns the compiled definitions of :param:`dictionary` with the
+    class names prefixed and the tables in the schema :param:`namespace`.
+
+    """
+
+    settings = getattr(dictionary, "settings", None) or {}
+    key = definitions = None
+    if cache.get_cache_dir():
+        key = cache.get_cache_key(dictionary.schema, settings)
+        definitions = cache.load(key)
+    if definitions is None:
+        definitions = models.compile_definitions(
+            dictionary.schema, settings.get("promoted_properties", [])
+        )
+        if key is not None:
+            cache.dump(key, definitions)
+    definitions = copy.deepcopy(definitions)
+
+    prefix = models.get_class_name_from_id(namespace)
+    for node in definitions["nodes"].values():
+        node["name"] = prefix + node["name"]
+        node["schema"] = namespace
+    for edge in definitions["edges"].values():
+        edge["name"] = prefix + edge["name"]
+
+    return definitions
+
+
+class ModelNamespace(object):
+    """The model classes created from one dictionary.  Classes are
+    attributes of the namespace by their unprefixed name.
+
+    :param dictionary: An object with the ``schema`` and ``settings``
+        of a dictionary, like :mod:`dictionaryutils.dictionary`
+    :param namespace: The name of the namespace
+
+    """
+
+    def __init__(self, dictionary, namespace):
+        self.dictionary = dictionary
+        self.namespace = namespace
+        self.class_prefix = models.get_class_name_from_id(namespace)
+        self.definitions = get_namespace_definitions(dictionary, namespace)
+        self.schema_registry = SchemaRegistry()
+        self.metadata = MetaData()
+        self.classes = {}
+        self._assigned_association_proxies = defaultdict(set)
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["classes"][name]
+        except KeyError:
+            raise AttributeError(
+                "Model namespace {} has no attribute {}".format(
+                    self.__dict__.get("namespace"), name
+                )
+            )
+
+    def register_class(self, cls):
+        self.classes[cls.__name__[len(self.class_prefix) :]] = cls
+        self.schema_registry.add(cls)
+
+    def load_nodes(self, labels=None):
+        for entity, definition in self.definitions["nodes"].items():
+            if labels is not None and entity not in labels:
+                continue
+            if self.schema_registry.get_node(definition["id"]):
+                continue
+            cls = models.NodeFactory(
+                definition["id"],
+                self.dictionary.schema[entity],
+                definition,
+                metadata=self.metadata,
+            )
+            self.register_class(cls)
+
+    def load_edges(self, labels=None):
+        for src_label, links in self.definitions["links"].items():
+            if labels is not None and src_label not in labels:
+                continue
+
+            src_cls = self.schema_registry.get_node(src_label)
+            for link in links:
+                if link["name"] in src_cls._pg_links:
+                    continue
+                definition = self.definitions["edges"][link["edge"]]
+                edge = models.EdgeFactory(
+                    registry=self.schema_registry,
+                    schema=self.namespace,
+                    metadata=self.metadata,
+                    _assigned_association_proxies=self._assigned_association_proxies,
+                    **definition
+                )
+                self.register_class(edge)
+                src_cls._pg_links[link["name"]] = {
+                    "edge_out": "_{}_out".format(definition["name"]),
+                    "dst_type": self.schema_registry.get_node(link["target_type"]),
+                }
+
+    def inject_pg_backrefs(self, labels=None):
+        for src_label, links in self.definitions["links"].items():
+            if labels is not None and src_label not in labels:
+                continue
+            for link in links:
+                dst_cls = self.schema_registry.get_node(link["target_type"])
+                dst_cls._pg_backrefs[link["backref"]] = {
+                    "name": link["name"],
+                    "src_type": self.schema_registry.get_node(src_label),
+                }
+
+    def load_models(self, types=None):
+        """Create the classes for :param:`types` and the types they link
+        to, or for every type, see :func:`gen3datamodel.models.load_models`
+
+        """
+
+        labels = None
+        if types is not None:
+            labels = models.get_link_closure(types, self.definitions)
+
+        self.load_nodes(labels)
+        self.load_edges(labels)
+        self.inject_pg_backrefs(labels)
+        models.inject_pg_edges(self.schema_registry)
+        configure_mappers()
+
+
+def build_models(dictionary, namespace, types=None):
+    """Returns the :class:`ModelNamespace` for :param:`dictionary`,
+    creating the classes for :param:`types` (and the types they link
+    to) or for every type.  Calling this again for the same namespace
+    adds classes to it.
+
+    :raises: ValueError if :param:`namespace` is not a valid name or
+        was built from another dictionary
+
+    """
+
+    if not NAMESPACE_RE.match(namespace):
+        raise ValueError(
+            "Namespace {} has to be lowercase letters, digits and "
+            "underscores".format(namespace)
+        )
+
+    models_namespace = namespaces.get(namespace)
+    if models_namespace is None:
+        models_namespace = namespaces[namespace] = ModelNamespace(dictionary, namespace)
+    elif models_namespace.dictionary is not dictionary:
+        raise ValueError(
+            "Namespace {} was built from another dictionary".format(namespace)
+        )
+
+    models_namespace.load_models(types)
+    return models_namespace
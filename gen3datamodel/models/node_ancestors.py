@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.models.node_ancestors
+----------------------------------
+
+Optional closure table of the graph: a row for every node and every
+node it reaches by following edges from source to destination (e.g.
+from an aliquot to its sample, case, experiment, project and program),
+with the number of edges on the shortest such path.
+
+The table is created and filled by the ``node-ancestors-rebuild``
+subcommand of :mod:`gen3datamodel.gdc_postgres_admin`.  Calling
+:func:`maintain_node_ancestors` keeps it current as edges of the
+dictionary's models are inserted and deleted through the ORM; bulk
+changes made outside of the ORM need a rebuild.
+
+"""
+
+from sqlalchemy import Column, Index, Integer, Text, and_, event, literal, select
+from sqlalchemy import text, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.declarative import declarative_base
+
+from psqlgraph import Edge
+
+
+Base = declarative_base()
+
+
+class NodeAncestor(Base):
+
+    __tablename__ = "node_ancestors"
+    __table_args__ = (
+        Index("node_ancestors_ancestor_id_depth_idx", "ancestor_id", "depth"),
+    )
+
+    def __repr__(self):
+        return "<NodeAncestor(descendant_id='{}', ancestor_id='{}', depth={})>".format(
+            self.descendant_id, self.ancestor_id, self.depth
+        )
+
+    descendant_id = Column(Text, primary_key=True)
+
+    ancestor_id = Column(Text, primary_key=True)
+
+    ancestor_label = Column(Text, nullable=False)
+
+    depth = Column(Integer, nullable=False)
+
+
+ADD_ANCESTORS_SQL = text(
+    """
+INSERT INTO node_ancestors (descendant_id, ancestor_id, ancestor_label, depth)
+SELECT descendants.descendant_id, ancestors.ancestor_id,
+       ancestors.ancestor_label, descendants.depth + ancestors.depth + 1
+FROM (
+    SELECT CAST(:src_id AS TEXT) AS descendant_id, 0 AS depth
+    UNION ALL
+    SELECT descendant_id, depth FROM node_ancestors WHERE ancestor_id = :src_id
+) AS descendants, (
+    SELECT CAST(:dst_id AS TEXT) AS ancestor_id,
+           CAST(:dst_label AS TEXT) AS ancestor_label, 0 AS depth
+    UNION ALL
+    SELECT ancestor_id, ancestor_label, depth
+    FROM node_ancestors WHERE descendant_id = :dst_id
+) AS ancestors
+WHERE descendants.descendant_id != ancestors.ancestor_id
+ON CONFLICT (descendant_id, ancestor_id)
+DO UPDATE SET depth = LEAST(node_ancestors.depth, EXCLUDED.depth)
+"""
+)
+
+
+def get_registry(registry=None):
+    if registry is None:
+        from gen3datamodel.models import schema_registry as registry
+    return registry
+
+
+def get_edges_select(registry=None):
+    """Returns a select of ``src_id, dst_id, dst_label`` of the edges of
+    every edge class in :param:`registry`
+
+    """
+
+    registry = get_registry(registry)
+    return union_all(
+        *[
+            select(
+                [
+                    edge.__table__.c.src_id,
+                    edge.__table__.c.dst_id,
+                    literal(registry.get_node_named(edge.__dst_class__).label).label(
+                        "dst_label"
+                    ),
+                ]
+            )
+            for edge in registry.get_edges()
+        ]
+    ).alias("edges")
+
+
+def fill_node_ancestors(connection, descendant_ids=None, registry=None):
+    """Inserts the ancestors of :param:`descendant_ids`, or of every node,
+    one depth at a time so that each pair is inserted with the depth of
+    the shortest path between them.  Existing rows are kept.
+
+    :returns: the number of rows inserted
+
+    """
+
+    from gen3datamodel.query import any_id
+
+    table = NodeAncestor.__table__
+    edges = get_edges_select(registry)
+
+    def insert_rows(rows):
+        # Pairs that already have a row were found at a lower depth
+        statement = insert(table).from_select(
+            ["descendant_id", "ancestor_id", "ancestor_label", "depth"], rows
+        )
+        return connection.execute(statement.on_conflict_do_nothing()).rowcount
+
+    rows = select(
+        [edges.c.src_id, edges.c.dst_id, edges.c.dst_label, literal(1)]
+    ).where(edges.c.src_id != edges.c.dst_id)
+    if descendant_ids is not None:
+        rows = rows.where(any_id(edges.c.src_id, descendant_ids))
+    inserted = count = insert_rows(rows)
+
+    depth = 1
+    while count:
+        rows = select(
+            [
+                table.c.descendant_id,
+                edges.c.dst_id,
+                edges.c.dst_label,
+                literal(depth + 1),
+            ]
+        ).where(
+            and_(
+                table.c.depth == depth,
+                edges.c.src_id == table.c.ancestor_id,
+                table.c.descendant_id != edges.c.dst_id,
+            )
+        )
+        if descendant_ids is not None:
+            rows = rows.where(any_id(table.c.descendant_id, descendant_ids))
+        count = insert_rows(rows)
+        inserted += count
+        depth += 1
+
+    return inserted
+
+
+def rebuild_node_ancestors(connection, registry=None):
+    """Creates the table if needed and refills it from the edges
+
+    :returns: the number of rows inserted
+
+    """
+
+    Base.metadata.create_all(connection)
+    connection.execute(NodeAncestor.__table__.delete())
+    return fill_node_ancestors(connection, registry=registry)
+
+
+def add_node_ancestors(mapper, connection, edge):
+    """Adds the destination of :param:`edge` and its ancestors to the
+    ancestors of the source and its descendants
+
+    """
+
+    registry = get_registry()
+    if edge.__class__.__name__ not in registry.edges_by_name:
+        return
+
+    connection.execute(
+        ADD_ANCESTORS_SQL,
+        src_id=edge.src_id,
+        dst_id=edge.dst_id,
+        dst_label=registry.get_node_named(edge.__dst_class__).label,
+    )
+
+
+def remove_node_ancestors(mapper, connection, edge):
+    """Recomputes the ancestors of the source of :param:`edge` and its
+    descendants, which may still reach some of them by other edges
+
+    """
+
+    from gen3datamodel.query import any_id
+
+    registry = get_registry()
+    if edge.__class__.__name__ not in registry.edges_by_name:
+        return
+
+    table = NodeAncestor.__table__
+    descendant_ids = [edge.src_id] + [
+        row.descendant_id
+        for row in connection.execute(
+            select([table.c.descendant_id]).where(table.c.ancestor_id == edge.src_id)
+        )
+    ]
+    connection.execute(
+        table.delete().where(any_id(table.c.descendant_id, descendant_ids))
+    )
+    fill_node_ancestors(connection, descendant_ids, registry)
+
+
+LISTENERS = (
+    ("after_insert", add_node_ancestors),
+    ("after_delete", remove_node_ancestors),
+)
+
+
+def maintain_node_ancestors(enabled=True):
+    """Keeps ``node_ancestors`` current as edges are inserted and deleted
+    through the ORM, or stops doing so if :param:`enabled` is False.
+    Calling this again has no effect.
+
+    """
+
+    for name, listener in LISTENERS:
+        if enabled and not event.contains(Edge, name, listener):
+            event.listen(Edge, name, listener, propagate=True)
+        elif not enabled and event.contains(Edge, name, listener):
+            event.remove(Edge, name, listener)
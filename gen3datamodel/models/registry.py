@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""gen3datamodel.models.registry
+----------------------------------
+
+Index of the node and edge classes created from the dictionary.
+
+:class:`psqlgraph.Node` and :class:`psqlgraph.Edge` look subclasses up
+by scanning ``__subclasses__()``, so code that resolves a class for
+every edge (building traversals, planning the case cache) is quadratic
+in the size of the dictionary.  The registry is filled in as classes
+are created and answers the same lookups from dictionaries.
+
+"""
+
+from collections import defaultdict
+
+from psqlgraph import Node, Edge
+
+
+def get_class_name(cls):
+    """Returns the name of :param:`cls`, which may already be a name"""
+
+    return cls if isinstance(cls, str) else cls.__name__
+
+
+class SchemaRegistry(object):
+    """Maps labels and class names to node classes, and source and
+    destination classes to edge classes.
+
+    Lookups by class also accept the class name.
+
+    :param classes: Node and Edge subclasses to register
+
+    """
+
+    def __init__(self, classes=()):
+        self.nodes_by_label = {}
+        self.nodes_by_name = {}
+        self.edges_by_name = {}
+        self.edges_by_src_dst = defaultdict(list)
+        self.edges_by_src = defaultdict(list)
+        self.edges_by_dst = defaultdict(list)
+
+        for cls in classes:
+            self.add(cls)
+
+    def add(self, cls):
+        """Registers a Node or Edge subclass, other classes are ignored"""
+
+        if issubclass(cls, Node):
+            self.add_node(cls)
+        elif issubclass(cls, Edge):
+            self.add_edge(cls)
+
+    def add_node(self, cls):
+        self.nodes_by_label.setdefault(cls.get_label(), cls)
+        self.nodes_by_name.setdefault(cls.__name__, cls)
+
+    def add_edge(self, cls):
+        if cls.__name__ in self.edges_by_name:
+            return
+
+        self.edges_by_name[cls.__name__] = cls
+        self.edges_by_src_dst[cls.__src_class__, cls.__dst_class__].append(cls)
+        self.edges_by_src[cls.__src_class__].append(cls)
+        self.edges_by_dst[cls.__dst_class__].append(cls)
+
+    def get_node(self, label):
+        """Returns the node class labeled :param:`label` or None"""
+
+        return self.nodes_by_label.get(label)
+
+    def get_node_named(self, name):
+        """Returns the node class named :param:`name`
+
+        :raises: KeyError if there is no such class
+
+        """
+
+        try:
+            return self.nodes_by_name[name]
+        except KeyError:
+            raise KeyError("Node has no subclass named {}".format(name))
+
+    def get_nodes(self):
+        return list(self.nodes_by_name.values())
+
+    def get_edges(self):
+        return list(self.edges_by_name.values())
+
+    def get_edges_between(self, src, dst):
+        """Returns the edge classes from :param:`src` to :param:`dst`
+        (directionality matters) in the order they were created
+
+        """
+
+        key = (get_class_name(src), get_class_name(dst))
+        return list(self.edges_by_src_dst.get(key, ()))
+
+    def get_edges_out(self, src):
+        """Returns the edge classes from :param:`src`"""
+
+        return list(self.edges_by_src.get(get_class_name(src), ()))
+
+    def get_edges_in(self, dst):
+        """Returns the edge classes to :param:`dst`"""
+
+        return list(self.edges_by_dst.get(get_class_name(dst), ()))
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.prefetch
+----------------------------------
+
+Loads the nodes along link paths for many nodes at once.
+
+Reading ``case.samples`` lazily loads the edges between the case and
+its samples, and then each sample, so serializing nodes with their
+neighbors issues queries per node.  :func:`prefetch` loads each link
+of the paths with one query for all the nodes it starts from and fills
+in the relationships::
+
+    cases = g.nodes(md.Case).props(project_id="A-B").all()
+    prefetch(g.current_session(), cases, ["samples.aliquots", "diagnoses"])
+    for case in cases:
+        for sample in case.samples:  # no query
+            sample.aliquots  # no query
+
+"""
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from gen3datamodel.query import any_id
+
+
+class LinkFetch(object):
+    """How to load the link :param:`name` of :param:`cls`: the
+    relationship to the edges, the edge class, and the edge's
+    relationships to the node the link starts from and to its neighbor
+
+    """
+
+    def __init__(self, cls, name):
+        if name not in cls._pg_edges:
+            raise ValueError("{} has no link {}".format(cls.__name__, name))
+
+        proxy = getattr(cls, name)
+        self.name = name
+        self.relationship = proxy.target_collection
+        prop = inspect(cls).relationships[self.relationship]
+        self.edge_cls = prop.mapper.class_
+        self.this_attr = prop.back_populates
+        self.neighbor_attr = proxy.value_attr
+        self.neighbor_cls = cls._pg_edges[name]["type"]
+        self.links = {}
+
+    def __repr__(self):
+        return "<LinkFetch({} via {}, {})>".format(
+            self.name, self.edge_cls.__name__, sorted(self.links)
+        )
+
+
+def get_fetch_plan(cls, paths):
+    """Returns ``{<link name>: LinkFetch}`` for the dotted link
+    :param:`paths` from :param:`cls`, the links after each one nested
+    in its ``links``
+
+    :raises: ValueError if a path has a link that doesn't exist
+
+    """
+
+    plan = {}
+    for path in paths:
+        links, link_cls = plan, cls
+        for name in path.split("."):
+            if name not in links:
+                links[name] = LinkFetch(link_cls, name)
+            link_cls = links[name].neighbor_cls
+            links = links[name].links
+    return plan
+
+
+def fetch_links(session, nodes, plan):
+    """Loads the links in :param:`plan` for :param:`nodes`, with one
+    query per link (binding the ids as one array), and then the links
+    that follow them
+
+    """
+
+    if not nodes:
+        return
+
+    by_id = {node.node_id: node for node in nodes}
+    for fetch in plan.values():
+        edge_cls = fetch.edge_cls
+        this_id = getattr(edge_cls, fetch.this_attr + "_id")
+        edges = (
+            session.query(edge_cls)
+            .filter(any_id(this_id, by_id))
+            .options(joinedload(getattr(edge_cls, fetch.neighbor_attr)))
+            .all()
+        )
+
+        node_edges = {node_id: [] for node_id in by_id}
+        for edge in edges:
+            node_id = getattr(edge, fetch.this_attr + "_id")
+            set_committed_value(edge, fetch.this_attr, by_id[node_id])
+            node_edges[node_id].append(edge)
+        for node_id, loaded in node_edges.items():
+            set_committed_value(by_id[node_id], fetch.relationship, loaded)
+
+        neighbors = {}
+        for edge in edges:
+            neighbor = getattr(edge, fetch.neighbor_attr)
+            neighbors[neighbor.node_id] = neighbor
+        fetch_links(session, list(neighbors.values()), fetch.links)
+
+
+def prefetch(session, nodes, paths):
+    """Loads the nodes along the dotted link :param:`paths` (e.g.
+    ``samples.aliquots``) from :param:`nodes`, which have to be of one
+    class, with one query per link of the paths.
+
+    :returns: :param:`nodes`
+    :raises: ValueError if a path has a link that doesn't exist
+
+    """
+
+    nodes = list(nodes)
+    if nodes:
+        classes = {node.__class__ for node in nodes}
+        if len(classes) > 1:
+            raise ValueError(
+                "Can only prefetch for nodes of one class, not {}".format(
+                    sorted(cls.__name__ for cls in classes)
+                )
+            )
+        fetch_links(session, nodes, get_fetch_plan(classes.pop(), paths))
+    return nodes
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.profile_import
+----------------------------------
+
+Reports the wall time and memory allocated by each phase of creating
+the model classes, and by the factories for each class, as JSON::
+
+    python -m gen3datamodel.profile_import --output import_profile.json
+
+The models are imported the default (eager) way: the module is run up
+to the point where it creates the classes (the ``import`` phase), and
+the functions it then calls are wrapped so that each is measured as it
+runs.  ``configure_mappers`` configures the mappers of all classes at
+once, so it is reported as its own phase and not per class.
+``GEN3DATAMODEL_TYPES`` is honored, ``GEN3DATAMODEL_LAZY`` is ignored.
+Classes that exist before the factories run are listed under
+``created_at_import``.
+
+Factory timings are inclusive: ``NodeFactory`` includes
+``cls_inject_secondary_keys``, which includes ``cls_add_indexes``.
+Factories called more than once for a class (e.g. ``cls_add_indexes``
+for the secondary keys and for the promoted properties) are summed,
+with the number of calls under ``calls``.
+
+"""
+
+import argparse
+import ast
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from collections import defaultdict
+from functools import wraps
+
+FACTORIES = (
+    "NodeFactory",
+    "EdgeFactory",
+    "cls_inject_secondary_keys",
+    "cls_add_indexes",
+)
+
+PHASES = (
+    "get_definitions",
+    "load_nodes",
+    "load_edges",
+    "inject_pg_backrefs",
+    "inject_pg_edges",
+    "configure_mappers",
+)
+
+MODELS_MODULE = "gen3datamodel.models"
+
+
+def accumulate(total, measurement):
+    """Adds :param:`measurement` to :param:`total`, keeping the largest
+    peak
+
+    """
+
+    for key, value in measurement.items():
+        if key == "peak_bytes":
+            total[key] = max(total.get(key, value), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    total["calls"] = total.get("calls", 0) + 1
+    return total
+
+
+def split_models_module(spec):
+    """Returns the compiled statements of the models module before and
+    from the point where it loads the definitions and creates the classes
+
+    """
+
+    source = spec.loader.get_source(spec.name)
+    tree = ast.parse(source, spec.origin)
+    for index, statement in enumerate(tree.body):
+        if isinstance(statement, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "definitions"
+            for target in statement.targets
+        ):
+            break
+    else:
+        raise RuntimeError("{} does not load its definitions".format(spec.name))
+
+    def compile_statements(statements):
+        module = ast.Module(body=statements, type_ignores=[])
+        return compile(module, spec.origin, "exec")
+
+    return compile_statements(tree.body[:index]), compile_statements(tree.body[index:])
+
+
+class ImportProfiler(object):
+    """Measures calls and accumulates the results.
+
+    :param trace_memory:
+        Whether to measure allocations with :mod:`tracemalloc`, which
+        slows down everything it measures
+
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.classes = defaultdict(dict)
+
+    def measure(self, fn, *args, **kwargs):
+        """Returns the result of calling :param:`fn` and its measurements,
+        including the peak memory above the starting point.
+
+        """
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+
+        result, measurement = self.measure_nested(fn, *args, **kwargs)
+
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            measurement["peak_bytes"] = peak - before
+
+        return result, measurement
+
+    def measure_nested(self, fn, *args, **kwargs):
+        """Returns the result of calling :param:`fn` and its measurements.
+        This does not reset the peak memory of enclosing measurements.
+
+        """
+
+        if self.trace_memory:
+            before, _ = tracemalloc.get_traced_memory()
+
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        measurement = {"seconds": time.perf_counter() - start}
+
+        if self.trace_memory:
+            after, _ = tracemalloc.get_traced_memory()
+            measurement["allocated_bytes"] = after - before
+
+        return result, measurement
+
+    def wrap_factory(self, name, factory, get_class_name):
+        """Returns :param:`factory` wrapped to record each call per class"""
+
+        @wraps(factory)
+        def wrapper(*args, **kwargs):
+            result, measurement = self.measure_nested(factory, *args, **kwargs)
+            class_measurements = self.classes[get_class_name(*args, **kwargs)]
+            accumulate(class_measurements.setdefault(name, {}), measurement)
+            return result
+
+        return wrapper
+
+    def wrap_phase(self, name, fn):
+        """Returns :param:`fn` wrapped to record its calls as a phase"""
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            result, measurement = self.measure(fn, *args, **kwargs)
+            accumulate(self.phases.setdefault(name, {}), measurement)
+            return result
+
+        return wrapper
+
+    def run(self):
+        """Imports the models and profiles creating all classes"""
+
+        if MODELS_MODULE in sys.modules:
+            raise RuntimeError(
+                "{} was imported before the profiler ran".format(MODELS_MODULE)
+            )
+
+        os.environ.pop("GEN3DATAMODEL_LAZY", None)
+        if self.trace_memory:
+            tracemalloc.start()
+
+        from psqlgraph import Node, Edge
+
+        import gen3datamodel
+
+        spec = importlib.util.find_spec(MODELS_MODULE)
+        head, tail = split_models_module(spec)
+        models = importlib.util.module_from_spec(spec)
+        sys.modules[MODELS_MODULE] = models
+        gen3datamodel.models = models
+
+        _, self.phases["import"] = self.measure(exec, head, models.__dict__)
+        created_at_import = sorted(
+            c.__name__ for c in Node.get_subclasses() + Edge.get_subclasses()
+        )
+
+        class_names = {
+            "NodeFactory": lambda _id, *a, **kw: models.get_class_name_from_id(_id),
+            "EdgeFactory": lambda name, *a, **kw: models.remove_spaces(name),
+            "cls_inject_secondary_keys": lambda cls, *a, **kw: cls.__name__,
+            "cls_add_indexes": lambda cls, *a, **kw: cls.__name__,
+        }
+        for name in FACTORIES:
+            factory = self.wrap_factory(name, getattr(models, name), class_names[name])
+            setattr(models, name, factory)
+        for name in PHASES:
+            setattr(models, name, self.wrap_phase(name, getattr(models, name)))
+
+        _, self.phases["load_models"] = self.measure(exec, tail, models.__dict__)
+
+        if self.trace_memory:
+            tracemalloc.stop()
+
+        return {
+            "dictionary_hash": models.cache.schema_hash(
+                models.dictionary.schema,
+                getattr(models.dictionary, "settings", None),
+            ),
+            "package_version": models.cache.get_package_version(),
+            "python_version": platform.python_version(),
+            "node_count": len(Node.get_subclasses()),
+            "edge_count": len(Edge.get_subclasses()),
+            "created_at_import": created_at_import,
+            "phases": self.phases,
+            "classes": dict(self.classes),
+        }
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="Profile the creation of the gen3datamodel model classes"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        action="store",
+        help="File to write the JSON report to, defaults to stdout",
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        default=False,
+        help="Only measure wall time, tracing allocations slows the import down",
+    )
+    return parser
+
+
+def main(args=None):
+    args = args or get_parser().parse_args()
+
+    report = ImportProfiler(trace_memory=not args.no_memory).run()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,52 @@
-from psqlgraph import Node, Edge
+"""
+gen3datamodel.query
+----------------------------------
+
+Queries along the traversals between node types.
+
+The traversals are built from the links in the dictionary, without
+the model classes, for each source type on first use.  The table for
+every type can be built ahead of time and cached on disk (e.g. while
+building an image, with ``GEN3DATAMODEL_CACHE_DIR`` set), see
+:mod:`gen3datamodel.models.cache`, with::
+
+    python -m gen3datamodel.query build-traversals
+
+The first query then reads the cached table instead.  The table only
+depends on the dictionary, ``GEN3DATAMODEL_TYPES`` and this package.
+
+Reports how PostgreSQL executes the traversals between two types,
+whole and path by path, with::
+
+    python -m gen3datamodel.query explain aliquot case -H localhost ...
+
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+
+from sqlalchemy import Integer, Text, and_, any_, bindparam, exists, false, literal
+from sqlalchemy import not_, select, union, union_all
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from gen3datamodel import models
+from gen3datamodel.models import cache, schema_registry
+from gen3datamodel.models.node_ancestors import NodeAncestor
+
+#: Bump this when the format of the cached traversals changes
+TRAVERSALS_FORMAT = 1
+TRAVERSALS_FILE_PREFIX = "traversals_"
+
+#: How :func:`union_subq_path` can express the traversals in SQL
+STRATEGIES = ("union", "recursive", "trie")
 
 traversals = {}
+# Whether the cached traversals have been looked for
+traversals_loaded = False
 terminal_nodes = [
     "annotations",
     "centers",
@@ -27,65 +73,873 @@ terminal_nodes = [
 ]
 
 
+def is_terminal(name):
+    """Returns whether traversals may not continue past a step along the
+    link :param:`name` (or, for the first step, into the type labeled
+    :param:`name`)
+
+    """
+
+    return name in terminal_nodes or name.startswith("_related")
+
+
+def get_adjacency(labels=None, compiled=None):
+    """Returns the links of every type, in both directions, as
+    ``{<label>: [(<link name>, <neighbor label>, <is terminal>)]}``
+
+    The links are read from the compiled definitions, so the classes
+    don't have to exist.
+
+    :param labels: Only the types with these labels and the links
+        between them, defaults to :data:`models.allowed_types` (every
+        type if None)
+    :param compiled: The definitions to read, defaults to
+        :data:`models.definitions`
+
+    """
+
+    compiled = models.definitions if compiled is None else compiled
+    labels = models.allowed_types if labels is None else labels
+    ids = {
+        entity: node["id"]
+        for entity, node in compiled["nodes"].items()
+        if labels is None or entity in labels
+    }
+
+    adjacency = {label: [] for label in ids.values()}
+    for entity, links in compiled["links"].items():
+        for link in links if entity in ids else ():
+            if link["target_type"] not in ids:
+                continue
+            src, dst = ids[entity], ids[link["target_type"]]
+            name = models.remove_spaces(link["name"])
+            backref = models.remove_spaces(link["backref"])
+            adjacency[src].append((name, dst, is_terminal(name)))
+            adjacency[dst].append((backref, src, is_terminal(backref)))
+    return adjacency
+
+
+def get_paths(adjacency, start, visited=(), path=()):
+    """Returns ``{<label>: {<path>}}`` of the paths from the type labeled
+    :param:`start` that don't visit a type twice and don't pass through
+    terminal links.
+
+    The walk is depth first over :param:`adjacency` (see
+    :func:`get_adjacency`) with a single stack, so each path costs one
+    string concatenation, and steps along terminal links are recorded
+    without being walked.
+
+    :param visited: labels of types the paths may not visit
+    :param path: the links already walked to reach :param:`start`
+
+    """
+
+    prefix = ".".join(path)
+    paths = {start: {prefix}}
+    if path and is_terminal(path[-1]):
+        return paths
+
+    neighbors = adjacency[start]
+    if not path:
+        # The first step may not lead into a terminal type
+        neighbors = [n for n in neighbors if not is_terminal(n[1])]
+
+    on_path = set(visited)
+    on_path.add(start)
+
+    stack = [(start, prefix + "." if path else "", iter(neighbors))]
+    while stack:
+        label, prefix, neighbors = stack[-1]
+        for name, neighbor, terminal in neighbors:
+            if neighbor in on_path:
+                continue
+
+            neighbor_path = prefix + name
+            try:
+                paths[neighbor].add(neighbor_path)
+            except KeyError:
+                paths[neighbor] = {neighbor_path}
+
+            if not terminal:
+                on_path.add(neighbor)
+                stack.append((neighbor, neighbor_path + ".", iter(adjacency[neighbor])))
+                break
+        else:
+            stack.pop()
+            if stack:
+                on_path.discard(label)
+
+    return paths
+
+
 def construct_traversals(root, node, visited, path):
-    recurse = lambda neighbor: (
-        neighbor
-        # no backtracking
-        and neighbor not in visited
-        and neighbor != node
-        # no traveling THROUGH terminal nodes
-        and (
-            path[-1] not in terminal_nodes
-            if path
-            else neighbor.label not in terminal_nodes
+    """Adds the paths from :param:`node` to ``traversals[root]``, see
+    :func:`get_paths`
+
+    """
+
+    paths = get_paths(get_adjacency(), node.label, [n.label for n in visited], path)
+    for label, label_paths in paths.items():
+        traversals[root].setdefault(label, set()).update(label_paths)
+
+
+def construct_traversals_from(src_label, adjacency=None):
+    """Constructs ``traversals[src_label]``"""
+
+    adjacency = get_adjacency() if adjacency is None else adjacency
+    traversals[src_label] = get_paths(adjacency, src_label)
+
+
+def construct_traversals_for_all_nodes():
+    adjacency = get_adjacency()
+    for label in adjacency:
+        construct_traversals_from(label, adjacency)
+
+
+def get_traversals_key():
+    """Returns the key that identifies the traversals between the types
+    allowed by ``GEN3DATAMODEL_TYPES`` for this dictionary and version
+    of the package.
+
+    """
+
+    labels = None if models.allowed_types is None else sorted(models.allowed_types)
+    digest = hashlib.sha256(
+        json.dumps([labels, terminal_nodes]).encode("utf-8")
+    ).hexdigest()
+    return "{}-{}-{}".format(
+        cache.get_cache_key(
+            models.dictionary.schema, getattr(models.dictionary, "settings", None)
+        ),
+        digest,
+        TRAVERSALS_FORMAT,
+    )
+
+
+def encode_traversals(table):
+    """Returns :param:`table` (see :data:`traversals`) in a compact form
+    for :func:`load_traversals`.
+
+    Every prefix of a path is itself a path (to the type the prefix
+    leads to), so the paths from each type are stored as a tree: a flat
+    list of ``<parent>, <link>, <label>`` triples, where ``<parent>`` is
+    the index of the triple for the path without its last link (or -1)
+    and ``<link>`` and ``<label>`` are indexes into shared lists of
+    names.
+
+    """
+
+    names, labels = {}, {}
+    encoded = {}
+    for src, dsts in table.items():
+        paths = sorted(
+            ((path, dst) for dst, paths in dsts.items() for path in paths if path),
+            key=lambda item: item[0].count("."),
+        )
+        index, steps = {}, []
+        for i, (path, dst) in enumerate(paths):
+            prefix, _, name = path.rpartition(".")
+            index[path] = i
+            steps.append(index[prefix] if prefix else -1)
+            steps.append(names.setdefault(name, len(names)))
+            steps.append(labels.setdefault(dst, len(labels)))
+        encoded[src] = steps
+
+    return {"names": list(names), "labels": list(labels), "paths": encoded}
+
+
+def decode_traversals(encoded):
+    """Returns the table encoded by :func:`encode_traversals`"""
+
+    names, labels = encoded["names"], encoded["labels"]
+    links = ["." + name for name in names]
+    table = {}
+    for src, steps in encoded["paths"].items():
+        paths = table[src] = {src: {""}}
+        prefixes = []
+        steps = iter(steps)
+        for parent, name, label in zip(steps, steps, steps):
+            if parent < 0:
+                path = names[name]
+            else:
+                path = prefixes[parent] + links[name]
+            prefixes.append(path)
+            try:
+                paths[labels[label]].add(path)
+            except KeyError:
+                paths[labels[label]] = {path}
+
+    return table
+
+
+def load_traversals(cache_dir=None):
+    """Loads the traversals between all types from the cache, or
+    constructs and caches them if they are missing or stale.
+
+    :returns: the path of the cache file or None if it wasn't written
+
+    """
+
+    global traversals_loaded
+
+    cache_dir = cache_dir or cache.get_cache_dir()
+    traversals.clear()
+    traversals_loaded = True
+    if not cache_dir:
+        construct_traversals_for_all_nodes()
+        return None
+
+    key = get_traversals_key()
+    encoded = cache.load(key, cache_dir, TRAVERSALS_FILE_PREFIX)
+    if encoded is not None:
+        traversals.update(decode_traversals(encoded))
+        return cache.get_cache_path(key, cache_dir, TRAVERSALS_FILE_PREFIX)
+
+    construct_traversals_for_all_nodes()
+    encoded = encode_traversals(traversals)
+    return cache.dump(key, encoded, cache_dir, TRAVERSALS_FILE_PREFIX)
+
+
+def get_traversal_paths(src_label, dst_label):
+    """Returns the paths from the type labeled :param:`src_label` to the
+    type labeled :param:`dst_label`.
+
+    The cached traversals are read on first use if they exist, and the
+    traversals from a type that isn't in them are constructed (but not
+    cached).  In lazy mode, the classes of the types the paths may
+    visit are created.
+
+    """
+
+    global traversals_loaded
+
+    if not traversals_loaded:
+        traversals_loaded = True
+        if cache.get_cache_dir():
+            encoded = cache.load(get_traversals_key(), prefix=TRAVERSALS_FILE_PREFIX)
+            if encoded is not None:
+                traversals.update(decode_traversals(encoded))
+    if src_label not in traversals:
+        construct_traversals_from(src_label)
+
+    paths = traversals[src_label].get(dst_label, ())
+    if paths and models.lazy:
+        # The types along the paths are all reachable from the source
+        missing = [l for l in traversals[src_label] if not schema_registry.get_node(l)]
+        if missing:
+            models.load_models(missing)
+    return list(paths)
+
+
+def get_path_steps(src_label, path):
+    """Returns the ``(<edge class>, <is outbound>)`` of each link along
+    :param:`path` from the type labeled :param:`src_label`.  Like
+    psqlgraph, outbound links take precedence over inbound links with
+    the same name.
+
+    :raises: ValueError if a link doesn't exist
+
+    """
+
+    node = schema_registry.get_node(src_label)
+    steps = []
+    for name in path.split(".") if path else []:
+        for edge in schema_registry.get_edges_out(node):
+            if edge.__src_dst_assoc__ == name:
+                steps.append((edge, True))
+                node = schema_registry.get_node_named(edge.__dst_class__)
+                break
+        else:
+            for edge in schema_registry.get_edges_in(node):
+                if edge.__dst_src_assoc__ == name:
+                    steps.append((edge, False))
+                    node = schema_registry.get_node_named(edge.__src_class__)
+                    break
+            else:
+                raise ValueError("{} has no link {}".format(node.label, name))
+    return steps
+
+
+def get_state_transitions(src_label, paths, backwards=False):
+    """Returns a select of the edges that lead from one state of
+    :param:`paths` to the next, and the states in which a path is
+    complete.
+
+    The prefixes of the paths (of the reversed paths if
+    :param:`backwards`) are numbered as states, the empty prefix being
+    0.  Every link between two states becomes a branch of a ``UNION
+    ALL`` of edge tables with the columns ``from_id, to_id, state,
+    next_state``.
+
+    If no path has a link the select is None.
+
+    """
+
+    states = {(): 0}
+    transitions = []
+    final_states = set()
+    for path in paths:
+        steps = get_path_steps(src_label, path)
+        if backwards:
+            steps = [(edge, not outbound) for edge, outbound in reversed(steps)]
+        key = ()
+        for edge, outbound in steps:
+            state = states[key]
+            key += ((edge.__name__, outbound),)
+            if key not in states:
+                states[key] = len(states)
+                transitions.append((edge, outbound, state, states[key]))
+        final_states.add(states[key])
+
+    branches = []
+    for edge, outbound, state, next_state in transitions:
+        columns = edge.__table__.c
+        from_id, to_id = columns.src_id, columns.dst_id
+        if not outbound:
+            from_id, to_id = to_id, from_id
+        branches.append(
+            select(
+                [
+                    from_id.label("from_id"),
+                    to_id.label("to_id"),
+                    literal(state, Integer).label("state"),
+                    literal(next_state, Integer).label("next_state"),
+                ]
+            )
         )
-        and (
-            not path[-1].startswith("_related")
-            if path
-            else not neighbor.label.startswith("_related")
+    if not branches:
+        return None, sorted(final_states)
+    return union_all(*branches).alias("steps"), sorted(final_states)
+
+
+def reachable_ids(session, src_label, dst_label, paths, dst_filter=None):
+    """Returns a select of the ids of the nodes labeled
+    :param:`src_label` that reach a node labeled :param:`dst_label`
+    along one of :param:`paths`, as a single ``WITH RECURSIVE`` query.
+
+    The paths are walked backwards from the destination nodes (see
+    :func:`get_state_transitions`): the recursive term follows the edges
+    that lead from a node's state to the next one, and nodes in the
+    state of a complete path are sources.
+
+    :param dst_filter: a function filtering the query of destination
+        nodes, like the filters of ``subq_path``
+
+    """
+
+    dst_q = session.query(schema_registry.get_node(dst_label))
+    if dst_filter is not None:
+        dst_q = dst_filter(dst_q)
+    dst_sq = dst_q.subquery()
+
+    steps, final_states = get_state_transitions(src_label, paths, backwards=True)
+
+    reachable = select(
+        [dst_sq.c.node_id.label("node_id"), literal(0, Integer).label("state")]
+    ).cte("reachable", recursive=True)
+    reachable = reachable.union(
+        select([steps.c.to_id, steps.c.next_state]).where(
+            and_(
+                steps.c.from_id == reachable.c.node_id,
+                steps.c.state == reachable.c.state,
+            )
         )
     )
 
-    for edge in Edge._get_edges_with_src(node.__name__):
-        neighbor = [
-            n for n in Node.get_subclasses() if n.__name__ == edge.__dst_class__
-        ][0]
-        if recurse(neighbor):
-            construct_traversals(
-                root, neighbor, visited + [node], path + [edge.__src_dst_assoc__]
+    return select([reachable.c.node_id]).where(reachable.c.state.in_(final_states))
+
+
+def get_path_trie(src_label, paths):
+    """Returns the trie of :param:`paths` from the type labeled
+    :param:`src_label`: nested ``{"end": <a path ends here>, "links":
+    {(<edge class>, <is outbound>): <trie>}}``
+
+    """
+
+    trie = {"end": False, "links": {}}
+    for path in sorted(paths):
+        node = trie
+        for step in get_path_steps(src_label, path):
+            node = node["links"].setdefault(step, {"end": False, "links": {}})
+        node["end"] = True
+    return trie
+
+
+def trie_ids(trie, destination):
+    """Returns a select of the ids of the nodes that reach a node in
+    :param:`destination` along the paths in :param:`trie` (see
+    :func:`get_path_trie`).  Each link of the trie is joined once, with
+    the links that follow it nested in a single subquery.
+
+    """
+
+    branches = []
+    if trie["end"]:
+        branches.append(select([destination.c.node_id]))
+    for (edge, outbound), links in trie["links"].items():
+        columns = edge.__table__.c
+        this_id, next_id = columns.src_id, columns.dst_id
+        if not outbound:
+            this_id, next_id = next_id, this_id
+        branches.append(
+            select([this_id.label("node_id")]).where(
+                next_id.in_(trie_ids(links, destination))
             )
+        )
+
+    if len(branches) == 1:
+        return branches[0]
+    return union(*branches)
+
+
+def trie_exists(trie, destination, node_id):
+    """Returns a correlated ``EXISTS`` for each first link of the paths
+    in :param:`trie`, true for the nodes whose id is :param:`node_id`
+    that reach a node in :param:`destination` along the paths that
+    start with the link (see :func:`trie_ids`)
 
-    for edge in Edge._get_edges_with_dst(node.__name__):
-        neighbor = [
-            n for n in Node.get_subclasses() if n.__name__ == edge.__src_class__
-        ][0]
-        if recurse(neighbor):
-            construct_traversals(
-                root, neighbor, visited + [node], path + [edge.__dst_src_assoc__]
+    """
+
+    clauses = []
+    for (edge, outbound), links in trie["links"].items():
+        columns = edge.__table__.c
+        this_id, next_id = columns.src_id, columns.dst_id
+        if not outbound:
+            this_id, next_id = next_id, this_id
+        clauses.append(
+            exists().where(
+                and_(this_id == node_id, next_id.in_(trie_ids(links, destination)))
             )
+        )
+    return clauses
 
-    traversals[root][node.label] = traversals[root].get(node.label) or set()
-    traversals[root][node.label].add(".".join(path))
 
+def get_destination_filter(post_filters, strategy):
+    """Returns the only filter in :param:`post_filters`, which applies to
+    the destination of the paths
 
-def construct_traversals_for_all_nodes():
-    for node in Node.get_subclasses():
-        traversals[node.label] = {}
-        construct_traversals(node.label, node, [node], [])
+    :raises: ValueError if there are filters on other nodes of the paths
 
+    """
 
-def union_subq_without_path(q, *args, **kwargs):
-    return q.except_(union_subq_path(q, *args, **kwargs))
+    post_filters = list(post_filters or [])
+    if any(f is not None for f in post_filters[1:]):
+        raise ValueError(
+            "The {} strategy only supports a filter on the destination".format(strategy)
+        )
+    return post_filters[0] if post_filters else None
 
 
-def union_subq_path(q, dst_label, post_filters=[]):
-    if traversals == {}:
-        construct_traversals_for_all_nodes()
+def union_subq_without_path(
+    q, dst_label, post_filters=[], strategy="union", anti_join=False
+):
+    """Filters :param:`q` to the nodes that don't reach a node labeled
+    :param:`dst_label`, see :func:`union_subq_path`.
+
+    :param anti_join: Filter with ``NOT EXISTS`` for the first link of
+        the paths, so that PostgreSQL can stop at the first match for
+        each node, instead of removing the nodes found by
+        :func:`union_subq_path` with ``EXCEPT``.  The paths are nested
+        as for the ``trie`` strategy and :param:`strategy` is ignored.
+        Only a filter on the destination is supported.
+
+    """
+
+    if not anti_join:
+        return q.except_(union_subq_path(q, dst_label, post_filters, strategy))
+
+    dst_filter = get_destination_filter(post_filters, "anti_join")
+    paths = get_traversal_paths(q.entity().label, dst_label)
+    if not paths or "" in paths:
+        # union_subq_path would return every node of q
+        return q.filter(false())
+
+    destination = q.session.query(schema_registry.get_node(dst_label))
+    if dst_filter is not None:
+        destination = dst_filter(destination)
+    trie = get_path_trie(q.entity().label, paths)
+    clauses = trie_exists(trie, destination.cte("destination"), q.entity().node_id)
+    # PostgreSQL only plans top level NOT EXISTS as anti joins
+    return q.filter(*[not_(clause) for clause in clauses])
+
+
+def union_subq_path(q, dst_label, post_filters=[], strategy="union"):
+    """Filters :param:`q` to the nodes that reach a node labeled
+    :param:`dst_label` along any of the traversals between their types.
+
+    :param post_filters: filters for ``subq_path``, applied from the
+        end of the path backwards
+    :param strategy: ``union`` for a union of one ``subq_path`` per
+        path, ``recursive`` for a single recursive query over the edge
+        tables, or ``trie`` for nested subqueries that join the links
+        shared by several paths once.  Only ``union`` supports filters
+        on nodes other than the destination.
+
+    """
+
+    if strategy not in STRATEGIES:
+        raise ValueError(
+            "Unknown strategy {}, expected one of {}".format(strategy, STRATEGIES)
+        )
+
     src_label = q.entity().label
-    if not traversals.get(src_label, {}).get(dst_label, {}):
+    paths = get_traversal_paths(src_label, dst_label)
+    if not paths:
         return q
-    paths = list(traversals[src_label][dst_label])
+
+    if strategy != "union":
+        dst_filter = get_destination_filter(post_filters, strategy)
+        if "" in paths:
+            # subq_path("") is the query itself
+            return q
+
+        if strategy == "recursive":
+            ids = reachable_ids(q.session, src_label, dst_label, paths, dst_filter)
+        else:
+            destination = q.session.query(schema_registry.get_node(dst_label))
+            if dst_filter is not None:
+                destination = dst_filter(destination)
+            ids = trie_ids(
+                get_path_trie(src_label, paths), destination.cte("destination")
+            )
+        return q.filter(q.entity().node_id.in_(ids))
+
     base = q.subq_path(paths.pop(), post_filters)
     while paths:
         base = base.union(q.subq_path(paths.pop(), post_filters))
     return base
+
+
+def any_id(column, ids):
+    """Returns ``<column> = ANY(:ids)`` with :param:`ids` bound as a
+    single array parameter, so that the statement is the same for any
+    number of ids
+
+    """
+
+    ids = bindparam("ids", list(ids), type_=postgresql.ARRAY(Text), unique=True)
+    return column == any_(ids)
+
+
+def traverse_many_select(src_label, ids, dst_label):
+    """Returns a select of ``src_id, dst_id`` for the nodes labeled
+    :param:`src_label` in :param:`ids` and the nodes labeled
+    :param:`dst_label` they reach, or None if there are no traversals
+    between the types.
+
+    The paths are walked forwards (see :func:`get_state_transitions`)
+    from the source nodes, and the id of the source is carried along
+    by the recursive term.
+
+    """
+
+    paths = get_traversal_paths(src_label, dst_label)
+    if not paths:
+        return None
+
+    node_id = schema_registry.get_node(src_label).__table__.c.node_id
+    walk = (
+        select(
+            [
+                node_id.label("src_id"),
+                node_id.label("node_id"),
+                literal(0, Integer).label("state"),
+            ]
+        )
+        .where(any_id(node_id, ids))
+        .cte("walk", recursive=True)
+    )
+
+    steps, final_states = get_state_transitions(src_label, paths)
+    if steps is not None:
+        walk = walk.union(
+            select([walk.c.src_id, steps.c.to_id, steps.c.next_state]).where(
+                and_(
+                    steps.c.from_id == walk.c.node_id,
+                    steps.c.state == walk.c.state,
+                )
+            )
+        )
+
+    return (
+        select([walk.c.src_id, walk.c.node_id.label("dst_id")])
+        .where(walk.c.state.in_(final_states))
+        .distinct()
+    )
+
+
+def traverse_many(session, src_label, ids, dst_label):
+    """Yields ``(<src_id>, <dst_id>)`` for the nodes labeled
+    :param:`src_label` in :param:`ids` and every node labeled
+    :param:`dst_label` each of them reaches along the traversals
+    between the types, from a single query whose results are streamed.
+
+    Sources that reach no destination are not yielded.
+
+    """
+
+    statement = traverse_many_select(src_label, ids, dst_label)
+    if statement is None:
+        return
+
+    connection = session.connection().execution_options(stream_results=True)
+    for row in connection.execute(statement):
+        yield row.src_id, row.dst_id
+
+
+def get_node_ids(nodes):
+    """Returns the ids of :param:`nodes`, which may be nodes, ids or one
+    of either
+
+    """
+
+    if isinstance(nodes, str) or not isinstance(nodes, (list, tuple, set)):
+        nodes = [nodes]
+    return [getattr(node, "node_id", node) for node in nodes]
+
+
+def descendants_of(q, ancestors, max_depth=None):
+    """Filters :param:`q` to the descendants of :param:`ancestors` (nodes
+    or node ids) using the ``node_ancestors`` closure table, see
+    :mod:`gen3datamodel.models.node_ancestors`
+
+    :param max_depth: only descendants at most this many edges away
+
+    """
+
+    ids = select([NodeAncestor.descendant_id]).where(
+        NodeAncestor.ancestor_id.in_(get_node_ids(ancestors))
+    )
+    if max_depth is not None:
+        ids = ids.where(NodeAncestor.depth <= max_depth)
+    return q.filter(q.entity().node_id.in_(ids))
+
+
+def ancestors_of(q, descendants, max_depth=None):
+    """Filters :param:`q` to the ancestors of :param:`descendants` (nodes
+    or node ids) using the ``node_ancestors`` closure table, see
+    :mod:`gen3datamodel.models.node_ancestors`
+
+    :param max_depth: only ancestors at most this many edges away
+
+    """
+
+    ids = select([NodeAncestor.ancestor_id]).where(
+        and_(
+            NodeAncestor.descendant_id.in_(get_node_ids(descendants)),
+            NodeAncestor.ancestor_label == q.entity().label,
+        )
+    )
+    if max_depth is not None:
+        ids = ids.where(NodeAncestor.depth <= max_depth)
+    return q.filter(q.entity().node_id.in_(ids))
+
+
+class Explain(Executable, ClauseElement):
+    """``EXPLAIN (<options>) <statement>``, with the parameters of the
+    statement bound as they would be to execute it
+
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement, options):
+        self.statement = statement
+        self.options = options
+
+
+@compiles(Explain)
+def compile_explain(element, compiler, **kwargs):
+    return "EXPLAIN ({}) {}".format(
+        element.options, compiler.process(element.statement, **kwargs)
+    )
+
+
+def explain(session, q, analyze=True):
+    """Returns the JSON plan of :param:`q`, executing it if
+    :param:`analyze`
+
+    """
+
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    (plan,) = session.execute(Explain(q.statement, options)).first()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def summarize_plan(plan):
+    """Returns the cost, estimated and actual rows, execution time, shared
+    buffers and the indexes and sequentially scanned tables of
+    :param:`plan` (from :func:`explain`)
+
+    """
+
+    indexes, seq_scans = set(), set()
+    nodes = [plan["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if "Index Name" in node:
+            indexes.add(node["Index Name"])
+        if node["Node Type"] == "Seq Scan":
+            seq_scans.add(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+
+    top = plan["Plan"]
+    return {
+        "cost": top["Total Cost"],
+        "estimated_rows": top["Plan Rows"],
+        "actual_rows": top.get("Actual Rows"),
+        "execution_ms": plan.get("Execution Time"),
+        "shared_hit_blocks": top.get("Shared Hit Blocks"),
+        "shared_read_blocks": top.get("Shared Read Blocks"),
+        "indexes": sorted(indexes),
+        "seq_scans": sorted(seq_scans),
+    }
+
+
+def explain_traversals(
+    session, src_label, dst_label, dst_ids=None, strategy="union", analyze=True
+):
+    """Returns the summary (see :func:`summarize_plan`) of the plan of
+    ``union_subq_path`` from :param:`src_label` to :param:`dst_label`,
+    and of ``subq_path`` for each path, slowest (or costliest) first
+
+    :param dst_ids: only traversals to these destination nodes
+
+    """
+
+    src_cls = schema_registry.get_node(src_label)
+    post_filters = [lambda q: q.ids(dst_ids)] if dst_ids else []
+    order = "execution_ms" if analyze else "cost"
+
+    paths = []
+    for path in get_traversal_paths(src_label, dst_label):
+        q = session.query(src_cls).subq_path(path, post_filters)
+        paths.append(dict(path=path, **summarize_plan(explain(session, q, analyze))))
+    paths.sort(key=lambda summary: summary[order] or 0, reverse=True)
+
+    q = union_subq_path(session.query(src_cls), dst_label, post_filters, strategy)
+    return {
+        "source": src_label,
+        "destination": dst_label,
+        "strategy": strategy,
+        "query": summarize_plan(explain(session, q, analyze)),
+        "paths": paths,
+    }
+
+
+def format_explanation(explanation):
+    """Returns :param:`explanation` (see :func:`explain_traversals`) as a
+    table
+
+    """
+
+    columns = ("cost", "estimated_rows", "actual_rows", "execution_ms")
+    header = "{:>12} {:>10} {:>10} {:>10}  {}".format(
+        "cost", "est. rows", "rows", "ms", "path / indexes / seq scans"
+    )
+
+    def row(summary, name):
+        values = ["-" if summary[c] is None else summary[c] for c in columns]
+        return "\n".join(
+            [
+                "{:>12} {:>10} {:>10} {:>10}  {}".format(*values, name),
+                "{:>47}{}".format("", ", ".join(summary["indexes"]) or "-"),
+                "{:>47}{}".format("", ", ".join(summary["seq_scans"]) or "-"),
+            ]
+        )
+
+    lines = [
+        "{source} -> {destination}, {strategy} strategy, {count} paths".format(
+            count=len(explanation["paths"]), **explanation
+        ),
+        header,
+        row(explanation["query"], "(whole query)"),
+    ]
+    lines.extend(row(summary, summary["path"]) for summary in explanation["paths"])
+    return "\n".join(lines)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="Manage the traversals between gen3datamodel node types"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    build = subparsers.add_parser(
+        "build-traversals",
+        help="Build the traversals between all node types and cache them",
+    )
+    build.add_argument(
+        "--cache-dir",
+        type=str,
+        action="store",
+        help="Directory to write the traversals to, or GEN3DATAMODEL_CACHE_DIR",
+    )
+
+    explain = subparsers.add_parser(
+        "explain",
+        help="Report the plans of the traversals between two types",
+    )
+    explain.add_argument("src", help="label of the source type")
+    explain.add_argument("dst", help="label of the destination type")
+    explain.add_argument("-H", "--host", default="localhost", help="psql-server host")
+    explain.add_argument("-U", "--user", default="postgres", help="psql user")
+    explain.add_argument("-P", "--password", default="", help="psql password")
+    explain.add_argument("-D", "--database", required=True, help="psql database")
+    explain.add_argument(
+        "--dst-id",
+        action="append",
+        dest="dst_ids",
+        help="only traversals to this destination node, may be repeated",
+    )
+    explain.add_argument(
+        "--strategy", choices=STRATEGIES, default="union", help="see union_subq_path"
+    )
+    explain.add_argument(
+        "--no-analyze",
+        action="store_true",
+        default=False,
+        help="only estimate, without executing the queries",
+    )
+    explain.add_argument(
+        "--json", action="store_true", default=False, help="write the report as JSON"
+    )
+    return parser
+
+
+def main(args=None):
+    args = args or get_parser().parse_args()
+
+    if args.command == "build-traversals":
+        path = load_traversals(args.cache_dir)
+        if path is None:
+            raise SystemExit("Unable to write the traversals, is the cache disabled?")
+        print(path)
+
+    elif args.command == "explain":
+        from psqlgraph import PsqlGraphDriver
+
+        g = PsqlGraphDriver(args.host, args.user, args.password, args.database)
+        with g.session_scope() as session:
+            explanation = explain_traversals(
+                session,
+                args.src,
+                args.dst,
+                args.dst_ids,
+                args.strategy,
+                analyze=not args.no_analyze,
+            )
+            session.rollback()
+
+        if args.json:
+            json.dump(explanation, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        else:
+            print(format_explanation(explanation))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.traversal_cache
+----------------------------------
+
+Opt-in, in-process LRU cache of the nodes found by
+:func:`gen3datamodel.query.union_subq_path` and
+:func:`gen3datamodel.query.union_subq_without_path`::
+
+    cache = TraversalCache(max_entries=1024, max_bytes=64 * 2 ** 20)
+    files = cache.union_subq_path(g.nodes(md.File).ids(ids), "case")
+
+A result is kept as a tuple of node ids, and later calls filter the
+query with ``node_id = ANY(:ids)``, one array parameter.  Each id costs
+about 93 bytes (a 36 character UUID string and its slot in the tuple),
+so the default ``max_bytes`` of 64MB holds about 700k ids across all
+results.  A result with more than ``max_entry_ids`` ids (10k, about
+1MB, by default) is not kept: the live traversal query is used for it
+instead, and only the fact that it is too large is remembered.
+
+Results are keyed by the source and destination labels and a
+fingerprint of the SQL of the source query and of the filters.  They
+are dropped when a session commits changes to nodes of a type along
+the traversals, or to edges between such types.  Changes committed by
+other processes are not seen.  Sessions with uncommitted changes
+neither use nor fill the cache.
+
+"""
+
+from collections import OrderedDict
+from itertools import chain
+from threading import RLock
+
+import hashlib
+import sys
+
+from psqlgraph import Edge, Node
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from gen3datamodel import query
+from gen3datamodel.models import schema_registry
+
+
+def get_fingerprint(*statements):
+    """Returns a digest of the SQL and parameters of :param:`statements`"""
+
+    digest = hashlib.sha256()
+    for statement in statements:
+        compiled = statement.compile(dialect=postgresql.dialect())
+        digest.update(str(compiled).encode("utf-8"))
+        digest.update(repr(sorted(compiled.params.items())).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_traversal_labels(src_label, dst_label):
+    """Returns the labels of the types along the traversals from
+    :param:`src_label` to :param:`dst_label`
+
+    """
+
+    labels = {src_label, dst_label}
+    for path in query.get_traversal_paths(src_label, dst_label):
+        for edge, _ in query.get_path_steps(src_label, path):
+            labels.add(schema_registry.get_node_named(edge.__src_class__).label)
+            labels.add(schema_registry.get_node_named(edge.__dst_class__).label)
+    return frozenset(labels)
+
+
+#: Cached instead of the ids of results with too many of them
+TOO_MANY_IDS = object()
+
+
+def get_changed_labels(session):
+    """Returns the labels of the nodes, and of the ends of the edges,
+    that :param:`session` is about to flush
+
+    """
+
+    labels = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Node):
+            labels.add(obj.label)
+        elif isinstance(obj, Edge):
+            for name in (obj.__src_class__, obj.__dst_class__):
+                cls = schema_registry.nodes_by_name.get(name)
+                if cls is not None:
+                    labels.add(cls.label)
+    return labels
+
+
+class TraversalCache(object):
+    """LRU cache of the ids of the nodes found by traversals.
+
+    :param max_entries: The most results to keep
+    :param max_bytes: The most memory (approximately) to use for the ids
+    :param max_entry_ids: The most ids to keep for one result, larger
+        results are queried every time
+    :param session_class: The sessions whose commits invalidate results,
+        by default every session
+
+    """
+
+    def __init__(
+        self,
+        max_entries=1024,
+        max_bytes=64 * 2**20,
+        max_entry_ids=10000,
+        session_class=Session,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_ids = max_entry_ids
+        self.session_class = session_class
+
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = RLock()
+        self.info_key = ("traversal_cache_labels", id(self))
+
+        event.listen(session_class, "after_flush", self.after_flush)
+        event.listen(session_class, "after_commit", self.after_commit)
+        event.listen(session_class, "after_soft_rollback", self.after_soft_rollback)
+
+    def close(self):
+        """Stops listening to sessions and drops all results"""
+
+        event.remove(self.session_class, "after_flush", self.after_flush)
+        event.remove(self.session_class, "after_commit", self.after_commit)
+        event.remove(
+            self.session_class, "after_soft_rollback", self.after_soft_rollback
+        )
+        self.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def invalidate(self, labels):
+        """Drops the results of traversals along types in :param:`labels`"""
+
+        labels = set(labels)
+        with self.lock:
+            for key, (_, entry_labels, size) in list(self.entries.items()):
+                if labels & entry_labels:
+                    del self.entries[key]
+                    self.size -= size
+                    self.invalidations += 1
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, node_ids, labels):
+        size = sys.getsizeof(node_ids)
+        if node_ids is not TOO_MANY_IDS:
+            size += sum(sys.getsizeof(i) for i in node_ids)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[2]
+            self.entries[key] = (node_ids, labels, size)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def has_uncommitted_changes(self, session):
+        """Returns whether :param:`session` has flushed changes that are
+        not committed yet, or changes that it would flush
+
+        """
+
+        return bool(
+            session.info.get(self.info_key)
+            or session.new
+            or session.dirty
+            or session.deleted
+        )
+
+    def get_node_ids(self, q, dst_label, post_filters=None, without=False, **kwargs):
+        """Returns the ids of the nodes found by
+        ``union_subq_path(q, dst_label, post_filters, **kwargs)`` (or
+        ``union_subq_without_path`` if :param:`without`), from the cache
+        if possible, or None if there are more than
+        :attr:`max_entry_ids`.  Only a filter on the destination is
+        supported, since the filters are identified by the SQL they
+        produce.
+
+        Returns None while the session of :param:`q` has uncommitted
+        changes: other sessions must not see them, and the session must.
+
+        """
+
+        if self.has_uncommitted_changes(q.session):
+            return None
+
+        src_label = q.entity().label
+        dst_filter = query.get_destination_filter(post_filters, "cached")
+        statements = [q.statement]
+        if dst_filter is not None:
+            dst_q = q.session.query(schema_registry.get_node(dst_label))
+            statements.append(dst_filter(dst_q).statement)
+        key = (src_label, dst_label, without, get_fingerprint(*statements))
+
+        node_ids = self.get(key)
+        if node_ids is None:
+            traverse = (
+                query.union_subq_without_path if without else query.union_subq_path
+            )
+            result = traverse(q, dst_label, post_filters, **kwargs)
+            result = result.with_entities(q.entity().node_id)
+            node_ids = tuple(
+                node_id for node_id, in result.limit(self.max_entry_ids + 1)
+            )
+            if len(node_ids) > self.max_entry_ids:
+                node_ids = TOO_MANY_IDS
+            self.put(key, node_ids, get_traversal_labels(src_label, dst_label))
+
+        return None if node_ids is TOO_MANY_IDS else node_ids
+
+    def union_subq_path(self, q, dst_label, post_filters=None, **kwargs):
+        """Like :func:`gen3datamodel.query.union_subq_path`, with the
+        nodes found looked up by id
+
+        """
+
+        node_ids = self.get_node_ids(q, dst_label, post_filters, **kwargs)
+        if node_ids is None:
+            return query.union_subq_path(q, dst_label, post_filters, **kwargs)
+        return q.filter(query.any_id(q.entity().node_id, node_ids))
+
+    def union_subq_without_path(self, q, dst_label, post_filters=None, **kwargs):
+        """Like :func:`gen3datamodel.query.union_subq_without_path`, with
+        the nodes found looked up by id
+
+        """
+
+        node_ids = self.get_node_ids(q, dst_label, post_filters, without=True, **kwargs)
+        if node_ids is None:
+            return query.union_subq_without_path(q, dst_label, post_filters, **kwargs)
+        return q.filter(query.any_id(q.entity().node_id, node_ids))
+
+    def after_flush(self, session, flush_context):
+        session.info.setdefault(self.info_key, set()).update(
+            get_changed_labels(session)
+        )
+
+    def after_commit(self, session):
+        labels = session.info.pop(self.info_key, None)
+        if labels:
+            self.invalidate(labels)
+
+    def after_soft_rollback(self, session, previous_transaction):
+        # Changes flushed before a rolled back savepoint may still commit
+        if previous_transaction.parent is None:
+            session.info.pop(self.info_key, None)
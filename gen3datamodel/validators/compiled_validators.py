@@ -0,0 +1,645 @@
+"""
+gen3datamodel.validators.compiled_validators
+----------------------------------
+
+Validation functions generated from the dictionary schemas.
+
+``Draft4Validator`` interprets a schema for every document it
+validates, looking up the function of every keyword and descending
+into every property through generic code.  :func:`generate_source`
+instead writes Python source with one function per type, where the
+checks of the type's schema are unrolled with the property names,
+enums and patterns as constants, in the order ``Draft4Validator``
+checks them.  The errors have the same messages, paths, context and
+schemas as those of ``Draft4Validator``, so
+:meth:`GDCJSONValidator.record_errors` records the same errors with
+either.
+
+Types whose schemas use keywords that aren't generated (e.g.
+``$ref``) are left out, for ``Draft4Validator`` to validate.
+
+Compiling the generated source takes most of the time of creating the
+validators, so it can be done ahead of time (e.g. while building an
+image) with::
+
+    python -m gen3datamodel.validators.compiled_validators build-validators
+
+which writes the module for the installed dictionary, versioned by the
+dictionary, this package and jsonschema, into
+:mod:`gen3datamodel.validators.generated` and compiles it.  Processes
+then import it from there, like the rest of the package.  Without it,
+the source is generated and compiled in memory; nothing is written at
+runtime.
+
+"""
+
+from itertools import count
+import argparse
+import hashlib
+import importlib
+import logging
+import os
+import py_compile
+import tempfile
+
+from importlib.metadata import PackageNotFoundError, version
+
+from jsonschema import Draft4Validator, FormatChecker
+
+from .draft4 import get_extras_order, get_message_suffix
+
+logger = logging.getLogger(__name__)
+
+#: Bump this when the generated source changes
+COMPILED_FORMAT = 3
+
+GENERATED_PACKAGE = "gen3datamodel.validators.generated"
+MODULE_PREFIX = "validators_"
+
+#: The imports of the generated module
+HEADER = """\
+\"\"\"Validation functions generated from the dictionary schemas by
+gen3datamodel.validators.compiled_validators, do not edit.\"\"\"
+
+from numbers import Number as _Number
+import re as _re
+
+from jsonschema.exceptions import FormatError as _FormatError
+
+from gen3datamodel.validators.compiled_validators import (
+    CompiledError as _Error,
+    any_of as _any_of,
+    one_of as _one_of,
+)
+from gen3datamodel.validators.draft4 import (
+    equal as _equal,
+    extras_message as _extras_message,
+)
+"""
+
+#: Keywords of ``Draft4Validator`` that the generated functions check
+GENERATED_KEYWORDS = {
+    "additionalProperties",
+    "anyOf",
+    "enum",
+    "format",
+    "items",
+    "maxItems",
+    "maximum",
+    "minItems",
+    "minimum",
+    "oneOf",
+    "pattern",
+    "properties",
+    "required",
+    "type",
+}
+
+TYPE_CHECKS = {
+    "array": "isinstance({0}, list)",
+    "boolean": "isinstance({0}, bool)",
+    "integer": "(isinstance({0}, int) and not isinstance({0}, bool))",
+    "null": "{0} is None",
+    "number": "(isinstance({0}, _Number) and not isinstance({0}, bool))",
+    "object": "isinstance({0}, dict)",
+    "string": "isinstance({0}, str)",
+}
+
+
+class UnsupportedSchema(Exception):
+    pass
+
+
+class CompiledError(object):
+    """An error found by a generated function, with the attributes of
+    :class:`jsonschema.ValidationError` that are used to record it
+
+    """
+
+    __slots__ = ("message", "path", "schema", "context")
+
+    def __init__(self, message, path, schema, context=()):
+        self.message = message
+        self.path = path
+        self.schema = schema
+        self.context = context
+
+    def __repr__(self):
+        return "<CompiledError: {!r}>".format(self.message)
+
+
+class CompiledValidator(object):
+    """Validates documents against :param:`schema` with the generated
+    :param:`function`
+
+    """
+
+    def __init__(self, schema, function):
+        self.schema = schema
+        self.function = function
+
+    def iter_errors(self, instance):
+        return iter(self.function(instance))
+
+    def is_valid(self, instance):
+        return not self.function(instance)
+
+
+def one_of(instance, branches, subschemas):
+    """Returns the message and context of the error of a ``oneOf`` of
+    the generated :param:`branches`, or None if there is none
+
+    """
+
+    context = []
+    for index, branch in enumerate(branches):
+        errors = []
+        branch(instance, errors)
+        if not errors:
+            break
+        context.extend(errors)
+    else:
+        return (
+            "{!r} is not valid under any of the given schemas".format(instance),
+            context,
+        )
+
+    more_valid = []
+    for other in range(index + 1, len(branches)):
+        errors = []
+        branches[other](instance, errors)
+        if not errors:
+            more_valid.append(subschemas[other])
+    if more_valid:
+        more_valid.append(subschemas[index])
+        reprs = ", ".join(repr(schema) for schema in more_valid)
+        return "{!r} is valid under each of {}".format(instance, reprs), ()
+    return None
+
+
+def any_of(instance, branches):
+    """Returns the message and context of the error of an ``anyOf`` of
+    the generated :param:`branches`, or None if there is none
+
+    """
+
+    context = []
+    for branch in branches:
+        errors = []
+        branch(instance, errors)
+        if not errors:
+            return None
+        context.extend(errors)
+    return "{!r} is not valid under any of the given schemas".format(instance), context
+
+
+def join_path(path, item):
+    """Returns the source of the path :param:`path` followed by the
+    source :param:`item`
+
+    """
+
+    if path == "()":
+        return "({},)".format(item)
+    return "{} + ({},)".format(path, item)
+
+
+class SourceGenerator(object):
+    """Writes the source of the validation functions of the types of
+    the dictionary :param:`schemas`
+
+    """
+
+    def __init__(self, schemas, key=None):
+        self.schemas = schemas
+        self.key = key
+        self.constants = []
+        self.constant_names = {}
+        self.functions = []
+        self.names = count()
+
+    def name(self, prefix):
+        return "{}{}".format(prefix, next(self.names))
+
+    def constant(self, source):
+        if source not in self.constant_names:
+            self.constant_names[source] = self.name("_c")
+            self.constants.append("{} = {}".format(self.constant_names[source], source))
+        return self.constant_names[source]
+
+    def generate(self):
+        validators = {}
+        for entity_type in sorted(self.schemas):
+            # Functions of a type are only kept if all of them could be
+            # generated
+            constants, functions = len(self.constants), len(self.functions)
+            ref = "_schemas[{!r}]".format(entity_type)
+            try:
+                validators[entity_type] = self.function(
+                    self.schemas[entity_type], ref, "()", result=True
+                )
+            except UnsupportedSchema:
+                for constant in self.constants[constants:]:
+                    name, source = constant.split(" = ", 1)
+                    del self.constant_names[source]
+                del self.constants[constants:]
+                del self.functions[functions:]
+
+        # The functions are created for the schemas and format checker
+        # they are given, as closures
+        body = list(self.constants)
+        for function in self.functions:
+            body.extend(function)
+        body.append("return {")
+        for entity_type, name in sorted(validators.items()):
+            body.append("    {!r}: {},".format(entity_type, name))
+        body.append("}")
+
+        lines = [HEADER, "KEY = {!r}".format(self.key), "", ""]
+        lines.append("def create_validators(_schemas, _format_checker):")
+        lines.extend("    " + line for line in body)
+        return "\n".join(lines) + "\n"
+
+    def function(self, schema, ref, path, result=False):
+        """Adds a function checking :param:`schema`, that returns the
+        errors if :param:`result`, or else adds them to its argument
+
+        """
+
+        name = self.name("_validate")
+        if result:
+            lines = ["def {}(x):".format(name), "    errors = []"]
+        else:
+            lines = ["def {}(x, errors):".format(name)]
+        lines.extend(self.checks(schema, ref, "x", path, 1))
+        if result:
+            lines.append("    return errors")
+        elif len(lines) == 1:
+            lines.append("    pass")
+        self.functions.append(lines)
+        return name
+
+    def checks(self, schema, ref, x, path, depth):
+        """Returns the lines checking that :param:`x` is valid under
+        :param:`schema`, in the order of its keywords
+
+        """
+
+        if not isinstance(schema, dict) or "$ref" in schema:
+            raise UnsupportedSchema(ref)
+
+        indent = "    " * depth
+        lines = []
+        error_schema = []
+
+        def error(message, context=None, indent=indent):
+            if not error_schema:
+                error_schema.append(self.constant(ref))
+            arguments = [message, path, error_schema[0]]
+            if context:
+                arguments.append(context)
+            lines.append(
+                "{}errors.append(_Error({}))".format(indent, ", ".join(arguments))
+            )
+
+        for keyword, value in schema.items():
+            if keyword not in Draft4Validator.VALIDATORS:
+                continue
+            if keyword not in GENERATED_KEYWORDS:
+                raise UnsupportedSchema("{}[{!r}]".format(ref, keyword))
+            keyword_ref = "{}[{!r}]".format(ref, keyword)
+
+            if keyword == "type":
+                types = [value] if isinstance(value, str) else value
+                if not all(t in TYPE_CHECKS for t in types):
+                    raise UnsupportedSchema(keyword_ref)
+                checks = " or ".join(TYPE_CHECKS[t].format(x) for t in types)
+                reprs = ", ".join(repr(t) for t in types)
+                lines.append("{}if not ({}):".format(indent, checks))
+                error(
+                    "repr({}) + {!r}".format(x, " is not of type " + reprs),
+                    indent=indent + "    ",
+                )
+
+            elif keyword == "enum":
+                enum = self.constant(keyword_ref)
+                if all(isinstance(e, str) for e in value):
+                    names = self.constant("frozenset({})".format(keyword_ref))
+                    check = "isinstance({0}, str) and {0} in {1}".format(x, names)
+                else:
+                    check = "any(_equal(e, {}) for e in {})".format(x, enum)
+                lines.append("{}if not ({}):".format(indent, check))
+                error(
+                    "repr({}) + ' is not one of ' + repr({})".format(x, enum),
+                    indent=indent + "    ",
+                )
+
+            elif keyword == "required":
+                if not isinstance(value, list):
+                    raise UnsupportedSchema(keyword_ref)
+                lines.append("{}if isinstance({}, dict):".format(indent, x))
+                for name in value:
+                    lines.append("{}    if {!r} not in {}:".format(indent, name, x))
+                    error(
+                        repr("{!r} is a required property".format(name)),
+                        indent=indent + "        ",
+                    )
+
+            elif keyword == "properties":
+                property_lines = []
+                for name, subschema in value.items():
+                    var = self.name("_x")
+                    checks = self.checks(
+                        subschema,
+                        "{}[{!r}]".format(keyword_ref, name),
+                        var,
+                        join_path(path, repr(name)),
+                        depth + 2,
+                    )
+                    if checks:
+                        property_lines.append(
+                            "{}    if {!r} in {}:".format(indent, name, x)
+                        )
+                        property_lines.append(
+                            "{}        {} = {}[{!r}]".format(indent, var, x, name)
+                        )
+                        property_lines.extend(checks)
+                if property_lines:
+                    lines.append("{}if isinstance({}, dict):".format(indent, x))
+                    lines.extend(property_lines)
+
+            elif keyword == "additionalProperties":
+                if "patternProperties" in schema:
+                    raise UnsupportedSchema(keyword_ref)
+                if value is True or value == {}:
+                    continue
+                if value is not False and not isinstance(value, dict):
+                    raise UnsupportedSchema(keyword_ref)
+
+                names = self.constant(
+                    "frozenset({}.get('properties', {{}}))".format(ref)
+                )
+                extras = self.name("_extras")
+                lines.append("{}if isinstance({}, dict):".format(indent, x))
+                lines.append(
+                    "{}    {} = [k for k in {} if k not in {}]".format(
+                        indent, extras, x, names
+                    )
+                )
+                # In the order of the installed jsonschema
+                if value is False:
+                    lines.append("{}    if {}:".format(indent, extras))
+                    error(
+                        "_extras_message({})".format(get_extras_order().format(extras)),
+                        indent=indent + "        ",
+                    )
+                else:
+                    key, var = self.name("_k"), self.name("_x")
+                    lines.append("{}    for {} in set({}):".format(indent, key, extras))
+                    lines.append("{}        {} = {}[{}]".format(indent, var, x, key))
+                    lines.extend(
+                        self.checks(
+                            value, keyword_ref, var, join_path(path, key), depth + 2
+                        )
+                        or ["{}        pass".format(indent)]
+                    )
+
+            elif keyword == "pattern":
+                pattern = self.constant("_re.compile({!r})".format(value))
+                lines.append(
+                    "{0}if isinstance({1}, str) and not {2}.search({1}):".format(
+                        indent, x, pattern
+                    )
+                )
+                error(
+                    "repr({}) + {!r}".format(x, " does not match {!r}".format(value)),
+                    indent=indent + "    ",
+                )
+
+            elif keyword == "format":
+                lines.append("{}try:".format(indent))
+                lines.append(
+                    "{}    _format_checker.check({}, {!r})".format(indent, x, value)
+                )
+                lines.append("{}except _FormatError as e:".format(indent))
+                error("e.message", indent=indent + "    ")
+
+            elif keyword == "items":
+                if not isinstance(value, dict):
+                    raise UnsupportedSchema(keyword_ref)
+                index, var = self.name("_i"), self.name("_x")
+                checks = self.checks(
+                    value, keyword_ref, var, join_path(path, index), depth + 2
+                )
+                if checks:
+                    lines.append("{}if isinstance({}, list):".format(indent, x))
+                    lines.append(
+                        "{}    for {}, {} in enumerate({}):".format(
+                            indent, index, var, x
+                        )
+                    )
+                    lines.extend(checks)
+
+            elif keyword in ("minItems", "maxItems"):
+                if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                    raise UnsupportedSchema(keyword_ref)
+                if keyword == "minItems":
+                    if value == 0:
+                        continue
+                    check = "len({}) < {!r}".format(x, value)
+                else:
+                    check = "len({}) > {!r}".format(x, value)
+                message = get_message_suffix(keyword, value)
+                lines.append(
+                    "{}if isinstance({}, list) and {}:".format(indent, x, check)
+                )
+                error(
+                    "repr({}) + {!r}".format(x, " " + message),
+                    indent=indent + "    ",
+                )
+
+            elif keyword in ("minimum", "maximum"):
+                exclusive = schema.get(
+                    "exclusiveMinimum" if keyword == "minimum" else "exclusiveMaximum",
+                    False,
+                )
+                if keyword == "minimum":
+                    operator = "<=" if exclusive else "<"
+                    message = "less than or equal to" if exclusive else "less than"
+                else:
+                    operator = ">=" if exclusive else ">"
+                    message = (
+                        "greater than or equal to" if exclusive else "greater than"
+                    )
+                lines.append(
+                    "{}if {} and {} {} {!r}:".format(
+                        indent, TYPE_CHECKS["number"].format(x), x, operator, value
+                    )
+                )
+                error(
+                    "repr({}) + {!r}".format(
+                        x, " is {} the {} of {!r}".format(message, keyword, value)
+                    ),
+                    indent=indent + "    ",
+                )
+
+            elif keyword in ("oneOf", "anyOf"):
+                if not isinstance(value, list):
+                    raise UnsupportedSchema(keyword_ref)
+                branches = [
+                    self.function(subschema, "{}[{}]".format(keyword_ref, i), "()")
+                    for i, subschema in enumerate(value)
+                ]
+                branches = "({},)".format(", ".join(branches))
+                result = self.name("_r")
+                if keyword == "oneOf":
+                    call = "_one_of({}, {}, {})".format(
+                        x, branches, self.constant(keyword_ref)
+                    )
+                else:
+                    call = "_any_of({}, {})".format(x, branches)
+                lines.append("{}{} = {}".format(indent, result, call))
+                lines.append("{}if {} is not None:".format(indent, result))
+                error(
+                    "{}[0]".format(result),
+                    context="{}[1]".format(result),
+                    indent=indent + "    ",
+                )
+
+        return lines
+
+
+def generate_source(schemas, key=None):
+    """Returns the source of a module whose ``create_validators(schemas,
+    format_checker)`` returns the validation functions of the types in
+    the dictionary :param:`schemas`, and whose ``KEY`` is :param:`key`
+
+    """
+
+    return SourceGenerator(schemas, key).generate()
+
+
+def get_cache_key(schemas, settings=None):
+    """Returns the key that identifies the module generated from
+    :param:`schemas` by this version of the package and of jsonschema
+
+    """
+
+    from gen3datamodel.models import cache
+
+    try:
+        jsonschema_version = version("jsonschema")
+    except PackageNotFoundError:
+        jsonschema_version = "unknown"
+    return "{}-{}-{}".format(
+        cache.get_cache_key(schemas, settings), jsonschema_version, COMPILED_FORMAT
+    )
+
+
+def get_module_name(key):
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return "{}{}".format(MODULE_PREFIX, digest)
+
+
+def import_built_module(key):
+    """Returns the module built for :param:`key` by
+    :func:`build_module`, or None if there is none
+
+    """
+
+    name = "{}.{}".format(GENERATED_PACKAGE, get_module_name(key))
+    try:
+        module = importlib.import_module(name)
+    except ModuleNotFoundError as e:
+        if e.name != name:
+            raise
+        return None
+
+    if getattr(module, "KEY", None) != key:
+        logger.warning("Ignoring compiled validators {} built for {}".format(name, key))
+        return None
+    return module
+
+
+def build_module(schemas, settings=None):
+    """Writes and compiles the module of the validation functions of
+    :param:`schemas` in :mod:`gen3datamodel.validators.generated`.
+
+    The module is written to a temporary file first and moved into
+    place, so that no process imports a partial module.
+
+    :returns: the path of the module
+
+    """
+
+    key = get_cache_key(schemas, settings)
+    package = importlib.import_module(GENERATED_PACKAGE)
+    directory = os.path.dirname(package.__file__)
+    path = os.path.join(directory, get_module_name(key) + ".py")
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(generate_source(schemas, key))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    py_compile.compile(path, doraise=True)
+    importlib.invalidate_caches()
+    return path
+
+
+def load_validators(schemas, format_checker=None, settings=None):
+    """Returns a :class:`CompiledValidator` for every type in the
+    dictionary :param:`schemas` that functions could be generated for.
+
+    The functions are created by the module built for the dictionary
+    (see :func:`build_module`) if there is one, or else by source
+    generated and compiled in memory.
+
+    """
+
+    key = get_cache_key(schemas, settings)
+    module = import_built_module(key)
+    if module is not None:
+        create_validators = module.create_validators
+    else:
+        namespace = {}
+        source = generate_source(schemas, key)
+        exec(compile(source, "<gen3datamodel compiled validators>", "exec"), namespace)
+        create_validators = namespace["create_validators"]
+
+    functions = create_validators(schemas, format_checker or FormatChecker())
+    return {
+        entity_type: CompiledValidator(schemas[entity_type], function)
+        for entity_type, function in functions.items()
+    }
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="Manage the validation functions generated from the dictionary"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    subparsers.add_parser(
+        "build-validators",
+        help="Write and compile the module of the installed dictionary",
+    )
+    return parser
+
+
+def main(args=None):
+    args = args or get_parser().parse_args()
+
+    if args.command == "build-validators":
+        from dictionaryutils import dictionary
+
+        path = build_module(dictionary.schema, getattr(dictionary, "settings", None))
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
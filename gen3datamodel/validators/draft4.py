@@ -0,0 +1,114 @@
+"""
+gen3datamodel.validators.draft4
+----------------------------------
+
+The JSON schema draft 4 semantics that the validation engines of
+:class:`GDCJSONValidator` share with jsonschema's ``Draft4Validator``.
+
+:func:`equal` and :func:`extras_msg` are copied from
+:mod:`jsonschema._utils`, which is private.
+
+The order of the unexpected properties in the message of
+``additionalProperties`` changed in jsonschema 4, and the messages of
+``minItems`` and ``maxItems`` in 4.21, so :func:`get_extras_order` and
+:func:`get_message_suffix` take them from the installed version.
+
+"""
+
+from collections.abc import Mapping, Sequence
+
+import jsonschema
+
+
+def unbool(element, true=object(), false=object()):
+    """Returns :param:`element`, or a marker for True and False, so
+    that they are not equal to 1 and 0
+
+    """
+
+    if element is True:
+        return true
+    elif element is False:
+        return false
+    return element
+
+
+def equal(one, two):
+    """Returns whether two values are equal as JSON, where booleans are
+    not numbers, recursing into sequences and mappings
+
+    """
+
+    if one is two:
+        return True
+    if isinstance(one, str) or isinstance(two, str):
+        return one == two
+    if isinstance(one, Sequence) and isinstance(two, Sequence):
+        return len(one) == len(two) and all(equal(i, j) for i, j in zip(one, two))
+    if isinstance(one, Mapping) and isinstance(two, Mapping):
+        return len(one) == len(two) and all(
+            key in two and equal(value, two[key]) for key, value in one.items()
+        )
+    return unbool(one) == unbool(two)
+
+
+def extras_msg(extras):
+    """Returns the list of :param:`extras` and the verb for the message
+    of unexpected items or properties
+
+    """
+
+    verb = "was" if len(extras) == 1 else "were"
+    return ", ".join(repr(extra) for extra in extras), verb
+
+
+def extras_message(extras):
+    """Returns the message of the unexpected properties :param:`extras`"""
+
+    return "Additional properties are not allowed (%s %s unexpected)" % extras_msg(
+        extras
+    )
+
+
+#: Orders of the unexpected properties of ``additionalProperties`` by
+#: the expression that generated code uses for them
+EXTRAS_ORDERS = {
+    "sorted({}, key=str)": lambda extras: sorted(extras, key=str),
+    "set({})": set,
+}
+
+
+def get_extras_order():
+    """Returns how the installed jsonschema orders the unexpected
+    properties in the message of ``additionalProperties``: sorted
+    (4.x), or as a set of them (3.x).  This is a key of
+    :data:`EXTRAS_ORDERS`, to format with the list of them in document
+    order.
+
+    """
+
+    instance = {"extra_{}".format(i): None for i in reversed(range(10))}
+    validator = jsonschema.Draft4Validator({"additionalProperties": False})
+    (error,) = validator.iter_errors(instance)
+    for order, key in EXTRAS_ORDERS.items():
+        if error.message == extras_message(key(list(instance))):
+            return order
+    raise ValueError(
+        "Unexpected additionalProperties message {!r}".format(error.message)
+    )
+
+
+def get_message_suffix(keyword, value):
+    """Returns what the installed jsonschema appends to the repr of an
+    array that fails ``{keyword: value}``, for ``minItems`` (``value``
+    at least 1) and ``maxItems``
+
+    """
+
+    instance = [] if keyword == "minItems" else [None] * (value + 1)
+    validator = jsonschema.Draft4Validator({keyword: value})
+    (error,) = validator.iter_errors(instance)
+    prefix = repr(instance) + " "
+    if not error.message.startswith(prefix):
+        raise ValueError("Unexpected {} message {!r}".format(keyword, error.message))
+    return error.message[len(prefix) :]
@@ -0,0 +1,9 @@
+"""
+gen3datamodel.validators.generated
+----------------------------------
+
+The modules written by ``python -m
+gen3datamodel.validators.compiled_validators build-validators``, see
+:mod:`gen3datamodel.validators.compiled_validators`.
+
+"""
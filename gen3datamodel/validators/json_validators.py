@@ -2,6 +2,11 @@ from dictionaryutils import dictionary as gdcdictionary
 from jsonschema import Draft4Validator, FormatChecker
 import logging
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+from . import compiled_validators, tabular
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -11,6 +16,8 @@ extra_prop_re = re.compile(
     r"Additional properties are not allowed \(u'([a-zA-Z_-]+)' was unexpected\)"
 )
 
+ENGINES = ("jsonschema", "compiled")
+
 
 def get_keys(error_msg):
     missing_prop = missing_prop_re.match(error_msg)
@@ -26,45 +33,243 @@ def get_keys(error_msg):
 
 
 class GDCJSONValidator(object):
-    def __init__(self):
+    """Validates documents against the schemas of their types.
+
+    :param engine: ``jsonschema`` to validate with ``Draft4Validator``,
+        or ``compiled`` to validate with functions generated from the
+        schemas (see :mod:`gen3datamodel.validators.compiled_validators`),
+        which find the same errors
+
+    """
+
+    #: Validators by dictionary type, shared by all instances
+    validators = {}
+
+    #: Validators by dictionary type of the ``compiled`` engine
+    compiled_validators = {}
+
+    #: Held while creating validators, so that each is created once
+    lock = threading.Lock()
+
+    # note that the `strict-rfc3339` package is required to validate the `date-time` format
+    format_checker = FormatChecker()
+
+    def __init__(self, engine="jsonschema"):
+        if engine not in ENGINES:
+            raise ValueError(
+                "Unknown validation engine {}, expected one of {}".format(
+                    engine, ENGINES
+                )
+            )
         self.schemas = gdcdictionary
+        self.engine = engine
 
-    def iter_errors(self, doc):
+    def get_validator(self, entity_type):
+        """Returns the validator for :param:`entity_type`, which is created
+        again if the type's schema has been replaced.  Safe to call from
+        several threads.
+
+        """
+
+        if self.engine == "compiled":
+            validators = self.compiled_validators
+        else:
+            validators = self.validators
+
+        schema = self.schemas.schema[entity_type]
+        validator = validators.get(entity_type)
+        if validator is not None and validator.schema is schema:
+            return validator
+
+        with self.lock:
+            validator = validators.get(entity_type)
+            if validator is None or validator.schema is not schema:
+                if self.engine == "compiled":
+                    self.load_compiled_validators()
+                    validator = validators[entity_type]
+                else:
+                    validator = self.create_draft4_validator(schema)
+                    validators[entity_type] = validator
+        return validator
+
+    def create_draft4_validator(self, schema):
         # Note whenever gdcdictionary use a newer version of jsonschema
         # we need to update the Validator
-        validator = Draft4Validator(
-            self.schemas.schema[doc["type"]],
-            # note that the `strict-rfc3339` package is required to validate the `date-time` format
-            format_checker=FormatChecker(),
+        return Draft4Validator(schema, format_checker=self.format_checker)
+
+    def load_compiled_validators(self):
+        """Replaces the validators of the ``compiled`` engine with ones
+        generated from the current schemas, and ``Draft4Validator`` for
+        the types that functions can't be generated for
+
+        """
+
+        schemas = self.schemas.schema
+        compiled = compiled_validators.load_validators(
+            schemas, self.format_checker, getattr(self.schemas, "settings", None)
         )
-        return validator.iter_errors(doc)
+        for entity_type, schema in schemas.items():
+            if entity_type not in compiled:
+                compiled[entity_type] = self.create_draft4_validator(schema)
+        self.compiled_validators.clear()
+        self.compiled_validators.update(compiled)
+
+    def create_validators(self):
+        """Creates the validators for every type in the dictionary"""
+
+        for entity_type in self.schemas.schema:
+            self.get_validator(entity_type)
+
+    def iter_errors(self, doc):
+        return self.get_validator(doc["type"]).iter_errors(doc)
+
+    def get_type_error(self, doc):
+        """Returns the error of the type of :param:`doc`, or None if it
+        is in the dictionary
+
+        """
+
+        if "type" not in doc:
+            return "'type' is a required property"
+        if doc["type"] not in self.schemas.schema:
+            return "specified type: {} is not in the current data model".format(
+                doc["type"]
+            )
+        return None
+
+    def iter_error_records(self, doc, log=True):
+        """Yields the message to log (None unless :param:`log`), and the
+        message and keys to record, of each error of :param:`doc`
+
+        """
+
+        for error in self.iter_errors(doc):
+            log_message = None
+            if log:
+                log_message = f"Validation error while validating entity '{doc}' against subschema '{error.schema}': {error.message}"
+            # the key will be  property.subproperty for nested properties
+            keys = [".".join((str(x) for x in error.path))] if error.path else []
+            if not keys:
+                keys = get_keys(error.message)
+            message = error.message
+            if error.context:
+                message += ": {}".format(
+                    " and ".join([c.message for c in error.context])
+                )
+            yield log_message, message, keys
 
     def record_errors(self, entities):
+        log = logger.isEnabledFor(logging.INFO)
         for entity in entities:
             json_doc = entity.doc
-            if "type" not in json_doc:
-                entity.record_error("'type' is a required property", keys=["type"])
+            type_error = self.get_type_error(json_doc)
+            if type_error:
+                entity.record_error(type_error, keys=["type"])
                 break
-            if json_doc["type"] not in self.schemas.schema:
-                entity.record_error(
-                    "specified type: {} is not in the current data model".format(
-                        json_doc["type"]
-                    ),
-                    keys=["type"],
-                )
-                break
-            for error in self.iter_errors(json_doc):
-                logger.info(
-                    f"Validation error while validating entity '{json_doc}' against subschema '{error.schema}': {error.message}"
-                )
-                # the key will be  property.subproperty for nested properties
-                keys = [".".join((str(x) for x in error.path))] if error.path else []
-                if not keys:
-                    keys = get_keys(error.message)
-                message = error.message
-                if error.context:
-                    message += ": {}".format(
-                        " and ".join([c.message for c in error.context])
-                    )
+            for log_message, message, keys in self.iter_error_records(json_doc, log):
+                if log:
+                    logger.info(log_message)
                 entity.record_error(message, keys=keys)
             # additional validators go here
+
+    def iter_validate(self, docs, max_errors=None):
+        """Validates the documents of the iterable :param:`docs` (e.g.
+        parsed JSONL lines or TSV rows) as they are consumed, yielding
+        ``(index, errors)`` for each, with the errors as dicts of the
+        ``message`` and ``keys`` :meth:`record_errors` would record.
+        Unlike :meth:`record_errors`, a document with a missing or
+        unknown type doesn't stop the validation.
+
+        :param max_errors: Stop after the document that brings the
+            number of errors to this many
+
+        """
+
+        log = logger.isEnabledFor(logging.INFO)
+        error_count = 0
+        for index, doc in enumerate(docs):
+            type_error = self.get_type_error(doc)
+            if type_error:
+                errors = [{"message": type_error, "keys": ["type"]}]
+            else:
+                errors = []
+                for log_message, message, keys in self.iter_error_records(doc, log):
+                    if log:
+                        logger.info(log_message)
+                    errors.append({"message": message, "keys": keys})
+
+            yield index, errors
+
+            error_count += len(errors)
+            if max_errors is not None and error_count >= max_errors:
+                return
+
+    def validate_columns(self, entity_type, columns):
+        """Returns ``{row index: errors}`` of the rows with errors of
+        :param:`columns`, a dict of property names to the values of the
+        documents of :param:`entity_type`, validated column-wise where
+        possible (see :mod:`gen3datamodel.validators.tabular`)
+
+        """
+
+        return tabular.validate_columns(self, entity_type, columns)
+
+    def record_errors_parallel(self, entities, workers=None, chunk_size=500):
+        """Records the same errors as :meth:`record_errors`, validating
+        the documents in chunks of :param:`chunk_size` in a pool of
+        :param:`workers` processes (by default one per CPU).
+
+        The workers validate with the dictionary imported in them and
+        this validator's engine, with the validators created when they
+        start.  Submissions of a single chunk are validated here.
+
+        """
+
+        entities = list(entities)
+        docs = []
+        for entity in entities:
+            if self.get_type_error(entity.doc):
+                break
+            docs.append(entity.doc)
+
+        if workers == 1 or len(docs) <= chunk_size:
+            return self.record_errors(entities)
+
+        log = logger.isEnabledFor(logging.INFO)
+        chunks = [
+            (docs[i : i + chunk_size], log) for i in range(0, len(docs), chunk_size)
+        ]
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker, initargs=(self.engine,)
+        ) as executor:
+            records = chain.from_iterable(executor.map(validate_chunk, chunks))
+            for entity, entity_records in zip(entities, records):
+                for log_message, message, keys in entity_records:
+                    if log:
+                        logger.info(log_message)
+                    entity.record_error(message, keys=keys)
+
+        if len(docs) < len(entities):
+            entity = entities[len(docs)]
+            entity.record_error(self.get_type_error(entity.doc), keys=["type"])
+
+
+#: The validator of a worker process of
+#: :meth:`GDCJSONValidator.record_errors_parallel`
+worker_validator = None
+
+
+def init_worker(engine):
+    global worker_validator
+    worker_validator = GDCJSONValidator(engine=engine)
+    worker_validator.create_validators()
+
+
+def validate_chunk(chunk):
+    """Returns the error records of each of the documents of
+    :param:`chunk`
+
+    """
+
+    docs, log = chunk
+    return [list(worker_validator.iter_error_records(doc, log)) for doc in docs]
@@ -0,0 +1,347 @@
+"""
+gen3datamodel.validators.tabular
+----------------------------------
+
+Validation of a batch of documents of one type given as columns, e.g.
+the rows of a TSV::
+
+    errors = GDCJSONValidator().validate_columns(
+        "aliquot",
+        {"submitter_id": ["a-1", "a-2"], "amount": [1.5, "x"], ...},
+    )
+
+Each column is checked at once against the schema of its property,
+and the required and additional properties are checked against the
+columns.  Only the rows that fail a check, or have values in columns
+whose schemas use keywords that aren't checked column-wise (e.g.
+``$ref``), are validated as documents, so the errors are those
+:meth:`GDCJSONValidator.iter_validate` finds.
+
+Columns can be sequences or, if numpy is installed, arrays; numeric
+and boolean arrays are checked with array operations.  ``None`` and
+NaN cells are missing from their rows' documents, and a ``type``
+column is ignored.
+
+"""
+
+from numbers import Number
+import operator
+import re
+
+from jsonschema import Draft4Validator
+
+from .draft4 import equal
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+TYPE_CHECKS = {
+    "array": lambda v: isinstance(v, list),
+    "boolean": lambda v: isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "null": lambda v: v is None,
+    "number": lambda v: isinstance(v, Number) and not isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "string": lambda v: isinstance(v, str),
+}
+
+
+def get_comparison(schema, keyword):
+    """Returns the comparison of a value to the ``minimum`` or
+    ``maximum`` :param:`keyword` of :param:`schema` that is true if the
+    value is within it
+
+    """
+
+    if keyword == "minimum":
+        exclusive = schema.get("exclusiveMinimum", False)
+        return operator.gt if exclusive else operator.ge
+    exclusive = schema.get("exclusiveMaximum", False)
+    return operator.lt if exclusive else operator.le
+
+
+def is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def get_check(schema, format_checker):
+    """Returns a function of a value that is true if it is valid under
+    :param:`schema`, or None if the schema has keywords that aren't
+    checked column-wise
+
+    """
+
+    if not isinstance(schema, dict) or "$ref" in schema:
+        return None
+
+    checks = []
+    for keyword, value in schema.items():
+        if keyword not in Draft4Validator.VALIDATORS:
+            continue
+
+        if keyword == "type":
+            types = [value] if isinstance(value, str) else value
+            if not all(t in TYPE_CHECKS for t in types):
+                return None
+            type_checks = [TYPE_CHECKS[t] for t in types]
+            checks.append(lambda v, c=type_checks: any(check(v) for check in c))
+
+        elif keyword == "enum":
+            if all(isinstance(e, str) for e in value):
+                names = frozenset(value)
+                checks.append(lambda v, n=names: isinstance(v, str) and v in n)
+            else:
+                checks.append(lambda v, e=value: any(equal(each, v) for each in e))
+
+        elif keyword == "pattern":
+            pattern = re.compile(value)
+            checks.append(
+                lambda v, p=pattern: not isinstance(v, str) or p.search(v) is not None
+            )
+
+        elif keyword in ("minimum", "maximum"):
+            compare = get_comparison(schema, keyword)
+            checks.append(
+                lambda v, c=compare, m=value: not TYPE_CHECKS["number"](v) or c(v, m)
+            )
+
+        elif keyword == "format":
+            checks.append(
+                lambda v, f=value: format_checker is None
+                or format_checker.conforms(v, f)
+            )
+
+        elif keyword == "required":
+            checks.append(
+                lambda v, r=value: not isinstance(v, dict) or all(n in v for n in r)
+            )
+
+        elif keyword == "properties":
+            properties = {
+                name: get_check(subschema, format_checker)
+                for name, subschema in value.items()
+            }
+            if None in properties.values():
+                return None
+            checks.append(
+                lambda v, p=properties: not isinstance(v, dict)
+                or all(n not in v or c(v[n]) for n, c in p.items())
+            )
+
+        elif keyword == "additionalProperties":
+            if "patternProperties" in schema or not isinstance(value, bool):
+                return None
+            if value is False:
+                names = frozenset(schema.get("properties", {}))
+                checks.append(
+                    lambda v, n=names: not isinstance(v, dict) or all(k in n for k in v)
+                )
+
+        elif keyword == "items":
+            item_check = get_check(value, format_checker)
+            if item_check is None:
+                return None
+            checks.append(
+                lambda v, c=item_check: not isinstance(v, list)
+                or all(c(item) for item in v)
+            )
+
+        elif keyword == "minItems":
+            checks.append(lambda v, m=value: not isinstance(v, list) or len(v) >= m)
+
+        elif keyword == "maxItems":
+            checks.append(lambda v, m=value: not isinstance(v, list) or len(v) <= m)
+
+        elif keyword in ("oneOf", "anyOf"):
+            branches = [get_check(subschema, format_checker) for subschema in value]
+            if None in branches:
+                return None
+            if keyword == "oneOf":
+                checks.append(lambda v, b=branches: sum(bool(c(v)) for c in b) == 1)
+            else:
+                checks.append(lambda v, b=branches: any(c(v) for c in b))
+
+        else:
+            return None
+
+    if len(checks) == 1:
+        return checks[0]
+    return lambda v: all(check(v) for check in checks)
+
+
+def get_array_mask(schema, array):
+    """Returns a boolean array of whether the values of the numeric or
+    boolean :param:`array` are valid under :param:`schema`, or None if
+    the schema has keywords that aren't checked column-wise
+
+    """
+
+    kind = array.dtype.kind
+    mask = numpy.ones(len(array), dtype=bool)
+    for keyword, value in schema.items():
+        if keyword not in Draft4Validator.VALIDATORS:
+            continue
+
+        if keyword == "type":
+            types = [value] if isinstance(value, str) else value
+            if not all(t in TYPE_CHECKS for t in types):
+                return None
+            if kind == "b":
+                valid = "boolean" in types
+            elif kind in "iu":
+                valid = "integer" in types or "number" in types
+            else:
+                valid = "number" in types
+            if not valid:
+                mask[:] = False
+
+        elif keyword == "enum":
+            if kind == "b":
+                candidates = [e for e in value if isinstance(e, bool)]
+            else:
+                candidates = [e for e in value if TYPE_CHECKS["number"](e)]
+            mask &= numpy.isin(array, candidates)
+
+        elif keyword in ("pattern", "format", "required", "properties"):
+            continue
+
+        elif keyword in ("additionalProperties", "items", "minItems", "maxItems"):
+            continue
+
+        elif keyword in ("minimum", "maximum"):
+            if kind != "b":
+                mask &= get_comparison(schema, keyword)(array, value)
+
+        elif keyword in ("oneOf", "anyOf"):
+            branches = [get_array_mask(subschema, array) for subschema in value]
+            if any(branch is None for branch in branches):
+                return None
+            if keyword == "oneOf":
+                mask &= numpy.sum(branches, axis=0) == 1
+            else:
+                mask &= numpy.any(branches, axis=0)
+
+        else:
+            return None
+
+    return mask
+
+
+def is_numeric_array(values):
+    return (
+        numpy is not None
+        and isinstance(values, numpy.ndarray)
+        and values.dtype.kind in "biuf"
+    )
+
+
+def get_cell(values, index):
+    value = values[index]
+    if numpy is not None and isinstance(value, numpy.generic):
+        value = value.item()
+    return value
+
+
+def get_failing_rows(schema, columns, rows, format_checker=None):
+    """Returns the indexes of the rows of :param:`columns` that may have
+    errors under the type's :param:`schema`
+
+    """
+
+    failing = set()
+    properties = schema.get("properties", {})
+    for keyword in schema:
+        if keyword in Draft4Validator.VALIDATORS and keyword not in (
+            "type",
+            "required",
+            "properties",
+            "additionalProperties",
+        ):
+            return set(range(rows))
+    if schema.get("additionalProperties", True) not in (True, False):
+        return set(range(rows))
+
+    present = {}
+    for name, values in columns.items():
+        if is_numeric_array(values):
+            if values.dtype.kind == "f":
+                present[name] = ~numpy.isnan(values)
+            else:
+                present[name] = numpy.ones(rows, dtype=bool)
+        else:
+            present[name] = [not is_missing(value) for value in values]
+
+    for name in schema.get("required", []):
+        if name == "type":
+            continue
+        if name not in columns:
+            return set(range(rows))
+        failing.update(i for i, cell in enumerate(present[name]) if not cell)
+
+    for name, values in columns.items():
+        if name not in properties:
+            if schema.get("additionalProperties", True) is False:
+                failing.update(i for i, cell in enumerate(present[name]) if cell)
+            continue
+
+        if is_numeric_array(values):
+            mask = get_array_mask(properties[name], values)
+            if mask is not None:
+                failing.update(numpy.flatnonzero(present[name] & ~mask).tolist())
+                continue
+            values = values.tolist()
+
+        check = get_check(properties[name], format_checker)
+        if check is None:
+            failing.update(i for i, cell in enumerate(present[name]) if cell)
+            continue
+
+        # Columns mostly repeat a few values, which are checked once
+        checked = {}
+        for i, value in enumerate(values):
+            if not present[name][i]:
+                continue
+            try:
+                valid = checked[value.__class__, value]
+            except KeyError:
+                valid = checked[value.__class__, value] = check(value)
+            except TypeError:
+                valid = check(value)
+            if not valid:
+                failing.add(i)
+
+    return failing
+
+
+def validate_columns(validator, entity_type, columns):
+    """Returns the errors of the rows of :param:`columns`, a dict of
+    property names to sequences of the same length, as documents of
+    :param:`entity_type`, as ``{row index: errors}`` for the rows with
+    errors (see :meth:`GDCJSONValidator.iter_validate`)
+
+    """
+
+    schema = validator.schemas.schema[entity_type]
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("Columns have different lengths {}".format(sorted(lengths)))
+    rows = lengths.pop() if lengths else 0
+    columns = {name: values for name, values in columns.items() if name != "type"}
+
+    def get_doc(index):
+        doc = {"type": entity_type}
+        for name, values in columns.items():
+            value = get_cell(values, index)
+            if not is_missing(value):
+                doc[name] = value
+        return doc
+
+    failing = sorted(get_failing_rows(schema, columns, rows, validator.format_checker))
+    errors = {}
+    for position, row_errors in validator.iter_validate(map(get_doc, failing)):
+        if row_errors:
+            errors[failing[position]] = row_errors
+    return errors
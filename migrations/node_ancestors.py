@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+migrations.node_ancestors
+----------------------------------
+
+Create and fill the `node_ancestors` closure table.
+"""
+
+from gen3datamodel.models.node_ancestors import NodeAncestor, rebuild_node_ancestors
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def up(connection):
+    logger.info("Migrating node_ancestors: up")
+
+    count = rebuild_node_ancestors(connection)
+    logger.info("Inserted %d node ancestors", count)
+
+
+def down(connection):
+    logger.info("Migrating node_ancestors: down")
+
+    sql_cmd = "DROP TABLE {}".format(NodeAncestor.__tablename__)
+    connection.execute(sql_cmd)
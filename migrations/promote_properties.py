@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+migrations.promote_properties
+----------------------------------
+
+Migrates up/down between states A -> B
+A: without
+B: with
+a column and index per promoted property (``promoted_properties`` in
+the dictionary settings) on each node table, filled from ``_props``.
+
+"""
+
+from psqlgraph import Node
+from gen3datamodel.models import get_promoted_property_indexes
+from sqlalchemy import cast, inspect
+
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+ADD_COLUMN = "ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {type}"
+DROP_COLUMN = "ALTER TABLE {table} DROP COLUMN IF EXISTS {column}"
+
+
+def get_index_names(connection, table):
+    """Returns the names of the indexes on :param:`table`, so that the
+    migration can be run again (``Index.create`` and ``Index.drop``
+    only take ``checkfirst`` from SQLAlchemy 1.4)
+
+    """
+
+    return {index["name"] for index in inspect(connection).get_indexes(table.name)}
+
+
+def up_transaction(connection):
+    logger.info("Migrating promote-properties: up")
+
+    for cls in Node.get_subclasses():
+        table = cls.__table__
+        for key, column in getattr(cls, "_pg_promoted_columns", {}).items():
+            logger.info("Adding %s.%s", table.name, column.name)
+            connection.execute(
+                ADD_COLUMN.format(
+                    table=table.name,
+                    column=column.name,
+                    type=column.type.compile(dialect=connection.dialect),
+                )
+            )
+            connection.execute(
+                table.update().values(
+                    {column: cast(table.c._props[key].astext, column.type)}
+                )
+            )
+
+        existing = get_index_names(connection, table)
+        for index in get_promoted_property_indexes(cls):
+            if index.name not in existing:
+                logger.info("Creating %s", index.name)
+                index.create(connection)
+
+
+def down_transaction(connection):
+    logger.info("Migrating promote-properties: down")
+
+    for cls in Node.get_subclasses():
+        table = cls.__table__
+        existing = get_index_names(connection, table)
+        for index in get_promoted_property_indexes(cls):
+            if index.name in existing:
+                logger.info("Dropping %s", index.name)
+                index.drop(connection)
+
+        for column in getattr(cls, "_pg_promoted_columns", {}).values():
+            logger.info("Dropping %s.%s", table.name, column.name)
+            connection.execute(DROP_COLUMN.format(table=table.name, column=column.name))
+
+
+def up(connection):
+    transaction = connection.begin()
+    try:
+        up_transaction(connection)
+        transaction.commit()
+    except Exception:
+        transaction.rollback()
+        raise
+
+
+def down(connection):
+    transaction = connection.begin()
+    try:
+        down_transaction(connection)
+        transaction.commit()
+    except Exception:
+        transaction.rollback()
+        raise
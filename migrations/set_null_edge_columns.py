@@ -1,12 +1,11 @@
 #!/usr/bin/env python
 
-from psqlgraph import Node, Edge
 from gen3datamodel import models as md
 
 
 CACHE_EDGES = {
-    Node.get_subclass_named(edge.__src_class__): edge
-    for edge in Edge.get_subclasses()
+    md.schema_registry.get_node_named(edge.__src_class__): edge
+    for edge in md.schema_registry.get_edges()
     if "RelatesToCase" in edge.__name__
 }
 
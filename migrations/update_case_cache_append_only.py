@@ -1,14 +1,15 @@
 #!/usr/bin/env python
 
-from psqlgraph import Node, Edge
+from collections import defaultdict
 from gen3datamodel import models as md
 
 
 CACHE_EDGES = {
-    Node.get_subclass_named(edge.__src_class__): edge
-    for edge in Edge.get_subclasses()
+    md.schema_registry.get_node_named(edge.__src_class__): edge
+    for edge in md.schema_registry.get_edges()
     if "RelatesToCase" in edge.__name__
 }
+cache_edge_set = set(CACHE_EDGES.values())
 
 
 LEVEL_1_SQL = """
@@ -82,15 +83,11 @@ def get_levels():
 
     """
 
-    distances = max_distances_from_case()
-    distinct_distances = set(distances.values())
+    levels = defaultdict(list)
+    for cls, distance in max_distances_from_case().items():
+        levels[distance].append(cls)
 
-    levels = {
-        level: [cls for cls, distance in distances.items() if distance == level]
-        for level in distinct_distances
-    }
-
-    return levels
+    return dict(levels)
 
 
 def append_cache_from_parent(graph, child, parent):
@@ -144,10 +141,8 @@ def get_edges_between(src, dst):
 
     return [
         edge
-        for edge in Edge.get_subclasses()
-        if edge.__src_class__ == src.__name__
-        and edge.__dst_class__ == dst.__name__
-        and edge not in CACHE_EDGES.values()
+        for edge in md.schema_registry.get_edges_between(src, dst)
+        if edge not in cache_edge_set
     ]
 
 
@@ -178,7 +173,7 @@ def update_case_cache_append_only(graph):
 
     cls_levels = get_levels()
 
-    for cls in Node.get_subclasses():
+    for cls in md.schema_registry.get_nodes():
         seed_level_1(graph, cls)
 
     for level in sorted(cls_levels)[2:]:
@@ -49,3 +49,84 @@ class TestDataModel(unittest.TestCase):
                 "_uncontended_link",
                 "samples",
             )
+
+    def test_property_setters_are_shared(self):
+        schema = {"type": "string", "enum": ["a", "b"]}
+        setter = md.PropertyFactory("_test_property", schema)
+        self.assertIs(md.PropertyFactory("_test_property", dict(schema)), setter)
+        self.assertIsNot(
+            md.PropertyFactory("_test_property", {"type": "string", "enum": ["a"]}),
+            setter,
+        )
+        self.assertIsNot(md.PropertyFactory("_other_property", schema), setter)
+
+    def test_enum_values(self):
+        enum = md.EnumValues(["a", 1, True])
+        self.assertEqual(enum, ["a", 1, True])
+        self.assertEqual(str(enum), str(["a", 1, True]))
+        self.assertIn("a", enum)
+        self.assertIn(1.0, enum)
+        self.assertNotIn("b", enum)
+        self.assertNotIn(["a"], enum)
+        self.assertIn(["a"], md.EnumValues([["a"]]))
+
+    def assertSameError(self, exc, set_one, set_bulk):
+        with self.assertRaises(exc) as one:
+            set_one()
+        with self.assertRaises(exc) as bulk:
+            set_bulk()
+        self.assertEqual(str(one.exception), str(bulk.exception))
+
+    def test_set_props_bulk(self):
+        s = md.Sample()
+        s.set_props_bulk({"submitter_id": "s1", "sample_type": "Blood Derived Normal"})
+        self.assertEqual(s.submitter_id, "s1")
+        self.assertEqual(s.sample_type, "Blood Derived Normal")
+
+        self.assertSameError(
+            ValidationError,
+            lambda: setattr(md.Sample(), "sample_type", "not a sample type"),
+            lambda: s.set_props_bulk({"sample_type": "not a sample type"}),
+        )
+        self.assertSameError(
+            ValidationError,
+            lambda: setattr(md.Sample(), "submitter_id", 0),
+            lambda: s.set_props_bulk({"submitter_id": 0}),
+        )
+        self.assertSameError(
+            KeyError,
+            lambda: md.Sample()._set_property("not_a_property", 0),
+            lambda: s.set_props_bulk({"not_a_property": 0}),
+        )
+
+        # Nothing is written if any property is invalid
+        self.assertEqual(s.submitter_id, "s1")
+        self.assertEqual(s.sample_type, "Blood Derived Normal")
+
+    def test_unknown_properties(self):
+        # The constructor sets unknown keys as attributes, not properties
+        s = md.Sample(properties={"submitter_id": "s1", "not_a_property": 0})
+        self.assertEqual(s._props, {"submitter_id": "s1"})
+
+        # Bulk assignment rejects them and writes nothing
+        with self.assertRaises(KeyError):
+            s.set_props_bulk({"submitter_id": "s2", "not_a_property": 0})
+        self.assertEqual(s._props, {"submitter_id": "s1"})
+        with self.assertRaises(KeyError):
+            md.Sample.validate_props({"not_a_property": 0})
+        with self.assertRaises(KeyError):
+            md.Sample.from_docs([{"submitter_id": "s1", "not_a_property": 0}])
+
+    def test_from_docs(self):
+        docs = [
+            {"type": "sample", "id": "1", "submitter_id": "s1", "cases": {}},
+            {"submitter_id": "s2", "sample_type": "Blood Derived Normal"},
+        ]
+        s1, s2 = md.Sample.from_docs(docs)
+        self.assertEqual((s1.node_id, s1._props), ("1", {"submitter_id": "s1"}))
+        self.assertEqual(s2.sample_type, "Blood Derived Normal")
+
+        with self.assertRaises(ValidationError):
+            md.Sample.from_docs(docs + [{"sample_type": "not a sample type"}])
+        with self.assertRaises(ValueError):
+            md.Sample.from_docs([{"type": "case"}])
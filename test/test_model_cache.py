@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.test.test_model_cache
+----------------------------------
+
+Test the on-disk cache of compiled model definitions.
+
+"""
+
+import json
+
+from dictionaryutils import dictionary
+from psqlgraph import Node, Edge
+
+from gen3datamodel import models as md, query
+from gen3datamodel.models import cache
+
+
+def test_definitions_round_trip(tmpdir):
+    definitions = md.compile_definitions()
+    cache.dump("key", definitions, cache_dir=str(tmpdir))
+    assert cache.load("key", cache_dir=str(tmpdir)) == definitions
+
+
+def test_stale_definitions_are_ignored(tmpdir):
+    cache.dump("old_key", {"nodes": {}}, cache_dir=str(tmpdir))
+    path = cache.get_cache_path("new_key", cache_dir=str(tmpdir))
+    with open(path, "w") as f:
+        json.dump({"key": "old_key", "definitions": {"nodes": {}}}, f)
+    assert cache.load("new_key", cache_dir=str(tmpdir)) is None
+
+
+def test_corrupt_definitions_are_ignored(tmpdir):
+    path = cache.get_cache_path("key", cache_dir=str(tmpdir))
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert cache.load("key", cache_dir=str(tmpdir)) is None
+
+
+def test_stale_cache_is_rebuilt(tmpdir, monkeypatch):
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmpdir))
+    key = cache.get_cache_key(dictionary.schema, dictionary.settings)
+    with open(cache.get_cache_path(key), "w") as f:
+        json.dump({"key": "stale", "definitions": {}}, f)
+
+    assert md.get_definitions() == md.compile_definitions()
+    assert cache.load(key) == md.compile_definitions()
+
+
+def test_cache_can_be_disabled(tmpdir, monkeypatch):
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, "")
+    assert cache.dump("key", {}) is None
+    assert cache.load("key") is None
+
+
+def test_cache_is_opt_in(tmpdir, monkeypatch):
+    monkeypatch.delenv(cache.CACHE_DIR_ENV, raising=False)
+    monkeypatch.setenv("HOME", str(tmpdir))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmpdir))
+    assert cache.get_cache_dir() is None
+    assert cache.dump("key", {}) is None
+    assert tmpdir.listdir() == []
+
+
+def test_disabled_cache_skips_key(monkeypatch):
+    def get_cache_key(*args, **kwargs):
+        raise AssertionError("the key is not needed without a cache")
+
+    monkeypatch.delenv(cache.CACHE_DIR_ENV, raising=False)
+    monkeypatch.setattr(cache, "get_cache_key", get_cache_key)
+    monkeypatch.setattr(query, "traversals", {})
+    monkeypatch.setattr(query, "traversals_loaded", False)
+    assert md.get_definitions() == md.compile_definitions()
+    assert query.get_traversal_paths("aliquot", "case")
+    assert query.load_traversals() is None
+
+
+def test_definitions_match_models():
+    definitions = md.compile_definitions()
+
+    for entity, definition in definitions["nodes"].items():
+        cls = Node.get_subclass(entity)
+        assert cls.__name__ == definition["name"]
+        assert cls.__tablename__ == definition["tablename"]
+        assert set(cls.__pg_properties__) == set(definition["properties"])
+
+    for name, definition in definitions["edges"].items():
+        assert (
+            Edge.get_unique_subclass(
+                definition["src_label"], definition["label"], definition["dst_label"]
+            ).__tablename__
+            == definition["tablename"]
+        )
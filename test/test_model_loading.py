@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.test.test_model_loading
+----------------------------------
+
+Test creating model classes on first reference, for subsets of the
+dictionary and with promoted properties.
+
+These are decided at import time, so each test runs in a fresh
+interpreter.
+
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+
+def run_models(script, **env):
+    env = dict(os.environ, **env)
+    return subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(script)],
+        env=env,
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout.decode()
+
+
+def test_lazy_import_creates_closure_on_reference():
+    run_models(
+        """
+        from psqlgraph import Node
+        from gen3datamodel import models as md
+
+        entity = max(md.definitions["links"], key=lambda e: len(md.get_link_closure([e])))
+        closure = md.get_link_closure([entity])
+        assert len(Node.get_subclasses()) < len(md.definitions["nodes"])
+
+        cls = getattr(md, md.definitions["nodes"][entity]["name"])
+        labels = {c.label for c in Node.get_subclasses()}
+        assert closure <= labels
+        for link in md.definitions["links"][entity]:
+            assert link["name"] in cls._pg_edges
+            assert hasattr(cls, link["name"])
+        """,
+        GEN3DATAMODEL_LAZY="1",
+    )
+
+
+def test_lazy_models_match_eager_models():
+    output = run_models(
+        """
+        from psqlgraph import Node
+        from gen3datamodel import models as md
+
+        for name in md.class_entities:
+            getattr(md, name)
+
+        for cls in sorted(Node.get_subclasses(), key=lambda c: c.label):
+            print(cls.label, sorted(cls._pg_edges), sorted(cls.__pg_properties__))
+        """,
+        GEN3DATAMODEL_LAZY="1",
+    )
+
+    from psqlgraph import Node
+    from gen3datamodel import models  # noqa
+
+    expected = "".join(
+        "{} {} {}\n".format(
+            cls.label, sorted(cls._pg_edges), sorted(cls.__pg_properties__)
+        )
+        for cls in sorted(Node.get_subclasses(), key=lambda c: c.label)
+    )
+    assert output == expected
+
+
+def test_lazy_traversals():
+    run_models(
+        """
+        from gen3datamodel import models as md, query
+
+        md.Aliquot
+        count = len(md.schema_registry.get_nodes())
+        traversals = query.traversals
+        paths = query.get_traversal_paths("aliquot", "case")
+        assert paths and len(md.schema_registry.get_nodes()) >= count
+        for path in paths:
+            query.get_path_steps("aliquot", path)
+
+        # Creating more classes doesn't reload the traversals
+        md.load_models()
+        assert query.traversals is traversals and set(traversals) == {"aliquot"}
+        assert sorted(query.get_traversal_paths("aliquot", "case")) == sorted(paths)
+        """,
+        GEN3DATAMODEL_LAZY="1",
+    )
+
+
+def test_lazy_unknown_attribute():
+    run_models(
+        """
+        from gen3datamodel import models as md
+
+        try:
+            md.NotAModel
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError("expected AttributeError")
+        """,
+        GEN3DATAMODEL_LAZY="1",
+    )
+
+
+def test_types_allowlist():
+    run_models(
+        """
+        import os
+        from psqlgraph import Node
+        from gen3datamodel import models as md
+
+        entity = os.environ["GEN3DATAMODEL_TYPES"]
+        closure = md.get_link_closure([entity])
+        assert {c.label for c in Node.get_subclasses()} == closure
+
+        for other, node in md.definitions["nodes"].items():
+            if other not in closure:
+                assert not hasattr(md, node["name"])
+        """,
+        GEN3DATAMODEL_TYPES=leaf_entity(),
+    )
+
+
+def test_load_models():
+    run_models(
+        """
+        from psqlgraph import Node
+        from gen3datamodel import models as md
+
+        entity = max(md.definitions["links"], key=lambda e: len(md.get_link_closure([e])))
+        md.load_models([entity])
+        labels = {c.label for c in Node.get_subclasses()}
+        assert md.get_link_closure([entity]) <= labels
+
+        for label in md.get_link_closure([entity]):
+            cls = Node.get_subclass(label)
+            for link in md.definitions["links"][label]:
+                assert link["name"] in cls._pg_links
+                assert link["name"] in cls._pg_edges
+        """,
+        GEN3DATAMODEL_LAZY="1",
+    )
+
+
+def test_types_allowlist_without_links():
+    run_models(
+        """
+        import os
+        from psqlgraph import Node
+        from gen3datamodel import models as md
+
+        entity = os.environ["GEN3DATAMODEL_TYPES"]
+        assert Node.get_subclass(entity)
+        assert not Node.get_subclass(entity)._pg_links
+
+        # The only other classes are the ones Edge needs to be mapped
+        seed = md.get_lazy_seed()
+        assert any(md.definitions["links"][label] for label in seed)
+        assert {c.label for c in Node.get_subclasses()} == {entity} | seed
+        """,
+        GEN3DATAMODEL_TYPES=unlinked_entity(),
+    )
+
+
+def test_promoted_properties():
+    run_models(
+        """
+        from dictionaryutils import dictionary
+        from psqlgraph import Node
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy.orm import Query, aliased
+
+        dictionary.settings = dict(
+            dictionary.settings or {}, promoted_properties=["project_id", "state"]
+        )
+
+        from gen3datamodel import models as md
+
+        cls = next(
+            c for c in Node.get_subclasses() if "project_id" in c.__pg_properties__
+        )
+        table = cls.__table__
+        assert set(cls._pg_promoted_columns) <= {"project_id", "state"}
+        assert cls._pg_promoted_columns["project_id"] is table.c.project_id
+        assert any(
+            i.name.endswith("project_id_promoted") for i in table.indexes
+        )
+
+        query = Query(cls).filter(
+            cls.project_id == "a-b", cls.project_id.astext.like("a-%")
+        )
+        sql = str(query.statement.compile(dialect=postgresql.dialect()))
+        assert "_props" not in sql.split("WHERE")[1], sql
+
+        alias = aliased(cls)
+        query = Query(alias).filter(alias.project_id == "a-b")
+        sql = str(query.statement.compile(dialect=postgresql.dialect()))
+        from_clause = sql.split("FROM")[1].split("WHERE")[0].strip()
+        assert from_clause == "{0} AS {0}_1".format(table.name), sql
+        assert "_props" not in sql.split("WHERE")[1], sql
+
+        node = cls(project_id="a-b")
+        md.copy_promoted_properties(node)
+        assert node._promoted_project_id == node.project_id == "a-b"
+        assert "project_id" in cls.get_property_list()
+        """
+    )
+
+
+def test_preload():
+    run_models(
+        """
+        import gc
+        from psqlgraph import Node
+
+        import gen3datamodel
+        from gen3datamodel import models as md, query
+        from gen3datamodel.validators import GDCJSONValidator
+
+        gen3datamodel.preload()
+
+        assert len(Node.get_subclasses()) == len(md.definitions["nodes"])
+        assert set(query.traversals) == set(md.definitions["nodes"])
+        assert set(GDCJSONValidator.validators) == set(md.dictionary.schema)
+        assert gc.get_freeze_count()
+
+        validator = GDCJSONValidator()
+        entity = next(iter(md.dictionary.schema))
+        assert validator.get_validator(entity) is GDCJSONValidator.validators[entity]
+        """,
+        GEN3DATAMODEL_LAZY="1",
+    )
+
+
+def test_model_namespaces():
+    run_models(
+        """
+        import pytest
+        from dictionaryutils import dictionary
+        from psqlgraph import Node, Edge
+
+        from gen3datamodel import models as md
+        from gen3datamodel.models.namespaces import build_models
+
+        nodes, edges = Node.get_subclasses(), Edge.get_subclasses()
+        tables = dict(Node.metadata.tables)
+        entity = max(md.definitions["links"], key=lambda e: len(md.definitions["links"][e]))
+        name = md.definitions["nodes"][entity]["name"]
+
+        ns = build_models(dictionary, "commons_b", types=[entity])
+        cls = getattr(ns, name)
+        assert cls is not getattr(md, name)
+        assert cls.__name__ == "CommonsB" + name
+        assert cls.__table__.schema == "commons_b"
+        assert cls.__table__.metadata is ns.metadata
+        assert ns.schema_registry.get_node(entity) is cls
+        assert {c.label for c in ns.schema_registry.get_nodes()} == (
+            md.get_link_closure([entity], ns.definitions)
+        )
+
+        for edge in ns.schema_registry.get_edges_out(cls):
+            assert edge.__table__.schema == "commons_b"
+            assert edge.__table__.metadata is ns.metadata
+            for fk in edge.__table__.foreign_keys:
+                assert fk.target_fullname.startswith("commons_b.")
+            dst = ns.schema_registry.get_node_named(edge.__dst_class__)
+            assert cls._pg_edges[edge.__src_dst_assoc__]["type"] is dst
+
+        # The default models are untouched
+        assert set(md.schema_registry.get_nodes()) == set(nodes)
+        assert set(md.schema_registry.get_edges()) == set(edges)
+        assert getattr(md, name)._pg_edges.keys() == cls._pg_edges.keys()
+
+        # create_all() for the default models creates the same tables
+        assert dict(Node.metadata.tables) == tables
+        assert not any(t.schema == "commons_b" for t in Node.metadata.sorted_tables)
+        assert {t.schema for t in ns.metadata.sorted_tables} == {"commons_b"}
+
+        assert build_models(dictionary, "commons_b") is ns
+        with pytest.raises(ValueError):
+            build_models(object(), "commons_b")
+        with pytest.raises(ValueError):
+            build_models(dictionary, "Commons-B")
+        """
+    )
+
+
+def leaf_entity():
+    from gen3datamodel import models as md
+
+    return min(
+        (e for e, links in md.definitions["links"].items() if links),
+        key=lambda e: len(md.get_link_closure([e])),
+    )
+
+
+def unlinked_entity():
+    from gen3datamodel import models as md
+
+    return next(e for e, links in md.definitions["links"].items() if not links)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.test.test_node_ancestors
+----------------------------------
+
+Test the node_ancestors closure table and its maintenance hooks.
+
+"""
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from gen3datamodel import models as md
+from gen3datamodel import query
+from gen3datamodel.models import node_ancestors
+
+
+@pytest.fixture
+def ancestors_table(g):
+    node_ancestors.maintain_node_ancestors()
+    with g.engine.begin() as connection:
+        node_ancestors.rebuild_node_ancestors(connection)
+    yield
+    with g.session_scope() as session:
+        for cls in (md.Program, md.Project, md.Experiment, md.Case, md.Sample):
+            for node in session.query(cls).all():
+                session.delete(node)
+    with g.engine.begin() as connection:
+        connection.execute(md.NodeAncestor.__table__.delete())
+    node_ancestors.maintain_node_ancestors(False)
+
+
+def get_ancestors(g):
+    with g.session_scope() as session:
+        return {
+            (row.descendant_id, row.ancestor_id, row.ancestor_label, row.depth)
+            for row in session.query(md.NodeAncestor)
+        }
+
+
+def create_graph(g):
+    with g.session_scope() as session:
+        program = md.Program("program", name="program")
+        project = md.Project("project", code="project", name="project")
+        project.programs = [program]
+        experiment = md.Experiment("experiment", submitter_id="experiment")
+        experiment.projects = [project]
+        case = md.Case("case", submitter_id="case")
+        case.experiments = [experiment]
+        sample = md.Sample("sample", submitter_id="sample")
+        sample.cases = [case]
+        session.add(sample)
+
+
+class RecordingConnection(object):
+    """Returns :attr:`descendant_ids` for the first statement and no rows
+    for the others
+
+    """
+
+    def __init__(self, descendant_ids):
+        self.descendant_ids = descendant_ids
+        self.statements = []
+
+    def execute(self, statement, **kwargs):
+        self.statements.append(statement.compile(dialect=postgresql.dialect()))
+        if len(self.statements) == 1:
+            return [md.NodeAncestor(descendant_id=i) for i in self.descendant_ids]
+        return type("Result", (), {"rowcount": 0})()
+
+
+def test_removed_edge_binds_descendants_as_array():
+    descendant_ids = ["descendant_{}".format(i) for i in range(1000)]
+    edge = md.SampleDerivedFromCase("sample", "case")
+    connection = RecordingConnection(descendant_ids)
+    node_ancestors.remove_node_ancestors(None, connection, edge)
+
+    delete, fill = connection.statements[1:]
+    for compiled in (delete, fill):
+        assert " IN (" not in str(compiled)
+        assert "= ANY (" in str(compiled)
+        assert ["sample"] + descendant_ids in compiled.params.values()
+
+
+def test_maintain_node_ancestors_is_idempotent():
+    edge = md.schema_registry.get_edges()[0]
+    before = len(edge.__mapper__.dispatch.after_insert)
+
+    node_ancestors.maintain_node_ancestors()
+    node_ancestors.maintain_node_ancestors()
+    assert len(edge.__mapper__.dispatch.after_insert) == before + 1
+
+    node_ancestors.maintain_node_ancestors(False)
+    assert len(edge.__mapper__.dispatch.after_insert) == before
+
+
+def test_inserted_edges_add_ancestors(g, ancestors_table):
+    create_graph(g)
+
+    ancestors = get_ancestors(g)
+    assert ("sample", "program", "program", 4) in ancestors
+    assert ("case", "project", "project", 2) in ancestors
+    assert len(ancestors) == 4 + 3 + 2 + 1
+
+    with g.engine.begin() as connection:
+        node_ancestors.rebuild_node_ancestors(connection)
+    assert get_ancestors(g) == ancestors
+
+
+def test_deleted_edges_remove_ancestors(g, ancestors_table):
+    create_graph(g)
+
+    with g.session_scope() as session:
+        case = session.query(md.Case).one()
+        case.experiments = []
+
+    ancestors = get_ancestors(g)
+    assert {(d, a) for d, a, _, _ in ancestors} == {
+        ("sample", "case"),
+        ("experiment", "project"),
+        ("experiment", "program"),
+        ("project", "program"),
+    }
+
+
+def test_query_helpers(g, ancestors_table):
+    create_graph(g)
+
+    with g.session_scope():
+        samples = query.descendants_of(g.nodes(md.Sample), "project")
+        assert [n.node_id for n in samples.all()] == ["sample"]
+        assert not query.descendants_of(g.nodes(md.Sample), "project", 2).count()
+
+        projects = query.ancestors_of(g.nodes(md.Project), ["sample"])
+        assert [n.node_id for n in projects.all()] == ["project"]
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.test.test_prefetch
+----------------------------------
+
+Test loading the nodes along link paths with one query per link.
+
+"""
+
+import pytest
+from sqlalchemy import event
+
+from gen3datamodel import models as md
+from gen3datamodel.prefetch import get_fetch_plan, prefetch
+
+
+def test_fetch_plan():
+    plan = get_fetch_plan(md.Case, ["samples.aliquots", "experiments", "samples"])
+    assert sorted(plan) == ["experiments", "samples"]
+
+    samples = plan["samples"]
+    assert samples.edge_cls is md.SampleDerivedFromCase
+    assert samples.relationship == "_SampleDerivedFromCase_in"
+    assert (samples.this_attr, samples.neighbor_attr) == ("dst", "src")
+    assert list(samples.links) == ["aliquots"]
+    assert samples.links["aliquots"].edge_cls is md.AliquotDerivedFromSample
+
+    experiments = plan["experiments"]
+    assert experiments.edge_cls is md.CaseMemberOfExperiment
+    assert (experiments.this_attr, experiments.neighbor_attr) == ("src", "dst")
+    assert not experiments.links
+
+
+def test_fetch_plan_unknown_link():
+    with pytest.raises(ValueError, match="Sample has no link bogus"):
+        get_fetch_plan(md.Case, ["samples.bogus"])
+
+
+@pytest.fixture
+def cases(g):
+    with g.session_scope() as session:
+        for i in range(3):
+            case = md.Case("case{}".format(i), submitter_id="case{}".format(i))
+            for j in range(2):
+                sample = md.Sample(
+                    "sample{}{}".format(i, j), submitter_id="s{}{}".format(i, j)
+                )
+                sample.cases = [case]
+                aliquot = md.Aliquot(
+                    "aliquot{}{}".format(i, j), submitter_id="a{}{}".format(i, j)
+                )
+                aliquot.samples = [sample]
+                session.add(aliquot)
+    yield
+    with g.session_scope() as session:
+        for cls in (md.Aliquot, md.Sample, md.Case):
+            for node in session.query(cls).all():
+                session.delete(node)
+
+
+def test_prefetch(g, cases):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with g.session_scope() as session:
+        cases = session.query(md.Case).all()
+        event.listen(g.engine, "before_cursor_execute", count)
+        try:
+            prefetch(session, cases, ["samples.aliquots"])
+            assert len(statements) == 2
+            assert all("= ANY (" in statement for statement in statements)
+
+            aliquots = {
+                aliquot.node_id
+                for case in cases
+                for sample in case.samples
+                for aliquot in sample.aliquots
+            }
+            assert len(statements) == 2
+        finally:
+            event.remove(g.engine, "before_cursor_execute", count)
+
+    assert aliquots == {"aliquot{}{}".format(i, j) for i in range(3) for j in range(2)}
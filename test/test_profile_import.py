@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.test.test_profile_import
+----------------------------------
+
+Test the model import profiler.
+
+"""
+
+import json
+import subprocess
+import sys
+
+from gen3datamodel import profile_import
+
+
+def test_profile_import_report():
+    output = subprocess.run(
+        [sys.executable, "-m", "gen3datamodel.profile_import"],
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout
+    report = json.loads(output.decode())
+
+    for phase in profile_import.PHASES + ("import", "load_models"):
+        assert report["phases"][phase]["seconds"] >= 0
+        assert "allocated_bytes" in report["phases"][phase]
+        assert "peak_bytes" in report["phases"][phase]
+
+    created = set(report["classes"]) | set(report["created_at_import"])
+    assert len(created) == report["node_count"] + report["edge_count"]
+
+    factories = set()
+    for measurements in report["classes"].values():
+        factories.update(measurements)
+        assert all(m["calls"] >= 1 for m in measurements.values())
+    assert factories == set(profile_import.FACTORIES)
+
+
+def test_accumulate():
+    total = {}
+    profile_import.accumulate(total, {"seconds": 1.0, "peak_bytes": 10})
+    profile_import.accumulate(total, {"seconds": 0.5, "peak_bytes": 4})
+    assert total == {"seconds": 1.5, "peak_bytes": 10, "calls": 2}
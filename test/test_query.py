@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.test.test_query
+----------------------------------
+
+Test the construction of traversals between node types.
+
+"""
+
+import datetime
+import json
+import os
+import pytest
+
+from psqlgraph import PsqlGraphDriver
+from sqlalchemy.dialects import postgresql
+from unittest import mock
+
+from gen3datamodel import models as md, query
+from gen3datamodel.models import cache, schema_registry
+
+
+def get_adjacency(links):
+    adjacency = {}
+    for src, name, dst, backref in links:
+        adjacency.setdefault(src, []).append((name, dst, query.is_terminal(name)))
+        adjacency.setdefault(dst, []).append((backref, src, query.is_terminal(backref)))
+    return adjacency
+
+
+ADJACENCY = get_adjacency(
+    [
+        ("sample", "cases", "case", "samples"),
+        ("aliquot", "samples", "sample", "aliquots"),
+        ("aliquot", "cases", "case", "aliquots"),
+        ("annotation", "cases", "case", "annotations"),
+        ("annotation", "samples", "sample", "annotations"),
+    ]
+)
+
+
+def test_paths_do_not_revisit_types():
+    paths = query.get_paths(ADJACENCY, "aliquot")
+
+    assert paths["aliquot"] == {""}
+    assert paths["sample"] == {"samples", "cases.samples"}
+    assert paths["case"] == {"cases", "samples.cases"}
+
+
+def test_paths_stop_at_terminal_links():
+    paths = query.get_paths(ADJACENCY, "case")
+
+    # Annotations are reached but not walked through
+    assert "annotations" in paths["annotation"]
+    assert paths["sample"] == {"samples", "aliquots.samples"}
+
+
+def test_paths_continue_from_path():
+    paths = query.get_paths(ADJACENCY, "sample", ["aliquot"], ["samples"])
+
+    assert paths["sample"] == {"samples"}
+    assert paths["case"] == {"samples.cases"}
+    assert "aliquot" not in paths
+
+
+def test_encoded_traversals_round_trip():
+    table = {label: query.get_paths(ADJACENCY, label) for label in ADJACENCY}
+    encoded = json.loads(json.dumps(query.encode_traversals(table)))
+    assert query.decode_traversals(encoded) == table
+
+
+def test_adjacency_matches_models():
+    adjacency = query.get_adjacency()
+    assert set(adjacency) == {n.label for n in schema_registry.get_nodes()}
+
+    for node in schema_registry.get_nodes():
+        links = {(name, dst) for name, dst, _ in adjacency[node.label]}
+        for edge in schema_registry.get_edges_out(node):
+            dst = schema_registry.get_node_named(edge.__dst_class__).label
+            assert (edge.__src_dst_assoc__, dst) in links
+        for edge in schema_registry.get_edges_in(node):
+            src = schema_registry.get_node_named(edge.__src_class__).label
+            assert (edge.__dst_src_assoc__, src) in links
+
+
+def test_traversals_are_cached(tmpdir, monkeypatch):
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmpdir))
+    monkeypatch.setattr(query, "traversals", {})
+    monkeypatch.setattr(query, "traversals_loaded", False)
+
+    path = query.load_traversals()
+    assert path and os.path.exists(path)
+    constructed = dict(query.traversals)
+    assert set(constructed) == {n.label for n in schema_registry.get_nodes()}
+
+    construct = mock.Mock(side_effect=query.construct_traversals_for_all_nodes)
+    monkeypatch.setattr(query, "construct_traversals_for_all_nodes", construct)
+    assert query.load_traversals() == path
+    assert query.traversals == constructed
+    assert not construct.called
+
+
+def test_stale_traversals_are_rebuilt(tmpdir, monkeypatch):
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmpdir))
+    monkeypatch.setattr(query, "traversals", {})
+    monkeypatch.setattr(query, "traversals_loaded", False)
+
+    path = query.load_traversals()
+    key = query.get_traversals_key()
+    with open(path, "w") as f:
+        json.dump({"key": "stale", "definitions": {}}, f)
+
+    query.load_traversals()
+    assert set(query.traversals) == {n.label for n in schema_registry.get_nodes()}
+    assert cache.load(key, prefix=query.TRAVERSALS_FILE_PREFIX) is not None
+
+
+def test_traversals_from_cold_cache(tmpdir, monkeypatch):
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmpdir))
+    monkeypatch.setattr(query, "traversals", {})
+    monkeypatch.setattr(query, "traversals_loaded", False)
+    construct = mock.Mock(side_effect=query.construct_traversals_for_all_nodes)
+    monkeypatch.setattr(query, "construct_traversals_for_all_nodes", construct)
+
+    # Only the traversals from the source are constructed, and not cached
+    assert query.get_traversal_paths("aliquot", "case")
+    assert set(query.traversals) == {"aliquot"}
+    assert not construct.called
+    assert tmpdir.listdir() == []
+
+
+def test_traversals_read_from_cache(tmpdir, monkeypatch):
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmpdir))
+    monkeypatch.setattr(query, "traversals", {})
+    query.load_traversals()
+    cached = dict(query.traversals)
+
+    monkeypatch.setattr(query, "traversals", {})
+    monkeypatch.setattr(query, "traversals_loaded", False)
+    construct = mock.Mock()
+    monkeypatch.setattr(query, "construct_traversals_from", construct)
+    assert sorted(query.get_traversal_paths("aliquot", "case")) == sorted(
+        cached["aliquot"]["case"]
+    )
+    assert query.traversals == cached
+    assert not construct.called
+
+
+def test_path_steps():
+    steps = query.get_path_steps("aliquot", "samples.cases")
+    assert [(edge.__src_class__, edge.__dst_class__, out) for edge, out in steps] == [
+        ("Aliquot", "Sample", True),
+        ("Sample", "Case", True),
+    ]
+
+    steps = query.get_path_steps("case", "samples")
+    assert [(edge.__src_class__, out) for edge, out in steps] == [("Sample", False)]
+
+    with pytest.raises(ValueError):
+        query.get_path_steps("case", "not_a_link")
+
+
+@pytest.fixture
+def offline_g():
+    # Queries are only compiled, never executed
+    return PsqlGraphDriver("localhost", "user", "password", "database")
+
+
+def compile_query(q):
+    return str(q.statement.compile(dialect=postgresql.dialect()))
+
+
+def test_recursive_strategy(offline_g):
+    with offline_g.session_scope():
+        q = query.union_subq_path(
+            offline_g.nodes(md.Aliquot),
+            "case",
+            [lambda q: q.ids("case_id")],
+            strategy="recursive",
+        )
+        sql = compile_query(q)
+
+    assert sql.count("WITH RECURSIVE") == 1
+    assert "UNION ALL" in sql
+    assert "node_case.node_id" in sql
+
+
+def test_recursive_strategy_filters(offline_g):
+    with offline_g.session_scope():
+        with pytest.raises(ValueError):
+            query.union_subq_path(
+                offline_g.nodes(md.Aliquot),
+                "case",
+                [None, lambda q: q.ids("sample_id")],
+                strategy="recursive",
+            )
+
+        with pytest.raises(ValueError):
+            query.union_subq_path(offline_g.nodes(md.Aliquot), "case", strategy="joins")
+
+
+def test_path_trie():
+    trie = query.get_path_trie("aliquot", ["samples.cases", "samples.diagnoses.cases"])
+
+    assert not trie["end"]
+    (((edge, outbound), samples),) = trie["links"].items()
+    assert (edge.__dst_class__, outbound) == ("Sample", True)
+    assert not samples["end"]
+    assert len(samples["links"]) == 2
+    assert sum(links["end"] for links in samples["links"].values()) == 1
+
+
+def test_trie_strategy_joins_shared_prefixes_once(offline_g):
+    paths = {"samples.cases", "samples.diagnoses.cases"}
+    edge = query.get_path_steps("aliquot", "samples")[0][0]
+
+    with offline_g.session_scope():
+        destination = offline_g.nodes(md.Case).cte("destination")
+        trie = query.trie_ids(query.get_path_trie("aliquot", paths), destination)
+        sql = str(trie.compile(dialect=postgresql.dialect()))
+
+        q = query.union_subq_path(
+            offline_g.nodes(md.Aliquot),
+            "case",
+            [lambda q: q.ids("case_id")],
+            strategy="trie",
+        )
+        assert compile_query(q).count("WITH destination") == 1
+
+    assert sql.count("FROM {}".format(edge.__tablename__)) == 1
+
+
+def test_traverse_many_select():
+    sql = str(
+        query.traverse_many_select("aliquot", ["a", "b"], "case").compile(
+            dialect=postgresql.dialect()
+        )
+    )
+    assert sql.count("WITH RECURSIVE") == 1
+    assert "SELECT DISTINCT walk.src_id, walk.node_id AS dst_id" in sql
+
+    # The ids are bound as one array
+    statement = query.traverse_many_select("aliquot", ["a", "b", "c"], "case")
+    compiled = statement.compile(dialect=postgresql.dialect())
+    assert "= ANY (%(ids_1)s" in str(compiled)
+    assert compiled.params["ids_1"] == ["a", "b", "c"]
+
+    assert query.traverse_many_select("case", ["a"], "case") is not None
+
+
+def test_traverse_many(g):
+    with g.session_scope() as session:
+        experiment = md.Experiment("experiment", submitter_id="experiment")
+        for i in range(3):
+            case = md.Case("case_{}".format(i), submitter_id="case_{}".format(i))
+            case.experiments = [experiment]
+            sample = md.Sample("sample_{}".format(i), submitter_id="sample")
+            sample.cases = [case]
+            session.add(sample)
+        session.flush()
+
+        pairs = set(
+            query.traverse_many(session, "sample", ["sample_0", "sample_2"], "case")
+        )
+        assert ("sample_0", "case_0") in pairs
+        assert ("sample_2", "case_2") in pairs
+        assert {src for src, _ in pairs} == {"sample_0", "sample_2"}
+
+        session.rollback()
+
+
+def test_anti_join(offline_g):
+    with offline_g.session_scope():
+        q = query.union_subq_without_path(
+            offline_g.nodes(md.Aliquot),
+            "case",
+            [lambda q: q.ids("case_id")],
+            anti_join=True,
+        )
+        sql = compile_query(q)
+
+        # Nothing is without a path to its own type
+        q = query.union_subq_without_path(
+            offline_g.nodes(md.Aliquot), "aliquot", anti_join=True
+        )
+        assert compile_query(q).endswith("WHERE false")
+
+    assert "EXCEPT" not in sql
+    first_links = query.get_path_trie(
+        "aliquot", query.get_traversal_paths("aliquot", "case")
+    )["links"]
+    assert sql.count("NOT (EXISTS") == len(first_links)
+
+
+PLAN = {
+    "Plan": {
+        "Node Type": "Hash Join",
+        "Total Cost": 120.5,
+        "Plan Rows": 10,
+        "Actual Rows": 12,
+        "Shared Hit Blocks": 7,
+        "Shared Read Blocks": 1,
+        "Plans": [
+            {
+                "Node Type": "Seq Scan",
+                "Relation Name": "node_aliquot",
+                "Plans": [],
+            },
+            {
+                "Node Type": "Index Scan",
+                "Index Name": "edge_aliquotderivedfromsample_pkey",
+                "Relation Name": "edge_aliquotderivedfromsample",
+            },
+        ],
+    },
+    "Execution Time": 3.5,
+}
+
+
+class ExplainSession(object):
+    """Compiles queries with a real session and returns PLAN for EXPLAIN"""
+
+    def __init__(self, session):
+        self.session = session
+        self.statements = []
+        self.params = []
+
+    def query(self, *args):
+        return self.session.query(*args)
+
+    def execute(self, statement):
+        compiled = statement.compile(dialect=postgresql.dialect())
+        self.statements.append(str(compiled))
+        self.params.append(compiled.params)
+        return mock.Mock(first=lambda: ([PLAN],))
+
+
+def test_summarize_plan():
+    assert query.summarize_plan(PLAN) == {
+        "cost": 120.5,
+        "estimated_rows": 10,
+        "actual_rows": 12,
+        "execution_ms": 3.5,
+        "shared_hit_blocks": 7,
+        "shared_read_blocks": 1,
+        "indexes": ["edge_aliquotderivedfromsample_pkey"],
+        "seq_scans": ["node_aliquot"],
+    }
+
+
+def test_explain_binds_parameters(offline_g):
+    created = datetime.datetime(2020, 1, 2, tzinfo=datetime.timezone.utc)
+    with offline_g.session_scope() as graph_session:
+        session = ExplainSession(graph_session)
+        q = (
+            graph_session.query(md.Aliquot)
+            .filter(md.Aliquot.created > created)
+            .filter(md.Aliquot._props.contains({"key": ["a", "b"]}))
+            .filter(md.Aliquot.acl.contains(["open"]))
+        )
+        query.explain(session, q, analyze=False)
+
+    assert session.statements[0].startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert created in session.params[0].values()
+    assert {"key": ["a", "b"]} in session.params[0].values()
+    assert ["open"] in session.params[0].values()
+
+
+def test_explain_traversals(offline_g):
+    with offline_g.session_scope() as graph_session:
+        session = ExplainSession(graph_session)
+        explanation = query.explain_traversals(session, "aliquot", "sample", ["s"])
+
+    paths = query.get_traversal_paths("aliquot", "sample")
+    assert sorted(p["path"] for p in explanation["paths"]) == sorted(paths)
+    assert len(session.statements) == len(paths) + 1
+    assert all(
+        s.startswith("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)")
+        for s in session.statements
+    )
+    # Parameters are bound, not rendered into the SQL
+    assert "'s'" not in session.statements[-1]
+    assert ["s"] in session.params[-1].values()
+
+    table = query.format_explanation(explanation)
+    assert "(whole query)" in table
+    assert "edge_aliquotderivedfromsample_pkey" in table
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.test.test_schema_registry
+----------------------------------
+
+Test that the schema registry agrees with the psqlgraph subclass scans.
+
+"""
+
+import pytest
+
+from psqlgraph import Node, Edge
+
+from gen3datamodel import models as md
+from gen3datamodel.models.registry import SchemaRegistry
+
+
+def test_registry_has_all_classes():
+    assert set(md.schema_registry.get_nodes()) == set(Node.get_subclasses())
+    assert set(md.schema_registry.get_edges()) == set(Edge.get_subclasses())
+
+
+def test_nodes_by_label_and_name():
+    for cls in Node.get_subclasses():
+        assert md.schema_registry.get_node(cls.label) is Node.get_subclass(cls.label)
+        assert md.schema_registry.get_node_named(cls.__name__) is cls
+
+    assert md.schema_registry.get_node("not_a_type") is None
+    with pytest.raises(KeyError):
+        md.schema_registry.get_node_named("NotAType")
+
+
+def test_edges_by_src_and_dst():
+    for cls in Node.get_subclasses():
+        name = cls.__name__
+        assert md.schema_registry.get_edges_out(cls) == Edge._get_edges_with_src(name)
+        assert md.schema_registry.get_edges_in(name) == Edge._get_edges_with_dst(name)
+
+        for edge in md.schema_registry.get_edges_out(cls):
+            assert edge in md.schema_registry.get_edges_between(cls, edge.__dst_class__)
+
+
+def test_classes_are_registered_once():
+    edge = Edge.get_subclasses()[0]
+    registry = SchemaRegistry([edge, edge, md.FileReport])
+    assert registry.get_edges() == [edge]
+    assert registry.get_edges_out(edge.__src_class__) == [edge]
+    assert registry.get_nodes() == []
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+gen3datamodel.test.test_traversal_cache
+----------------------------------
+
+Test the LRU cache of traversal results.
+
+"""
+
+import pytest
+
+from psqlgraph import PsqlGraphDriver
+from sqlalchemy.dialects import postgresql
+
+from gen3datamodel import models as md, query
+from gen3datamodel.traversal_cache import TraversalCache, get_changed_labels
+
+
+class FakeSession(object):
+    def __init__(self, new=(), dirty=(), deleted=()):
+        self.new, self.dirty, self.deleted = new, dirty, deleted
+        self.info = {}
+
+
+@pytest.fixture
+def cache():
+    cache = TraversalCache(max_entries=2, max_bytes=10000)
+    yield cache
+    cache.close()
+
+
+def test_lru_eviction(cache):
+    cache.put("a", ("1",), frozenset(["case"]))
+    cache.put("b", ("2",), frozenset(["case"]))
+    assert cache.get("a") == ("1",)
+
+    cache.put("c", ("3",), frozenset(["case"]))
+    assert cache.get("b") is None
+    assert cache.get("a") == ("1",)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_byte_bound(cache):
+    cache.put("a", ("x" * 4000,), frozenset())
+    cache.put("b", ("y" * 4000,), frozenset())
+    assert cache.stats()["entries"] == 2
+
+    cache.put("c", ("z" * 4000,), frozenset())
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+    cache.put("d", ("w" * 20000,), frozenset())
+    assert cache.get("d") is None
+
+
+@pytest.fixture
+def offline_g():
+    # Queries are only compiled, never executed
+    return PsqlGraphDriver("localhost", "user", "password", "database")
+
+
+def test_cached_ids_are_bound_as_array(offline_g, cache, monkeypatch):
+    ids = tuple("id{}".format(i) for i in range(100))
+    monkeypatch.setattr(cache, "get_node_ids", lambda *args, **kwargs: ids)
+    with offline_g.session_scope():
+        q = cache.union_subq_path(offline_g.nodes(md.Sample), "case")
+        compiled = q.statement.compile(dialect=postgresql.dialect())
+    assert "= ANY (%(ids_1)s" in str(compiled)
+    assert compiled.params["ids_1"] == list(ids)
+
+
+def test_large_results_use_live_query(offline_g, cache, monkeypatch):
+    monkeypatch.setattr(cache, "get_node_ids", lambda *args, **kwargs: None)
+    with offline_g.session_scope():
+        q = offline_g.nodes(md.Sample)
+        for without, traverse in (
+            (False, query.union_subq_path),
+            (True, query.union_subq_without_path),
+        ):
+            cached = getattr(cache, traverse.__name__)(q, "case")
+            live = traverse(q, "case")
+            assert str(cached.statement) == str(live.statement)
+
+
+def test_uncommitted_changes_skip_cache(offline_g, cache):
+    with offline_g.session_scope() as session:
+        q = offline_g.nodes(md.Sample)
+        session.info[cache.info_key] = {"case"}
+        cached = cache.union_subq_path(q, "case")
+        assert str(cached.statement) == str(query.union_subq_path(q, "case").statement)
+
+        session.info.pop(cache.info_key)
+        session.add(md.Case("case"))
+        cache.union_subq_without_path(q, "case")
+        session.expunge_all()
+    assert cache.stats()["misses"] == 0
+
+
+def test_changed_labels():
+    case = md.Case("case")
+    sample = md.Sample("sample")
+    sample.cases = [case]
+
+    assert get_changed_labels(FakeSession(new=[case])) == {"case"}
+    assert get_changed_labels(FakeSession(deleted=sample.edges_out)) == {
+        "case",
+        "sample",
+    }
+
+
+def test_commit_invalidates_labels(cache):
+    cache.put("cases", ("1",), frozenset(["case", "sample"]))
+    cache.put("projects", ("2",), frozenset(["project"]))
+
+    session = FakeSession(new=[md.Sample("sample")])
+    cache.after_flush(session, None)
+    assert cache.get("cases") == ("1",)
+
+    cache.after_commit(session)
+    assert cache.get("cases") is None
+    assert cache.get("projects") == ("2",)
+    assert cache.stats()["invalidations"] == 1
+    assert not session.info
+
+
+def test_cached_traversals_entry_bound(g):
+    cache = TraversalCache(max_entry_ids=1)
+    with g.session_scope() as session:
+        case = md.Case("bounded_case", submitter_id="bounded_case")
+        for i in range(2):
+            sample = md.Sample("bounded_sample_{}".format(i), submitter_id="s")
+            sample.cases = [case]
+            session.add(sample)
+
+    try:
+        with g.session_scope():
+            for _ in range(2):
+                q = cache.union_subq_path(
+                    g.nodes(md.Sample), "case", [lambda q: q.ids("bounded_case")]
+                )
+                assert sorted(n.node_id for n in q.all()) == [
+                    "bounded_sample_0",
+                    "bounded_sample_1",
+                ]
+        assert cache.stats()["hits"] == 1
+    finally:
+        cache.close()
+        with g.session_scope() as session:
+            for i in range(2):
+                session.delete(g.nodes(md.Sample).get("bounded_sample_{}".format(i)))
+            session.delete(g.nodes(md.Case).get("bounded_case"))
+
+
+def test_cached_traversals(g, cache):
+    with g.session_scope() as session:
+        case = md.Case("cached_case", submitter_id="cached_case")
+        sample = md.Sample("cached_sample", submitter_id="cached_sample")
+        sample.cases = [case]
+        session.add(sample)
+
+    try:
+        with g.session_scope():
+            for _ in range(2):
+                q = cache.union_subq_path(
+                    g.nodes(md.Sample), "case", [lambda q: q.ids("cached_case")]
+                )
+                assert [n.node_id for n in q.all()] == ["cached_sample"]
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hits"] == 1
+
+        with g.session_scope():
+            g.nodes(md.Sample).one().sysan["key"] = "value"
+        assert cache.stats()["entries"] == 0
+    finally:
+        with g.session_scope() as session:
+            session.delete(g.nodes(md.Sample).get("cached_sample"))
+            session.delete(g.nodes(md.Case).get("cached_case"))
+
+
+def test_rolled_back_traversals_are_not_cached(g, cache):
+    with g.session_scope() as session:
+        session.add(md.Case("rolled_back_case", submitter_id="rolled_back_case"))
+
+    def get_samples():
+        q = cache.union_subq_path(
+            g.nodes(md.Sample), "case", [lambda q: q.ids("rolled_back_case")]
+        )
+        return [n.node_id for n in q.all()]
+
+    try:
+        with g.session_scope() as session:
+            sample = md.Sample("rolled_back_sample", submitter_id="s")
+            sample.cases = [g.nodes(md.Case).get("rolled_back_case")]
+            session.add(sample)
+            session.flush()
+            assert get_samples() == ["rolled_back_sample"]
+            session.rollback()
+
+        with g.session_scope():
+            assert get_samples() == []
+            assert get_samples() == []
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hits"] == 1
+    finally:
+        with g.session_scope() as session:
+            session.delete(g.nodes(md.Case).get("rolled_back_case"))
@@ -1,6 +1,13 @@
 import unittest
+import os
+import threading
 import uuid
+
+import pytest
+
 from gen3datamodel.validators import GDCJSONValidator, GDCGraphValidator
+from gen3datamodel.validators import compiled_validators
+from jsonschema import Draft4Validator
 from psqlgraph import PsqlGraphDriver
 from gen3datamodel.models import *
 
@@ -328,3 +335,278 @@ class TestValidators(unittest.TestCase):
             )
             self.graph_validator.record_errors(g, self.entities)
             self.assertEqual(0, len(self.entities[0].errors))
+
+
+def test_json_validator_created_once_per_type():
+    entity_type = "aliquot"
+    GDCJSONValidator.validators.pop(entity_type, None)
+    barrier = threading.Barrier(8)
+    validators = []
+
+    def get_validator():
+        barrier.wait()
+        validators.append(GDCJSONValidator().get_validator(entity_type))
+
+    threads = [threading.Thread(target=get_validator) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(validator) for validator in validators}) == 1
+    assert validators[0] is GDCJSONValidator.validators[entity_type]
+
+
+def describe_errors(errors):
+    return [
+        (e.message, list(e.path), e.schema, [c.message for c in e.context or ()])
+        for e in errors
+    ]
+
+
+def test_compiled_validators_match_draft4():
+    validator = GDCJSONValidator()
+    compiled = GDCJSONValidator(engine="compiled")
+    values = [None, True, 1, -1.5, "", "x", "2020-01-01T00:00:00", [], [1], {}]
+    for entity_type, schema in validator.schemas.schema.items():
+        documents = [{"type": entity_type}, {"type": entity_type, "extra": 1}]
+        for value in values:
+            documents.append(dict.fromkeys(schema["properties"], value))
+        for enum in ("released", "live"):
+            documents.append({"type": entity_type, "state": enum})
+        for doc in documents:
+            expected = describe_errors(
+                validator.iter_errors(dict(doc, type=entity_type))
+            )
+            assert (
+                describe_errors(compiled.iter_errors(dict(doc, type=entity_type)))
+                == expected
+            )
+
+
+def test_compiled_validators_record_errors():
+    errors = []
+    for engine in ("jsonschema", "compiled"):
+        entity = MockSubmissionEntity()
+        entity.doc = {"type": "aliquot", "centers": {"submitter_id": "test"}}
+        GDCJSONValidator(engine=engine).record_errors([entity])
+        errors.append(entity.errors)
+    assert errors[0] == errors[1]
+    assert ["submitter_id"] in [error["keys"] for error in errors[1]]
+
+
+def test_compiled_validators_fallback(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    schemas = {
+        "supported": {"type": "object", "properties": {"x": {"type": "string"}}},
+        "unsupported": {"type": "object", "properties": {"x": {"uniqueItems": True}}},
+    }
+    validators = compiled_validators.load_validators(schemas)
+    assert list(validators) == ["supported"]
+    assert [e.message for e in validators["supported"].iter_errors({"x": 1})] == [
+        "1 is not of type 'string'"
+    ]
+    assert not list(tmp_path.iterdir())
+
+
+def test_compiled_validators_build(tmp_path, monkeypatch):
+    package = tmp_path / "built_validators"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(compiled_validators, "GENERATED_PACKAGE", "built_validators")
+
+    schemas = {"t": {"type": "object", "properties": {"x": {"type": "string"}}}}
+    key = compiled_validators.get_cache_key(schemas)
+    assert compiled_validators.import_built_module(key) is None
+
+    path = compiled_validators.build_module(schemas)
+    assert os.path.dirname(path) == str(package)
+    module = compiled_validators.import_built_module(key)
+    assert module.KEY == key
+
+    validators = compiled_validators.load_validators(schemas)
+    assert validators["t"].function.__module__ == module.__name__
+    assert [e.message for e in validators["t"].iter_errors({"x": 1})] == [
+        "1 is not of type 'string'"
+    ]
+
+
+@pytest.mark.parametrize(
+    "schema, values",
+    [
+        ({"additionalProperties": False}, [{"b": 1, "a": 2, "c": 3}, {"z": 1}]),
+        (
+            {"additionalProperties": {"type": "string"}},
+            [{"b": 1, "a": 2, "c": "x", "d": 3}],
+        ),
+        ({"minItems": 1}, [[]]),
+        ({"minItems": 2}, [[], [1]]),
+        ({"maxItems": 0}, [[1]]),
+        ({"maxItems": 1}, [[1, 2]]),
+    ],
+)
+def test_compiled_validators_messages(schema, values):
+    schemas = {"t": {"type": "object", "properties": {"p": schema}}}
+    draft4 = Draft4Validator(schemas["t"])
+    compiled = compiled_validators.load_validators(schemas)["t"]
+    for value in values:
+        doc = {"p": value}
+        assert describe_errors(compiled.iter_errors(doc)) == describe_errors(
+            draft4.iter_errors(doc)
+        )
+
+
+def test_extra_properties_order():
+    doc = {"type": "aliquot", "submitter_id": "a", "zz": 1, "aa": 2, "mm": 3}
+    schema = GDCJSONValidator().schemas.schema["aliquot"]
+    expected = [
+        e.message
+        for e in Draft4Validator(schema).iter_errors(doc)
+        if e.message.startswith("Additional")
+    ]
+    assert len(expected) == 1
+    for engine in ("jsonschema", "compiled"):
+        errors = GDCJSONValidator(engine=engine).iter_errors(doc)
+        messages = [e.message for e in errors if e.message.startswith("Additional")]
+        assert messages == expected
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        GDCJSONValidator(engine="unknown")
+
+
+@pytest.mark.parametrize("engine", ["jsonschema", "compiled"])
+def test_record_errors_parallel(engine):
+    docs = [
+        {"type": "aliquot", "submitter_id": str(i), "amount": "x" if i % 3 else 1}
+        for i in range(10)
+    ]
+    docs[7] = {"type": "aliquo"}
+
+    errors = []
+    for record_errors in ("record_errors", "record_errors_parallel"):
+        entities = [MockSubmissionEntity() for _ in docs]
+        for entity, doc in zip(entities, docs):
+            entity.doc = doc
+        validator = GDCJSONValidator(engine=engine)
+        if record_errors == "record_errors":
+            validator.record_errors(entities)
+        else:
+            validator.record_errors_parallel(entities, workers=2, chunk_size=3)
+        errors.append([entity.errors for entity in entities])
+
+    assert errors[0] == errors[1]
+    assert errors[1][7][0]["keys"] == ["type"]
+    assert not errors[1][8]
+
+
+def test_iter_validate():
+    consumed = []
+
+    def docs():
+        for i in range(100):
+            consumed.append(i)
+            yield {
+                "type": "aliquot",
+                "submitter_id": str(i),
+                "amount": "x" if i % 2 else 1,
+            }
+        yield {"type": "aliquo"}
+
+    results = GDCJSONValidator().iter_validate(docs(), max_errors=6)
+    assert consumed == []
+
+    results = list(results)
+    assert [index for index, _ in results] == [0, 1, 2, 3]
+    assert consumed == [0, 1, 2, 3]
+    assert [len(errors) for _, errors in results] == [1, 2, 1, 2]
+    assert {
+        "message": "'x' is not of type 'number', 'null'",
+        "keys": ["amount"],
+    } in results[1][1]
+
+    results = list(GDCJSONValidator(engine="compiled").iter_validate(docs()))
+    assert len(results) == 101
+    assert results[-1] == (
+        100,
+        [
+            {
+                "message": "specified type: aliquo is not in the current data model",
+                "keys": ["type"],
+            }
+        ],
+    )
+
+
+def validate_rows(validator, entity_type, columns):
+    rows = len(next(iter(columns.values())))
+    docs = [
+        dict(
+            {"type": entity_type},
+            **{
+                name: values[i]
+                for name, values in columns.items()
+                if values[i] is not None and name != "type"
+            }
+        )
+        for i in range(rows)
+    ]
+    return {i: errors for i, errors in validator.iter_validate(docs) if errors}
+
+
+def test_validate_columns():
+    validator = GDCJSONValidator(engine="compiled")
+    values = [
+        None,
+        "x",
+        1,
+        2.5,
+        True,
+        "released",
+        "00000000-0000-0000-0000-000000000000",
+    ]
+    for entity_type, schema in validator.schemas.schema.items():
+        names = sorted(schema["properties"])
+        columns = {
+            name: [values[(i * (n + 1)) % len(values)] for i in range(20)]
+            for n, name in enumerate(names)
+        }
+        columns["extra"] = [None] * 19 + [1]
+        assert validator.validate_columns(entity_type, columns) == validate_rows(
+            validator, entity_type, columns
+        )
+
+
+def test_validate_columns_checks_columns():
+    validator = GDCJSONValidator()
+    columns = {
+        "submitter_id": ["a", "b", None],
+        "amount": [1.5, "x", 2],
+        "analyte_type_id": ["D", "Z", None],
+        "samples": [{"submitter_id": "s"}] * 3,
+    }
+    errors = validator.validate_columns("aliquot", columns)
+    assert errors == validate_rows(validator, "aliquot", columns)
+    assert sorted(errors) == [1, 2]
+
+
+def test_validate_columns_arrays():
+    numpy = pytest.importorskip("numpy")
+    validator = GDCJSONValidator()
+    columns = {
+        "submitter_id": numpy.array(["a", "b", "c"], dtype=object),
+        "amount": numpy.array([1.5, numpy.nan, -2.0]),
+        "concentration": numpy.array([1, 2, 3]),
+        "samples": [{"submitter_id": "s"}] * 3,
+    }
+    expected = validate_rows(
+        validator,
+        "aliquot",
+        {
+            name: [None if v != v else v for v in numpy.asarray(values).tolist()]
+            for name, values in columns.items()
+        },
+    )
+    assert validator.validate_columns("aliquot", columns) == expected